@@ -0,0 +1,576 @@
+# A compact product catalog for receipt.py. The products are stored in
+# typed columns (interned names, prices as integer cents and an open
+# addressing hash index from product number to row) inside one binary
+# image. The image can be saved to a snapshot file and opened again
+# with mmap, so a catalog with millions of products starts instantly.
+# ReloadingCatalog follows a products CSV file that changes while a
+# checkout process is running, and RcuCatalog lets one writer change
+# prices while many checkout lane threads read without locks.
+import argparse  # Import argparse to read the command line options
+import csv  # Import the csv module to work with CSV files
+import mmap  # Import mmap to map a snapshot file into memory
+import os  # Import os to read the modification time and size of a file
+import struct  # Import struct to pack the snapshot header
+import sys  # Import sys to read the byte order of this computer
+import threading  # Import threading to serialize reloads and watch a file in the background
+import zlib  # Import zlib for a hash that is stable between runs
+from array import array  # Import array to build the typed columns
+from collections.abc import Mapping  # Import Mapping so the catalog works like a dictionary
+from decimal import Decimal  # Import Decimal to convert prices to cents without rounding errors
+from types import MappingProxyType  # Import MappingProxyType to hand out read only snapshots
+
+# Indexes of the columns in products.csv and in the rows
+# returned by ProductCatalog, the same as read_dictionary.
+PRODUCT_NUMBER_INDEX = 0
+NAME_INDEX = 1
+PRICE_INDEX = 2
+
+MAGIC = b"PCAT0001"  # First bytes of every snapshot file
+HEADER = struct.Struct("<8s2s6xQQQQQ")  # magic, byte order, rows, names, slots, number bytes, name bytes
+EMPTY_SLOT = -1  # Value of an unused slot in the hash index
+
+
+def price_to_cents(price):
+    """Convert a price string such as "4.50" to integer cents."""
+    return int((Decimal(price) * 100).to_integral_value())
+
+
+def cents_to_price(cents):
+    """Convert integer cents to a price string such as "4.50"."""
+    sign = "-" if cents < 0 else ""
+    cents = abs(cents)
+    return f"{sign}{cents // 100}.{cents % 100:02d}"
+
+
+def _hash_key(key_bytes):
+    return zlib.crc32(key_bytes)
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def _layout(row_count, name_count, slot_count, number_bytes, name_bytes):
+    """Return the start of each section in a catalog image."""
+    sections = {}
+    offset = HEADER.size
+    for name, size in [
+            ("prices", 8 * row_count),
+            ("name_ids", 4 * row_count),
+            ("number_offsets", 4 * (row_count + 1)),
+            ("name_offsets", 4 * (name_count + 1)),
+            ("slots", 4 * slot_count),
+            ("numbers", number_bytes),
+            ("names", name_bytes)]:
+        offset = _align(offset)
+        sections[name] = (offset, offset + size)
+        offset += size
+    return sections, offset
+
+
+def build_image(products):
+    """Build a catalog image from an iterable of
+    [product_number, name, price] rows.
+
+    Parameters
+        products: an iterable of rows like the rows of products.csv.
+    Return: a bytes object that holds the whole catalog.
+    """
+    prices = array("q")
+    name_ids = array("i")
+    number_offsets = array("i", [0])
+    name_offsets = array("i", [0])
+    numbers = bytearray()
+    names = bytearray()
+    name_table = {}  # Interned names: name -> name id
+    row_of_number = {}  # Used only while building to replace duplicate rows
+
+    for row in products:
+        product_number = row[PRODUCT_NUMBER_INDEX]
+        name = row[NAME_INDEX]
+        cents = price_to_cents(row[PRICE_INDEX])
+
+        name_id = name_table.get(name)
+        if name_id is None:
+            name_id = len(name_table)
+            name_table[name] = name_id
+            names += name.encode()
+            name_offsets.append(len(names))
+
+        if product_number in row_of_number:
+            # A later row replaces an earlier one, like read_dictionary.
+            index = row_of_number[product_number]
+            prices[index] = cents
+            name_ids[index] = name_id
+            continue
+
+        row_of_number[product_number] = len(prices)
+        prices.append(cents)
+        name_ids.append(name_id)
+        numbers += product_number.encode()
+        number_offsets.append(len(numbers))
+
+    row_count = len(prices)
+    slot_count = 1
+    while slot_count < 2 * row_count:
+        slot_count *= 2
+    slots = array("i", [EMPTY_SLOT]) * slot_count
+    mask = slot_count - 1
+    for index in range(row_count):
+        key_bytes = bytes(numbers[number_offsets[index]:number_offsets[index + 1]])
+        slot = _hash_key(key_bytes) & mask
+        while slots[slot] != EMPTY_SLOT:
+            slot = (slot + 1) & mask
+        slots[slot] = index
+
+    sections, size = _layout(row_count, len(name_table), slot_count,
+            len(numbers), len(names))
+    image = bytearray(size)
+    HEADER.pack_into(image, 0, MAGIC, _byte_order_tag(), row_count,
+            len(name_table), slot_count, len(numbers), len(names))
+    for name, data in [
+            ("prices", prices.tobytes()),
+            ("name_ids", name_ids.tobytes()),
+            ("number_offsets", number_offsets.tobytes()),
+            ("name_offsets", name_offsets.tobytes()),
+            ("slots", slots.tobytes()),
+            ("numbers", numbers),
+            ("names", names)]:
+        start, end = sections[name]
+        image[start:end] = data
+    return bytes(image)
+
+
+def _byte_order_tag():
+    return b"LE" if sys.byteorder == "little" else b"BE"
+
+
+class ProductCatalog(Mapping):
+    """A read only product catalog backed by one binary image.
+
+    A ProductCatalog can be used anywhere the dictionary returned from
+    receipt.read_dictionary(filename, 0) is used: catalog[product_number]
+    returns a [product_number, name, price] list of strings. Code that
+    wants the typed columns can call price_cents, name and row_index
+    instead and skip the string conversion.
+    """
+
+    def __init__(self, image, mapped=None):
+        """Wrap a catalog image returned from build_image or read from
+        a snapshot file.
+
+        Parameters
+            image: a bytes-like object that holds the catalog.
+            mapped: the mmap object image comes from, if any, so that
+                close can release it.
+        """
+        if len(image) < HEADER.size:
+            raise ValueError("not a product catalog snapshot")
+        magic, order, rows, names, slots, number_bytes, name_bytes = \
+                HEADER.unpack_from(image, 0)
+        if magic != MAGIC:
+            raise ValueError("not a product catalog snapshot")
+        if order != _byte_order_tag():
+            raise ValueError("product catalog snapshot was written"
+                    " on a computer with a different byte order")
+        sections, size = _layout(rows, names, slots, number_bytes, name_bytes)
+        if len(image) < size:
+            raise ValueError("product catalog snapshot is truncated")
+
+        view = memoryview(image)
+
+        def section(name, typecode=None):
+            start, end = sections[name]
+            part = view[start:end]
+            return part.cast(typecode) if typecode else part
+
+        self._view = view
+        self._mapped = mapped
+        self._row_count = rows
+        self._prices = section("prices", "q")
+        self._name_ids = section("name_ids", "i")
+        self._number_offsets = section("number_offsets", "i")
+        self._name_offsets = section("name_offsets", "i")
+        self._slots = section("slots", "i")
+        self._numbers = section("numbers")
+        self._names = section("names")
+        self._mask = slots - 1
+
+    @classmethod
+    def from_rows(cls, products):
+        """Build a catalog from [product_number, name, price] rows."""
+        return cls(build_image(products))
+
+    @classmethod
+    def from_csv(cls, filename):
+        """Build a catalog from a products CSV file with the same
+        columns as products.csv.
+
+        Parameters
+            filename: the name of the CSV file to read.
+        Return: a ProductCatalog.
+        """
+        with open(filename, "rt") as csv_file:
+            reader = csv.reader(csv_file)
+            next(reader)  # Skip the header row
+            return cls.from_rows(row for row in reader if len(row) != 0)
+
+    @classmethod
+    def open(cls, filename):
+        """Open a snapshot file written by save. The file is mapped
+        into memory, so nothing is parsed or copied until a product
+        is looked up.
+
+        Parameters
+            filename: the name of the snapshot file.
+        Return: a ProductCatalog.
+        """
+        with open(filename, "rb") as snapshot:
+            mapped = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return cls(mapped, mapped)
+        except ValueError:
+            mapped.close()
+            raise
+
+    def save(self, filename):
+        """Write the catalog image to a snapshot file."""
+        with open(filename, "wb") as snapshot:
+            snapshot.write(self._view)
+
+    def close(self):
+        """Release the memory map of a catalog opened from a snapshot.
+        The catalog must not be used after it is closed.
+        """
+        if self._mapped is not None:
+            for view in [self._prices, self._name_ids, self._number_offsets,
+                    self._name_offsets, self._slots, self._numbers,
+                    self._names, self._view]:
+                view.release()
+            self._mapped.close()
+            self._mapped = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def row_index(self, product_number):
+        """Return the row of product_number, or -1 if it is not in
+        the catalog.
+        """
+        key_bytes = product_number.encode()
+        offsets = self._number_offsets
+        numbers = self._numbers
+        slots = self._slots
+        mask = self._mask
+        slot = _hash_key(key_bytes) & mask
+        while True:
+            index = slots[slot]
+            if index == EMPTY_SLOT:
+                return -1
+            if numbers[offsets[index]:offsets[index + 1]] == key_bytes:
+                return index
+            slot = (slot + 1) & mask
+
+    def _checked_row(self, product_number):
+        index = self.row_index(product_number)
+        if index < 0:
+            raise KeyError(product_number)
+        return index
+
+    def product_number_at(self, index):
+        """Return the product number stored in row index."""
+        offsets = self._number_offsets
+        return bytes(self._numbers[offsets[index]:offsets[index + 1]]).decode()
+
+    def name_at(self, index):
+        """Return the product name stored in row index."""
+        name_id = self._name_ids[index]
+        offsets = self._name_offsets
+        return bytes(self._names[offsets[name_id]:offsets[name_id + 1]]).decode()
+
+    def price_cents_at(self, index):
+        """Return the price in cents stored in row index."""
+        return self._prices[index]
+
+    def name(self, product_number):
+        """Return the name of a product. Raise KeyError if the
+        product is not in the catalog.
+        """
+        return self.name_at(self._checked_row(product_number))
+
+    def price_cents(self, product_number):
+        """Return the price of a product in integer cents. Raise
+        KeyError if the product is not in the catalog.
+        """
+        return self._prices[self._checked_row(product_number)]
+
+    def __getitem__(self, product_number):
+        index = self._checked_row(product_number)
+        return [product_number, self.name_at(index),
+                cents_to_price(self._prices[index])]
+
+    def __contains__(self, product_number):
+        return isinstance(product_number, str) \
+                and self.row_index(product_number) >= 0
+
+    def __len__(self):
+        return self._row_count
+
+    def __iter__(self):
+        for index in range(self._row_count):
+            yield self.product_number_at(index)
+
+
+class SnapshotCatalog(Mapping):
+    """A product catalog that holds an immutable snapshot: a read
+    only view of a dictionary like the one returned from
+    receipt.read_dictionary. A change builds a new dictionary on the
+    side and publishes it with a single assignment (read-copy-update),
+    so readers never take a lock and code that got a snapshot before a
+    change keeps seeing the old one. Call snapshot() once per receipt
+    to price the whole receipt from one consistent catalog.
+
+    The rows in a snapshot are shared with later snapshots and must
+    not be changed; a change replaces a row with a new list.
+    """
+
+    def __init__(self):
+        self._snapshot = MappingProxyType({})
+        self._write_lock = threading.Lock()  # Writers take turns; readers never wait
+        self._listeners = []
+
+    def snapshot(self):
+        """Return the current catalog as a read only mapping from
+        product number to [product_number, name, price] row. The
+        mapping never changes, even after the catalog changes.
+        """
+        return self._snapshot
+
+    def add_listener(self, listener):
+        """Call listener(old_snapshot, new_snapshot, changes) after
+        every change to the catalog, where changes is a dictionary with
+        the keys "inserted", "updated" and "deleted". Listeners run on
+        the thread that made the change, one change at a time, after
+        the new snapshot is published.
+        """
+        self._listeners.append(listener)
+
+    def _publish(self, new_dict):
+        """Publish new_dict as the next snapshot and return the changes
+        from the old one. The caller must hold self._write_lock.
+        """
+        old_dict = self._snapshot
+        changes = {
+            "inserted": [key for key in new_dict if key not in old_dict],
+            # Unchanged products reuse the same row list, so a changed
+            # row is a different object.
+            "updated": [key for key, row in new_dict.items()
+                    if key in old_dict and old_dict[key] is not row],
+            "deleted": [key for key in old_dict if key not in new_dict],
+        }
+        self._snapshot = MappingProxyType(new_dict)  # Publish the new snapshot
+        if changes["inserted"] or changes["updated"] or changes["deleted"]:
+            for listener in self._listeners:
+                listener(old_dict, self._snapshot, changes)
+        return changes
+
+    def __getitem__(self, product_number):
+        return self._snapshot[product_number]
+
+    def __contains__(self, product_number):
+        return product_number in self._snapshot
+
+    def __len__(self):
+        return len(self._snapshot)
+
+    def __iter__(self):
+        return iter(self._snapshot)
+
+
+class RcuCatalog(SnapshotCatalog):
+    """A product catalog that many threads read while a writer
+    changes prices and products. Readers use the catalog like a
+    dictionary, or get a snapshot, without taking any lock; each
+    write copies the dictionary, changes the copy and publishes it.
+    A write costs time in proportion to the size of the catalog, so
+    apply many changes with one call to update when you can.
+    """
+
+    def __init__(self, products_dict):
+        """Parameters
+            products_dict: a dictionary from product number to
+                [product_number, name, price] row, for example the one
+                returned from receipt.read_dictionary. It is copied.
+        """
+        super().__init__()
+        with self._write_lock:
+            self._publish(dict(products_dict))
+
+    def update(self, rows=(), prices=None, deleted=()):
+        """Change the catalog and publish a new snapshot.
+
+        Parameters
+            rows: [product_number, name, price] rows to add or replace.
+            prices: a dictionary from product number to new price, as
+                text like "2.99", for products already in the catalog.
+            deleted: product numbers to remove.
+        Return: the changes, a dictionary like the one returned from
+            ReloadingCatalog.reload.
+        A KeyError is raised, and nothing changes, if prices has a
+        product that is not in the catalog.
+        """
+        with self._write_lock:
+            new_dict = dict(self._snapshot)  # Change a copy, never the published dictionary
+            for row in rows:
+                new_dict[row[PRODUCT_NUMBER_INDEX]] = list(row)
+            if prices:
+                for product_number, price in prices.items():
+                    row = list(new_dict[product_number])  # A new row; the old one stays in old snapshots
+                    row[PRICE_INDEX] = price
+                    new_dict[product_number] = row
+            for product_number in deleted:
+                new_dict.pop(product_number, None)
+            return self._publish(new_dict)
+
+
+class ReloadingCatalog(SnapshotCatalog):
+    """A product catalog that follows changes to its CSV file.
+
+    reload_if_changed compares the modification time and size of the
+    file with the last reload. When the file has changed it is read
+    again, but only the lines that are new or different are parsed;
+    rows of unchanged lines are reused. The new snapshot is built on
+    the side and published with a single assignment, so code that got
+    a snapshot before the reload keeps seeing the old one.
+
+    Each row must be on one line; quoted fields with line breaks are
+    not supported.
+    """
+
+    def __init__(self, filename, key_column_index=0):
+        """Read the products file.
+
+        Parameters
+            filename: the name of the products CSV file to follow.
+            key_column_index: the index of the column to use as the
+                keys in the catalog.
+        """
+        super().__init__()
+        self.filename = filename
+        self.key_column_index = key_column_index
+        self._rows_by_line = {}  # Parsed row of each line in the file
+        self._file_state = None  # (mtime, size) of the file at the last reload
+        self._watcher = None
+        self._stop_watching = threading.Event()
+        self.reload()
+
+    def _stat(self):
+        info = os.stat(self.filename)
+        return info.st_mtime_ns, info.st_size
+
+    def reload_if_changed(self):
+        """Reload the file if its modification time or size changed
+        since the last reload.
+
+        Return: the changes returned from reload, or None if the
+            file has not changed.
+        """
+        if self._stat() == self._file_state:
+            return None
+        return self.reload()
+
+    def reload(self):
+        """Read the file again and publish a new snapshot.
+
+        Return: a dictionary with the keys "inserted", "updated" and
+            "deleted", each a list of the product numbers that were
+            added, changed or removed by this reload.
+        """
+        with self._write_lock:
+            file_state = self._stat()
+            with open(self.filename, "rt", newline="") as csv_file:
+                lines = csv_file.read().splitlines()
+
+            old_rows_by_line = self._rows_by_line
+            new_rows_by_line = {}
+            new_dict = {}
+            key_column_index = self.key_column_index
+            for line in lines[1:]:  # Skip the header row
+                row = old_rows_by_line.get(line)
+                if row is None:
+                    # Only a new or changed line is parsed.
+                    row = next(csv.reader([line]), [])
+                    if len(row) == 0:
+                        continue
+                new_rows_by_line[line] = row
+                new_dict[row[key_column_index]] = row
+
+            self._rows_by_line = new_rows_by_line
+            self._file_state = file_state
+            return self._publish(new_dict)
+
+    def start_watching(self, interval=1.0):
+        """Start a background thread that calls reload_if_changed
+        every interval seconds.
+        """
+        if self._watcher is not None:
+            return
+        self._stop_watching.clear()
+
+        def watch():
+            while not self._stop_watching.wait(interval):
+                try:
+                    self.reload_if_changed()
+                except (OSError, IndexError, csv.Error):
+                    # The file is missing or half written; keep the
+                    # current snapshot and try again later.
+                    pass
+
+        self._watcher = threading.Thread(target=watch, daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        """Stop the thread started by start_watching."""
+        if self._watcher is not None:
+            self._stop_watching.set()
+            self._watcher.join()
+            self._watcher = None
+
+
+def is_snapshot(filename):
+    """Return True if filename starts like a catalog snapshot."""
+    with open(filename, "rb") as product_file:
+        return product_file.read(len(MAGIC)) == MAGIC
+
+
+def load_catalog(filename):
+    """Load a product catalog from a products CSV file or from a
+    snapshot file written by ProductCatalog.save. The file type is
+    recognized by its first bytes, not by its name.
+
+    Parameters
+        filename: the name of the file to read.
+    Return: a ProductCatalog.
+    """
+    if is_snapshot(filename):
+        return ProductCatalog.open(filename)
+    return ProductCatalog.from_csv(filename)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+            description="Convert a products CSV file into a catalog snapshot.")
+    parser.add_argument("csv_file", help="the products CSV file to read")
+    parser.add_argument("snapshot_file", help="the snapshot file to write")
+    args = parser.parse_args(argv)
+
+    catalog = ProductCatalog.from_csv(args.csv_file)
+    catalog.save(args.snapshot_file)
+    print(f"Wrote {len(catalog)} products to {args.snapshot_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,19 @@
 #My creativity emerged in adding a dictionary, `known_molecules_dict`, which stores known chemical formulas and their names. This enhancement allows the program to display 
 # the common name of a chemical compound along with its molar mass and number of moles.
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from types import MappingProxyType
 from formula import parse_formula
+from molecules import MoleculeIndex
 
 # Indexes for inner lists in the periodic table
 NAME_INDEX = 0
@@ -10,106 +23,239 @@ ATOMIC_MASS_INDEX = 1
 SYMBOL_INDEX = 0
 QUANTITY_INDEX = 1
 
+# The elements of the periodic table. Each row has the
+# form [atomic_number, symbol, name, atomic_mass].
+ELEMENT_ROWS = [
+    [89, "Ac", "Actinium", 227],
+    [47, "Ag", "Silver", 107.8682],
+    [13, "Al", "Aluminum", 26.9815386],
+    [18, "Ar", "Argon", 39.948],
+    [33, "As", "Arsenic", 74.9216],
+    [85, "At", "Astatine", 210],
+    [79, "Au", "Gold", 196.966569],
+    [5, "B", "Boron", 10.811],
+    [56, "Ba", "Barium", 137.327],
+    [4, "Be", "Beryllium", 9.012182],
+    [83, "Bi", "Bismuth", 208.9804],
+    [35, "Br", "Bromine", 79.904],
+    [6, "C", "Carbon", 12.0107],
+    [20, "Ca", "Calcium", 40.078],
+    [48, "Cd", "Cadmium", 112.411],
+    [58, "Ce", "Cerium", 140.116],
+    [17, "Cl", "Chlorine", 35.453],
+    [27, "Co", "Cobalt", 58.933195],
+    [24, "Cr", "Chromium", 51.9961],
+    [55, "Cs", "Cesium", 132.9054519],
+    [29, "Cu", "Copper", 63.546],
+    [66, "Dy", "Dysprosium", 162.5],
+    [68, "Er", "Erbium", 167.259],
+    [63, "Eu", "Europium", 151.964],
+    [9, "F", "Fluorine", 18.9984032],
+    [26, "Fe", "Iron", 55.845],
+    [87, "Fr", "Francium", 223],
+    [31, "Ga", "Gallium", 69.723],
+    [64, "Gd", "Gadolinium", 157.25],
+    [32, "Ge", "Germanium", 72.64],
+    [1, "H", "Hydrogen", 1.00794],
+    [2, "He", "Helium", 4.002602],
+    [72, "Hf", "Hafnium", 178.49],
+    [80, "Hg", "Mercury", 200.59],
+    [67, "Ho", "Holmium", 164.93032],
+    [53, "I", "Iodine", 126.90447],
+    [49, "In", "Indium", 114.818],
+    [77, "Ir", "Iridium", 192.217],
+    [19, "K", "Potassium", 39.0983],
+    [36, "Kr", "Krypton", 83.798],
+    [57, "La", "Lanthanum", 138.90547],
+    [3, "Li", "Lithium", 6.941],
+    [71, "Lu", "Lutetium", 174.9668],
+    [12, "Mg", "Magnesium", 24.305],
+    [25, "Mn", "Manganese", 54.938045],
+    [42, "Mo", "Molybdenum", 95.96],
+    [7, "N", "Nitrogen", 14.0067],
+    [11, "Na", "Sodium", 22.98976928],
+    [41, "Nb", "Niobium", 92.90638],
+    [60, "Nd", "Neodymium", 144.242],
+    [10, "Ne", "Neon", 20.1797],
+    [28, "Ni", "Nickel", 58.6934],
+    [93, "Np", "Neptunium", 237],
+    [8, "O", "Oxygen", 15.9994],
+    [76, "Os", "Osmium", 190.23],
+    [15, "P", "Phosphorus", 30.973762],
+    [91, "Pa", "Protactinium", 231.03588],
+    [82, "Pb", "Lead", 207.2],
+    [46, "Pd", "Palladium", 106.42],
+    [61, "Pm", "Promethium", 145],
+    [84, "Po", "Polonium", 209],
+    [59, "Pr", "Praseodymium", 140.90765],
+    [78, "Pt", "Platinum", 195.084],
+    [94, "Pu", "Plutonium", 244],
+    [88, "Ra", "Radium", 226],
+    [37, "Rb", "Rubidium", 85.4678],
+    [75, "Re", "Rhenium", 186.207],
+    [45, "Rh", "Rhodium", 102.9055],
+    [86, "Rn", "Radon", 222],
+    [44, "Ru", "Ruthenium", 101.07],
+    [16, "S", "Sulfur", 32.065],
+    [51, "Sb", "Antimony", 121.76],
+    [21, "Sc", "Scandium", 44.955912],
+    [34, "Se", "Selenium", 78.96],
+    [14, "Si", "Silicon", 28.0855],
+    [62, "Sm", "Samarium", 150.36],
+    [50, "Sn", "Tin", 118.71],
+    [38, "Sr", "Strontium", 87.62],
+    [73, "Ta", "Tantalum", 180.94788],
+    [65, "Tb", "Terbium", 158.92535],
+    [43, "Tc", "Technetium", 98],
+    [52, "Te", "Tellurium", 127.6],
+    [90, "Th", "Thorium", 232.03806],
+    [22, "Ti", "Titanium", 47.867],
+    [81, "Tl", "Thallium", 204.3833],
+    [69, "Tm", "Thulium", 168.93421],
+    [92, "U", "Uranium", 238.02891],
+    [23, "V", "Vanadium", 50.9415],
+    [74, "W", "Tungsten", 183.84],
+    [54, "Xe", "Xenon", 131.293],
+    [39, "Y", "Yttrium", 88.90585],
+    [70, "Yb", "Ytterbium", 173.054],
+    [30, "Zn", "Zinc", 65.38],
+    [40, "Zr", "Zirconium", 91.224],
+]
+
+# The stable isotopes of the elements common in chemical samples, with
+# their masses in u and their natural abundances. Each row has the form
+# [symbol, mass_number, isotopic_mass, abundance]. See isotopes.py.
+ISOTOPE_ROWS = [
+    ["H", 1, 1.00782503207, 0.999885],
+    ["H", 2, 2.0141017778, 0.000115],
+    ["He", 3, 3.0160293191, 0.00000134],
+    ["He", 4, 4.00260325415, 0.99999866],
+    ["Li", 6, 6.015122795, 0.0759],
+    ["Li", 7, 7.01600455, 0.9241],
+    ["B", 10, 10.0129370, 0.199],
+    ["B", 11, 11.0093054, 0.801],
+    ["C", 12, 12.0, 0.9893],
+    ["C", 13, 13.0033548378, 0.0107],
+    ["N", 14, 14.0030740048, 0.99636],
+    ["N", 15, 15.0001088982, 0.00364],
+    ["O", 16, 15.99491461956, 0.99757],
+    ["O", 17, 16.99913170, 0.00038],
+    ["O", 18, 17.9991610, 0.00205],
+    ["F", 19, 18.99840322, 1.0],
+    ["Na", 23, 22.9897692809, 1.0],
+    ["Mg", 24, 23.985041700, 0.7899],
+    ["Mg", 25, 24.98583692, 0.1000],
+    ["Mg", 26, 25.982592929, 0.1101],
+    ["Al", 27, 26.98153863, 1.0],
+    ["Si", 28, 27.9769265325, 0.92223],
+    ["Si", 29, 28.976494700, 0.04685],
+    ["Si", 30, 29.97377017, 0.03092],
+    ["P", 31, 30.97376163, 1.0],
+    ["S", 32, 31.97207100, 0.9499],
+    ["S", 33, 32.97145876, 0.0075],
+    ["S", 34, 33.96786690, 0.0425],
+    ["S", 36, 35.96708076, 0.0001],
+    ["Cl", 35, 34.96885268, 0.7576],
+    ["Cl", 37, 36.96590259, 0.2424],
+    ["K", 39, 38.96370668, 0.932581],
+    ["K", 40, 39.96399848, 0.000117],
+    ["K", 41, 40.96182576, 0.067302],
+    ["Ca", 40, 39.96259098, 0.96941],
+    ["Ca", 42, 41.95861801, 0.00647],
+    ["Ca", 43, 42.9587666, 0.00135],
+    ["Ca", 44, 43.9554818, 0.02086],
+    ["Ca", 46, 45.9536926, 0.00004],
+    ["Ca", 48, 47.952534, 0.00187],
+    ["Mn", 55, 54.9380451, 1.0],
+    ["Fe", 54, 53.9396105, 0.05845],
+    ["Fe", 56, 55.9349375, 0.91754],
+    ["Fe", 57, 56.9353940, 0.02119],
+    ["Fe", 58, 57.9332756, 0.00282],
+    ["Co", 59, 58.9331950, 1.0],
+    ["Ni", 58, 57.9353429, 0.680769],
+    ["Ni", 60, 59.9307864, 0.262231],
+    ["Ni", 61, 60.9310560, 0.011399],
+    ["Ni", 62, 61.9283451, 0.036345],
+    ["Ni", 64, 63.9279660, 0.009256],
+    ["Cu", 63, 62.9295975, 0.6915],
+    ["Cu", 65, 64.9277895, 0.3085],
+    ["Zn", 64, 63.9291422, 0.48268],
+    ["Zn", 66, 65.9260334, 0.27975],
+    ["Zn", 67, 66.9271273, 0.04102],
+    ["Zn", 68, 67.9248442, 0.19024],
+    ["Zn", 70, 69.9253193, 0.00631],
+    ["Se", 74, 73.9224764, 0.0089],
+    ["Se", 76, 75.9192136, 0.0937],
+    ["Se", 77, 76.9199140, 0.0763],
+    ["Se", 78, 77.9173091, 0.2377],
+    ["Se", 80, 79.9165213, 0.4961],
+    ["Se", 82, 81.9166994, 0.0873],
+    ["Br", 79, 78.9183371, 0.5069],
+    ["Br", 81, 80.9162906, 0.4931],
+    ["I", 127, 126.904473, 1.0],
+]
+
+
+class ElementRegistry:
+    """The elements of the periodic table in parallel arrays, in
+    order of atomic number. Code that computes many molar masses can
+    turn each symbol into an integer index once with index_of and
+    then read the masses array directly.
+
+    A registry never changes after it is built. Its view attribute is
+    a read only mapping from symbol to (name, atomic_mass) that works
+    everywhere a dictionary from make_periodic_table works, for
+    example with parse_formula and compute_molar_mass.
+    """
+
+    def __init__(self, element_rows):
+        """Parameters
+            element_rows is a compound list of
+                [atomic_number, symbol, name, atomic_mass] lists
+        """
+        rows = sorted(element_rows)
+        self.atomic_numbers = array("B", [row[0] for row in rows])
+        self.symbols = tuple(row[1] for row in rows)
+        self.names = tuple(row[2] for row in rows)
+        self.masses = array("d", [row[3] for row in rows])
+        self.index_of = MappingProxyType({symbol: index
+            for index, symbol in enumerate(self.symbols)})
+        self.view = MappingProxyType({row[1]: (row[2], row[3]) for row in rows})
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def molar_mass(self, index_quantity_list):
+        """Compute the molar mass of a compound list of
+        [element_index, quantity] lists.
+        """
+        masses = self.masses
+        total_molar_mass = 0.0
+        for index, quantity in index_quantity_list:
+            total_molar_mass += masses[index] * quantity
+        return total_molar_mass
+
+    def to_indexes(self, symbol_quantity_list):
+        """Convert a compound list returned from parse_formula into
+        a compound list of [element_index, quantity] lists.
+        """
+        index_of = self.index_of
+        return [[index_of[symbol], quantity]
+            for symbol, quantity in symbol_quantity_list]
+
+
+# The periodic table, built once when this module is imported.
+periodic_table = ElementRegistry(ELEMENT_ROWS)
+PERIODIC_TABLE = periodic_table.view
+
+
 def make_periodic_table():
-    periodic_table_dict = {
-        # symbol: [name, atomic_mass]
-        "Ac": ["Actinium", 227],
-        "Ag": ["Silver", 107.8682],
-        "Al": ["Aluminum", 26.9815386],
-        "Ar": ["Argon", 39.948],
-        "As": ["Arsenic", 74.9216],
-        "At": ["Astatine", 210],
-        "Au": ["Gold", 196.966569],
-        "B": ["Boron", 10.811],
-        "Ba": ["Barium", 137.327],
-        "Be": ["Beryllium", 9.012182],
-        "Bi": ["Bismuth", 208.9804],
-        "Br": ["Bromine", 79.904],
-        "C": ["Carbon", 12.0107],
-        "Ca": ["Calcium", 40.078],
-        "Cd": ["Cadmium", 112.411],
-        "Ce": ["Cerium", 140.116],
-        "Cl": ["Chlorine", 35.453],
-        "Co": ["Cobalt", 58.933195],
-        "Cr": ["Chromium", 51.9961],
-        "Cs": ["Cesium", 132.9054519],
-        "Cu": ["Copper", 63.546],
-        "Dy": ["Dysprosium", 162.5],
-        "Er": ["Erbium", 167.259],
-        "Eu": ["Europium", 151.964],
-        "F": ["Fluorine", 18.9984032],
-        "Fe": ["Iron", 55.845],
-        "Fr": ["Francium", 223],
-        "Ga": ["Gallium", 69.723],
-        "Gd": ["Gadolinium", 157.25],
-        "Ge": ["Germanium", 72.64],
-        "H": ["Hydrogen", 1.00794],
-        "He": ["Helium", 4.002602],
-        "Hf": ["Hafnium", 178.49],
-        "Hg": ["Mercury", 200.59],
-        "Ho": ["Holmium", 164.93032],
-        "I": ["Iodine", 126.90447],
-        "In": ["Indium", 114.818],
-        "Ir": ["Iridium", 192.217],
-        "K": ["Potassium", 39.0983],
-        "Kr": ["Krypton", 83.798],
-        "La": ["Lanthanum", 138.90547],
-        "Li": ["Lithium", 6.941],
-        "Lu": ["Lutetium", 174.9668],
-        "Mg": ["Magnesium", 24.305],
-        "Mn": ["Manganese", 54.938045],
-        "Mo": ["Molybdenum", 95.96],
-        "N": ["Nitrogen", 14.0067],
-        "Na": ["Sodium", 22.98976928],
-        "Nb": ["Niobium", 92.90638],
-        "Nd": ["Neodymium", 144.242],
-        "Ne": ["Neon", 20.1797],
-        "Ni": ["Nickel", 58.6934],
-        "Np": ["Neptunium", 237],
-        "O": ["Oxygen", 15.9994],
-        "Os": ["Osmium", 190.23],
-        "P": ["Phosphorus", 30.973762],
-        "Pa": ["Protactinium", 231.03588],
-        "Pb": ["Lead", 207.2],
-        "Pd": ["Palladium", 106.42],
-        "Pm": ["Promethium", 145],
-        "Po": ["Polonium", 209],
-        "Pr": ["Praseodymium", 140.90765],
-        "Pt": ["Platinum", 195.084],
-        "Pu": ["Plutonium", 244],
-        "Ra": ["Radium", 226],
-        "Rb": ["Rubidium", 85.4678],
-        "Re": ["Rhenium", 186.207],
-        "Rh": ["Rhodium", 102.9055],
-        "Rn": ["Radon", 222],
-        "Ru": ["Ruthenium", 101.07],
-        "S": ["Sulfur", 32.065],
-        "Sb": ["Antimony", 121.76],
-        "Sc": ["Scandium", 44.955912],
-        "Se": ["Selenium", 78.96],
-        "Si": ["Silicon", 28.0855],
-        "Sm": ["Samarium", 150.36],
-        "Sn": ["Tin", 118.71],
-        "Sr": ["Strontium", 87.62],
-        "Ta": ["Tantalum", 180.94788],
-        "Tb": ["Terbium", 158.92535],
-        "Tc": ["Technetium", 98],
-        "Te": ["Tellurium", 127.6],
-        "Th": ["Thorium", 232.03806],
-        "Ti": ["Titanium", 47.867],
-        "Tl": ["Thallium", 204.3833],
-        "Tm": ["Thulium", 168.93421],
-        "U": ["Uranium", 238.02891],
-        "V": ["Vanadium", 50.9415],
-        "W": ["Tungsten", 183.84],
-        "Xe": ["Xenon", 131.293],
-        "Y": ["Yttrium", 88.90585],
-        "Yb": ["Ytterbium", 173.054],
-        "Zn": ["Zinc", 65.38],
-        "Zr": ["Zirconium", 91.224]
-    }    
-
-    return periodic_table_dict
+    """Return a new dictionary that maps each element symbol to a
+    [name, atomic_mass] list. Each call builds a new dictionary that
+    the caller may change; code that doesn't change the table can use
+    PERIODIC_TABLE, which is built only once.
+    """
+    return {symbol: [name, mass] for symbol, (name, mass) in PERIODIC_TABLE.items()}
 
 def compute_molar_mass(symbol_quantity_list, periodic_table_dict):
     """Compute and return the total molar mass of all the
@@ -121,7 +267,7 @@ def compute_molar_mass(symbol_quantity_list, periodic_table_dict):
             list in symbol_quantity_list has this form:
             ["symbol", quantity].
         periodic_table_dict is the compound dictionary
-            returned from make_periodic_table.
+            returned from make_periodic_table, or PERIODIC_TABLE.
     Return: the total molar mass of all the elements in
         symbol_quantity_list.
 
@@ -148,54 +294,306 @@ def get_formula_name(formula, known_molecules_dict):
     Parameters
         formula is a string that contains a chemical formula
         known_molecules_dict is a dictionary that contains
-            known chemical formulas and their names
+            known chemical formulas and their names, or a
+            MoleculeIndex, which finds the name of a formula
+            whatever order its atoms are written in
     Return: the name of a chemical formula
     """
 
+    if isinstance(known_molecules_dict, MoleculeIndex):
+        return known_molecules_dict.name(formula, PERIODIC_TABLE)
     if formula in known_molecules_dict:
         return known_molecules_dict[formula]
     else:
         return "unknown compound" 
 
-def main():
-    known_molecules_dict = {
-        "Al2O3": "aluminum oxide",
-        "CH3OH": "methanol",
-        "C2H6O": "ethanol",
-        "C2H5OH": "ethanol",
-        "C3H8O": "isopropyl alcohol",
-        "C3H8": "propane",
-        "C4H10": "butane",
-        "C6H6": "benzene",
-        "C6H14": "hexane",
-        "C8H18": "octane",
-        "CH3(CH2)6CH3": "octane",
-        "C13H18O2": "ibuprofen",
-        "C13H16N2O2": "melatonin",
-        "Fe2O3": "iron oxide",
-        "FeS2": "iron pyrite",
-        "H2O": "water"
-    }    
+# Known chemical formulas and their names
+known_molecules_dict = {
+    "Al2O3": "aluminum oxide",
+    "CH3OH": "methanol",
+    "C2H6O": "ethanol",
+    "C2H5OH": "ethanol",
+    "C3H8O": "isopropyl alcohol",
+    "C3H8": "propane",
+    "C4H10": "butane",
+    "C6H6": "benzene",
+    "C6H14": "hexane",
+    "C8H18": "octane",
+    "CH3(CH2)6CH3": "octane",
+    "C13H18O2": "ibuprofen",
+    "C13H16N2O2": "melatonin",
+    "Fe2O3": "iron oxide",
+    "FeS2": "iron pyrite",
+    "H2O": "water"
+}
+
+# The known molecules by composition. main replaces it when it is
+# given a compound or index file.
+known_molecules, _ = MoleculeIndex.from_pairs(known_molecules_dict.items(), PERIODIC_TABLE)
+
+def load_molecules(filename):
+    """Read a molecule index file, or build the index from a CSV
+    file of formulas and names if filename ends with .csv.
+    """
+    if filename.endswith(".csv"):
+        index, _ = MoleculeIndex.from_csv(filename, PERIODIC_TABLE)
+        return index
+    return MoleculeIndex.load(filename)
+
+def use_molecules(filename):
+    """Replace known_molecules with the molecules in a file. It is
+    also the initializer of the worker processes of run_bulk.
+    """
+    global known_molecules
+    known_molecules = load_molecules(filename)
+
+# Columns of the results written by the bulk mode
+RESULT_COLUMNS = ["formula", "sample_mass", "molar_mass", "moles", "name", "error"]
+
+def read_samples(sample_file, input_format):
+    """Read (formula, sample_mass) rows from a file.
+
+    Parameters
+        sample_file is a text file object
+        input_format is "csv" for rows of formula and sample mass,
+            with an optional header row, or "jsonl" for lines like
+            {"formula": "H2O", "sample_mass": 18.5}
+    Return: a generator of (formula, sample_mass) tuples. The sample
+        mass is left as it was read; process_samples converts it. A
+        JSON line that isn't an object with a text formula is
+        yielded as a (line, None, error_message) tuple, which
+        process_samples reports as the error of that row.
+    """
+    if input_format == "jsonl":
+        for line in sample_file:
+            line = line.strip()
+            if line == "":
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                yield line, None, f"invalid JSON line: {error}"
+                continue
+            except RecursionError:
+                yield line, None, "invalid JSON line: nested too deeply"
+                continue
+            if not isinstance(row, dict):
+                yield line, None, "a JSON line must be an object"
+                continue
+            formula = row.get("formula", "")
+            if not isinstance(formula, str):
+                yield line, None, f"the formula must be text: {formula!r}"
+                continue
+            yield formula, row.get("sample_mass")
+        return
+
+    reader = csv.reader(sample_file)
+    for row in reader:
+        if len(row) == 0:
+            continue
+        if reader.line_num == 1 and row[0].strip().lower() == "formula":
+            continue  # Skip the header row
+        yield row[0].strip(), row[1] if len(row) > 1 else None
+
+def process_samples(samples):
+    """Compute the molar mass, moles and name of a chunk of samples.
+
+    The formulas of the chunk are parsed into one composition matrix
+    and their molar masses computed together, see composition.py.
+
+    Parameters
+        samples is a list of (formula, sample_mass) tuples, and
+            (line, None, error_message) tuples for the lines that
+            read_samples couldn't read
+    Return: a list with a dictionary for each sample that has the
+        keys in RESULT_COLUMNS; error is None when the sample is valid.
+    """
+    # composition.py imports this module, so import it here, not at the top.
+    from composition import parse_formulas
+
+    matrix = parse_formulas(sample[0] for sample in samples)
+    molar_masses = matrix.molar_masses()
+    symbols = periodic_table.symbols
+    results = []
+    for row, sample in enumerate(samples):
+        formula, sample_mass = sample[0], sample[1]
+        result = dict.fromkeys(RESULT_COLUMNS)
+        result["formula"] = formula
+        result["sample_mass"] = sample_mass
+        results.append(result)
+        if len(sample) > 2:
+            result["error"] = sample[2]
+            continue
+        if row in matrix.errors:
+            result["error"] = matrix.errors[row]
+            continue
+        try:
+            sample_mass = float(sample_mass)
+        except (TypeError, ValueError):
+            result["error"] = f"invalid sample mass: {sample_mass}"
+            continue
+        result["sample_mass"] = sample_mass
+        molar_mass = molar_masses[row]
+        if molar_mass == 0:
+            result["error"] = "the molar mass is zero"
+            continue
+        result["molar_mass"] = molar_mass
+        result["moles"] = sample_mass / molar_mass
+        names = known_molecules.names([[symbols[index], quantity]
+            for index, quantity in matrix.row(row)])
+        result["name"] = names[0] if len(names) != 0 else "unknown compound"
+    return results
+
+def format_results(results, output_format):
+    """Render a list of result dictionaries as CSV rows without a
+    header, or as JSON Lines.
+    """
+    if output_format == "jsonl":
+        return "".join(json.dumps(result) + "\n" for result in results)
+    text = io.StringIO()
+    writer = csv.writer(text, lineterminator="\n")
+    for result in results:
+        writer.writerow(["" if result[column] is None else result[column]
+            for column in RESULT_COLUMNS])
+    return text.getvalue()
+
+def _process_chunk(chunk, output_format):
+    """Process one chunk of samples in a worker process and return
+    the text of its results and the number of errors.
+    """
+    results = process_samples(chunk)
+    errors = sum(result["error"] is not None for result in results)
+    return format_results(results, output_format), errors
+
+def run_bulk(samples, out_file, output_format="csv", workers=0, chunk_size=10000,
+        molecules_filename=None):
+    """Compute the results of many samples and write them to out_file
+    in the same order as the samples.
+
+    The samples are cut into chunks of chunk_size. With workers above
+    zero the chunks are handed to a pool of worker processes; at most
+    two chunks per worker are waiting at any time, and the results of
+    the oldest chunk are written first, so the output keeps the input
+    order and memory stays bounded.
+
+    Parameters
+        samples is an iterable of (formula, sample_mass) tuples
+        out_file is a text file object for the results
+        output_format is "csv" or "jsonl"
+        workers is the number of worker processes, or 0 to process
+            the chunks in this process
+        chunk_size is the number of samples in each chunk
+        molecules_filename is a compound or index file of known
+            molecules, or None to use known_molecules as it is
+    Return: a dictionary with the keys rows, errors and seconds.
+    """
+    start = time.perf_counter()
+    if output_format == "csv":
+        out_file.write(",".join(RESULT_COLUMNS) + "\n")
+    samples = iter(samples)
+    rows = 0
+    errors = 0
+
+    def chunks():
+        nonlocal rows
+        while True:
+            chunk = list(islice(samples, chunk_size))
+            if len(chunk) == 0:
+                return
+            rows += len(chunk)
+            yield chunk
+
+    if workers <= 0:
+        if molecules_filename is not None:
+            use_molecules(molecules_filename)
+        for chunk in chunks():
+            text, chunk_errors = _process_chunk(chunk, output_format)
+            out_file.write(text)
+            errors += chunk_errors
+    else:
+        initargs = () if molecules_filename is None else (molecules_filename,)
+        with ProcessPoolExecutor(max_workers=workers,
+                initializer=use_molecules if initargs else None, initargs=initargs) as executor:
+            pending = deque()
+            for chunk in chunks():
+                pending.append(executor.submit(_process_chunk, chunk, output_format))
+                if len(pending) >= 2 * workers:
+                    text, chunk_errors = pending.popleft().result()  # Oldest chunk first
+                    out_file.write(text)
+                    errors += chunk_errors
+            while len(pending) != 0:
+                text, chunk_errors = pending.popleft().result()
+                out_file.write(text)
+                errors += chunk_errors
+
+    return {"rows": rows, "errors": errors, "seconds": time.perf_counter() - start}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute the molar mass and moles of chemical samples.")
+    parser.add_argument("input", nargs="?",
+        help="a CSV or JSON Lines file of formulas and sample masses, or - for standard input;"
+        " without it the formula and mass are asked for")
+    parser.add_argument("--format", choices=["csv", "jsonl"],
+        help="the format of the input (default: from the file name, or csv)")
+    parser.add_argument("--output", help="the file to write the results to (default: standard output)")
+    parser.add_argument("--output-format", choices=["csv", "jsonl"],
+        help="the format of the results (default: the input format)")
+    parser.add_argument("--workers", type=int, default=0,
+        help="the number of worker processes (default: process the samples in this process)")
+    parser.add_argument("--chunk-size", type=int, default=10000,
+        help="the number of samples handed to a worker at a time")
+    parser.add_argument("--molecules",
+        help="a molecule index file, or a CSV file of formulas and names, to name the formulas with")
+    args = parser.parse_args(argv)
+
+    if args.input is None:
+        if args.molecules is not None:
+            use_molecules(args.molecules)
+        interactive()
+        return
+
+    input_format = args.format
+    if input_format is None:
+        input_format = "jsonl" if args.input.endswith((".jsonl", ".json")) else "csv"
+    output_format = args.output_format or input_format
+    workers = os.cpu_count() or 1 if args.workers < 0 else args.workers
+
+    in_file = sys.stdin if args.input == "-" else open(args.input, "rt", newline="")
+    out_file = sys.stdout if args.output is None else open(args.output, "wt", newline="")
+    try:
+        stats = run_bulk(read_samples(in_file, input_format), out_file,
+            output_format, workers, args.chunk_size, args.molecules)
+    finally:
+        if in_file is not sys.stdin:
+            in_file.close()
+        if out_file is not sys.stdout:
+            out_file.close()
+
+    rate = stats["rows"] / stats["seconds"] if stats["seconds"] > 0 else 0
+    print(f"Processed {stats['rows']} samples ({stats['errors']} errors)"
+        f" in {stats['seconds']:.2f} s, {rate:.0f} samples/s", file=sys.stderr)
+
+def interactive():
     # Get a chemical formula for a molecule from the user
     chemical_formula = input("Enter the chemical formula for a molecule: ")
     
     # Get the mass of a chemical sample in grams from the user
     sample_mass = float(input("Enter the mass of the chemical sample in grams: "))
     
-    # Call the make_periodic_table function and store the returned list in a variable
-    periodic_table = make_periodic_table()
+    # Use the periodic table that was built once when this module was imported
+    periodic_table_dict = PERIODIC_TABLE
     # Call the parse_formula function to convert the chemical formula given by the user 
     # to a compound list that stores element symbols and the quantity  of atoms of each element in the molecule.
-    symbol_quantity_list = parse_formula(chemical_formula, periodic_table)
+    symbol_quantity_list = parse_formula(chemical_formula, periodic_table_dict)
 
     #Call the compute_molar_mass function to compute the molar mass of the molecule from the compound list.
-    molar_mass = compute_molar_mass(symbol_quantity_list, periodic_table)
+    molar_mass = compute_molar_mass(symbol_quantity_list, periodic_table_dict)
 
     #compute the number of moles in the sample
     number_of_moles = sample_mass / molar_mass
 
     # Get the chemical from known molecules dictionary 
-    formula_name = get_formula_name(chemical_formula, known_molecules_dict)
+    formula_name = get_formula_name(chemical_formula, known_molecules)
 
     # printthe molar mass 
     print(f"Molar mass {molar_mass:.5f} g/mole")
@@ -0,0 +1,157 @@
+# Molar masses for many formulas at once. parse_formulas parses a list
+# or a file of formulas into a sparse formulas x elements matrix of
+# atom counts, stored in compressed sparse row form: one array of
+# element indexes and one array of counts for all the formulas, and an
+# array of the place where each formula's entries start. The molar
+# masses of all the formulas are then one sparse matrix-vector product
+# with the vector of atomic masses in chemistry.periodic_table.
+#
+# A formula that can't be parsed does not stop the batch; its row is
+# empty, its molar mass is None and its error message is kept.
+import operator
+from array import array
+from functools import reduce
+from chemistry import PERIODIC_TABLE, periodic_table
+from formula import FormulaError, parse_formula
+
+MAX_COUNT = 2**63 - 1  # The largest atom count the counts array holds
+
+
+class CompositionMatrix:
+    """A formulas x elements matrix of atom counts in compressed
+    sparse row form. The entries of row i are
+    element_indexes[row_starts[i]:row_starts[i + 1]] and the counts
+    at the same places; element indexes are indexes into the arrays
+    of chemistry.periodic_table.
+    """
+
+    def __init__(self):
+        self.row_starts = array("q", [0])
+        self.element_indexes = array("B")
+        self.counts = array("q")
+        self.errors = {}  # row -> error message
+
+    def __len__(self):
+        """Return the number of rows (formulas) in the matrix."""
+        return len(self.row_starts) - 1
+
+    def append(self, element_indexes, counts):
+        """Add a row.
+
+        Parameters
+            element_indexes is a sequence of element indexes
+            counts is a sequence with the count of each element, at
+                most MAX_COUNT
+        An OverflowError is raised, and the matrix doesn't change, if a
+        count is more than MAX_COUNT.
+        """
+        counts = array("q", counts)
+        self.element_indexes.extend(element_indexes)
+        self.counts.extend(counts)
+        self.row_starts.append(len(self.counts))
+
+    def append_error(self, message):
+        """Add an empty row for a formula that couldn't be parsed."""
+        self.errors[len(self)] = message
+        self.row_starts.append(len(self.counts))
+
+    def row(self, row):
+        """Return the entries of one row as a compound list of
+        [element_index, quantity] lists.
+        """
+        start, end = self.row_starts[row], self.row_starts[row + 1]
+        return [[index, quantity] for index, quantity
+            in zip(self.element_indexes[start:end], self.counts[start:end])]
+
+    def molar_masses(self, masses=None):
+        """Multiply the matrix by a vector of atomic masses.
+
+        The mass of every entry is computed in one pass over the whole
+        matrix, and then each row is added from left to right, the
+        same order as compute_molar_mass, so each molar mass is
+        exactly equal to the one compute_molar_mass returns.
+
+        Parameters
+            masses is a sequence with the atomic mass of each element
+                index, or None for chemistry.periodic_table.masses
+        Return: a list with the molar mass of each row, or None for
+            the rows in errors.
+        """
+        if masses is None:
+            masses = periodic_table.masses
+        products = list(map(operator.mul,
+            map(masses.__getitem__, self.element_indexes), self.counts))
+        row_starts = self.row_starts
+        # reduce, not sum: sum uses compensated addition since Python
+        # 3.12, which can differ from compute_molar_mass in the last bit.
+        results = [reduce(operator.add, products[row_starts[row]:row_starts[row + 1]], 0.0)
+            for row in range(len(self))]
+        for row in self.errors:
+            results[row] = None
+        return results
+
+
+def parse_formulas(formulas):
+    """Parse many formulas into a CompositionMatrix. A formula that
+    appears more than once is parsed only the first time.
+
+    Parameters
+        formulas is an iterable of formula strings, for example a list
+            or the generator returned from read_formulas
+    Return: a CompositionMatrix with one row for each formula.
+    """
+    matrix = CompositionMatrix()
+    index_of = periodic_table.index_of
+    parsed = {}  # formula -> (element indexes, counts) or an error message
+    for formula in formulas:
+        entry = parsed.get(formula)
+        if entry is None:
+            try:
+                symbol_quantity_list = parse_formula(formula, PERIODIC_TABLE)
+                for symbol, quantity in symbol_quantity_list:
+                    if quantity > MAX_COUNT:
+                        raise FormulaError("invalid formula; too many atoms"
+                            f" of {symbol}: {quantity}")
+                entry = (bytes([index_of[symbol] for symbol, _ in symbol_quantity_list]),
+                    tuple(quantity for _, quantity in symbol_quantity_list))
+            except FormulaError as error:
+                entry = format_error(error)
+            parsed[formula] = entry
+        if isinstance(entry, str):
+            matrix.append_error(entry)
+        else:
+            matrix.append(*entry)
+    return matrix
+
+
+def format_error(error):
+    """Return the message of a FormulaError with the place in the
+    formula where parsing stopped.
+    """
+    if len(error.args) == 3:
+        message, formula, index = error.args
+        return f"{message} at position {index} of {formula}"
+    return str(error)
+
+
+def read_formulas(filename):
+    """Read a text file with one formula on each line.
+
+    Return: a generator of the formulas, without the line ends and
+        the spaces around them. Blank lines are formulas too, so the
+        rows of the matrix stay in step with the lines of the file.
+    """
+    with open(filename, "rt") as text_file:
+        for line in text_file:
+            yield line.strip()
+
+
+def batch_molar_masses(formulas):
+    """Compute the molar masses of many formulas.
+
+    Return: a list with the molar mass of each formula, or None for
+        a formula that couldn't be parsed, and a dictionary from the
+        position of each such formula to its error message.
+    """
+    matrix = parse_formulas(formulas)
+    return matrix.molar_masses(), matrix.errors
@@ -0,0 +1,269 @@
+# Find the elemental compositions of a measured molar mass. Given a
+# mass, a tolerance and a set of elements such as C, H, N, O, P and S,
+# decompose_mass yields every composition whose molar mass, computed
+# with compute_molar_mass, is within the tolerance.
+#
+# The search is a branch and bound over the counts of the heavy
+# elements, from the heaviest to the lightest. A branch is cut as soon
+# as the mass chosen so far is more than the target, or the count of an
+# element can't stay within its ratio to carbon. Carbon and hydrogen
+# are not searched: every mass that c carbons and h hydrogens can add
+# is put in a table in order of mass, once, and the mass left by the
+# heavy elements is looked up in it. The hydrogens are limited by the
+# ring and double bond equivalent (RDBE) 1 + sum(count * (valence -
+# 2)) / 2, which must not be negative, and a whole number RDBE needs a
+# hydrogen count of the right parity, so there is a table for each.
+# The element ratios are the common ranges of the seven golden rules
+# of Kind and Fiehn (2007).
+import argparse  # Import argparse to read the command line options
+import math  # Import math to round the element counts
+from bisect import bisect_left, bisect_right  # Import bisect to search the carbon and hydrogen masses
+from chemistry import PERIODIC_TABLE, ATOMIC_MASS_INDEX, compute_molar_mass
+from molecules import hill_key
+
+# The usual valence of each element, for the RDBE.
+VALENCES = {
+    "H": 1, "B": 3, "C": 4, "N": 3, "O": 2, "F": 1, "Na": 1, "Si": 4,
+    "P": 3, "S": 2, "Cl": 1, "K": 1, "Se": 2, "Br": 1, "I": 1,
+}
+
+# The largest count of each element for each carbon.
+ELEMENT_RATIOS = {"H": 3.1, "N": 1.3, "O": 1.2, "P": 0.3, "S": 0.8, "F": 1.5, "Cl": 0.8, "Br": 0.8, "Si": 0.5}
+
+
+def rdbe(symbol_quantity_list, valences=VALENCES):
+    """Return the ring and double bond equivalent of a composition."""
+    return 1 + sum(quantity * (valences[symbol] - 2)
+        for symbol, quantity in symbol_quantity_list) / 2
+
+
+def _make_table(pairs, bin_width, high):
+    # Sort (mass, carbon, hydrogen) tuples by mass, and mark which
+    # bins of width bin_width have a mass up to high, to rule out most
+    # windows before searching the table. The bins are wider than a
+    # window, so a window is in at most two. Return the bins and the
+    # masses, carbons and hydrogens in order of mass.
+    pairs = sorted(pairs)
+    filled = bytearray(math.floor((high + 1e-9) / bin_width) + 1)
+    for mass, _, _ in pairs:
+        filled[math.floor(mass / bin_width)] = 1
+    return (filled, [mass for mass, _, _ in pairs], [carbon for _, carbon, _ in pairs],
+        [hydrogen for _, _, hydrogen in pairs])
+
+
+def decompose_mass(target, tolerance=0.01, elements=("C", "H", "N", "O", "P", "S"),
+        min_rdbe=0.0, max_rdbe=None, even_electron=True, ratios=ELEMENT_RATIOS,
+        periodic_table_dict=PERIODIC_TABLE, valences=VALENCES):
+    """Find the compositions of a molar mass.
+
+    Parameters
+        target is the measured molar mass in g/mol
+        tolerance is the largest difference in g/mol between the
+            target and the molar mass of a composition
+        elements is a sequence of element symbols
+        min_rdbe and max_rdbe are the smallest and largest ring and
+            double bond equivalent of a composition; max_rdbe None
+            is no limit
+        even_electron is True to keep only compositions with a whole
+            number RDBE, as neutral molecules have
+        ratios is a dictionary from element symbol to the largest
+            count of that element for each carbon, used only when
+            carbon is in elements; None or {} is no limit. With
+            ratios, a composition without carbon, such as H2O, is
+            found only if no element of it has a ratio
+        periodic_table_dict is the periodic table with the atomic
+            masses
+        valences is a dictionary from element symbol to valence
+    Return: a generator of (formula, molar_mass, rdbe) tuples, where
+        formula is the composition in Hill order. The compositions
+        come in order of decreasing count of the heaviest elements.
+    """
+    if tolerance < 0:
+        raise ValueError(f"the tolerance must not be negative: {tolerance}")
+    elements = list(dict.fromkeys(elements))
+    for symbol in elements:
+        if symbol not in periodic_table_dict:
+            raise ValueError(f"unknown element symbol: {symbol}")
+        if symbol not in valences:
+            raise ValueError(f"no valence for element {symbol}")
+    if len(elements) == 0:
+        return
+    ratios = ratios or {}
+    if "C" not in elements:
+        ratios = {}
+    masses = {symbol: periodic_table_dict[symbol][ATOMIC_MASS_INDEX] for symbol in elements}
+
+    # Heavy elements from the heaviest to the lightest, then carbon,
+    # then hydrogen; the last element is solved, not searched.
+    heavy = sorted((symbol for symbol in elements if symbol not in ("C", "H")),
+        key=masses.get, reverse=True)
+    order = heavy + [symbol for symbol in ("C", "H") if symbol in elements]
+    last = order[-1]
+    last_mass = masses[last]
+    last_valence = valences[last]
+    search = order[:-1]
+    order_masses = [masses[symbol] for symbol in search]
+    # Twice the RDBE change of one atom of each searched element.
+    weights = [valences[symbol] - 2 for symbol in search]
+    high = target + tolerance
+    low = target - tolerance
+    counts = [0] * len(search)
+    carbon_mass = masses.get("C")
+    h_ratio = ratios.get("H")
+    # With carbon and hydrogen last, the two are solved together in
+    # carbon_and_hydrogen instead of searching carbon like the others.
+    solve_carbon = last == "H" and len(search) != 0 and search[-1] == "C"
+    depth = len(search) - 1 if solve_carbon else len(search)
+
+    def accept(count, twice_rdbe):
+        # Check a composition with the counts of search and count of
+        # the last element. Return its result tuple or None.
+        if twice_rdbe < 2 * min_rdbe:
+            return None
+        if max_rdbe is not None and twice_rdbe > 2 * max_rdbe:
+            return None
+        if even_electron and twice_rdbe % 2 != 0:
+            return None
+        symbol_quantity_list = [[symbol, quantity]
+            for symbol, quantity in zip(search, counts) if quantity != 0]
+        if count != 0:
+            symbol_quantity_list.append([last, count])
+        if len(symbol_quantity_list) == 0:
+            return None
+        if len(ratios) != 0:
+            carbon = dict(symbol_quantity_list).get("C", 0)
+            for symbol, quantity in symbol_quantity_list:
+                if symbol in ratios and quantity > ratios[symbol] * carbon + 1e-9:
+                    return None
+        molar_mass = compute_molar_mass(symbol_quantity_list, periodic_table_dict)
+        if not low <= molar_mass <= high:
+            return None
+        return hill_key(symbol_quantity_list), molar_mass, twice_rdbe / 2
+
+    def last_element(mass_so_far, units, min_carbon):
+        # units is twice the RDBE of the searched elements, minus 2.
+        results = []
+        first = max(0, math.ceil((low - mass_so_far) / last_mass))
+        end = math.floor((high - mass_so_far) / last_mass)
+        for count in range(first, end + 1):
+            result = accept(count, 2 + units + count * (last_valence - 2))
+            if result is not None:
+                results.append(result)
+        return results
+
+    if solve_carbon:
+        # A table of the masses that carbon and hydrogen can add, in
+        # order of mass, so the counts that fill the mass left by the
+        # heavy elements are found by bisection instead of trying
+        # every count of carbon. The RDBE of at least min_rdbe allows
+        # at most units + 2 C + 2 - 2 min_rdbe hydrogens, and units is
+        # at most the most that the heavy elements can add.
+        most_units = math.floor(high * max([weight / mass
+            for mass, weight in zip(order_masses, weights)], default=0))
+        pairs = []
+        for carbon in range(math.floor(high / carbon_mass) + 1):
+            most_hydrogens = min(math.floor((high - carbon * carbon_mass) / last_mass),
+                most_units + 2 * carbon + 2 - math.ceil(2 * min_rdbe))
+            if h_ratio is not None:
+                most_hydrogens = min(most_hydrogens, math.floor(h_ratio * carbon + 1e-9))
+            pairs.extend((carbon * carbon_mass + hydrogen * last_mass, carbon, hydrogen)
+                for hydrogen in range(most_hydrogens + 1))
+        # A whole number RDBE needs a hydrogen count with the parity
+        # of units, so then there is a table for each parity.
+        bin_width = max(2 * tolerance + 1e-6, high / 1e6)
+        if even_electron:
+            tables = [_make_table([pair for pair in pairs if pair[2] % 2 == parity], bin_width, high)
+                for parity in (0, 1)]
+        else:
+            tables = [_make_table(pairs, bin_width, high)]
+
+    def carbon_and_hydrogen(mass_so_far, units, min_carbon):
+        # units is twice the RDBE of the searched elements, minus 2;
+        # min_carbon is the fewest carbons the element ratios allow.
+        # accept checks the exact mass, so the table is searched with
+        # a little room for rounding.
+        results = []
+        _, pair_masses, pair_carbons, pair_hydrogens = tables[units % 2 if even_electron else 0]
+        start = bisect_left(pair_masses, low - mass_so_far - 1e-9)
+        end = bisect_right(pair_masses, high - mass_so_far + 1e-9)
+        for position in range(start, end):
+            carbon = pair_carbons[position]
+            if carbon < min_carbon:
+                continue
+            counts[-1] = carbon
+            hydrogen = pair_hydrogens[position]
+            result = accept(hydrogen, 2 + units + 2 * carbon - hydrogen)
+            if result is not None:
+                results.append(result)
+        counts[-1] = 0
+        return results
+
+    finish = carbon_and_hydrogen if solve_carbon else last_element
+
+    def branch(level, mass_so_far, units, min_carbon):
+        # min_carbon is the fewest carbons the element ratios allow for
+        # the counts chosen so far. The last searched level calls
+        # finish itself, which saves a generator for every count.
+        mass = order_masses[level]
+        remaining = high - mass_so_far
+        weight = weights[level]
+        last_level = level + 1 == depth
+        ratio = ratios.get(search[level])
+        end = math.floor(remaining / mass)
+        if ratio == 0:
+            end = 0  # A ratio of 0 allows none of this element
+        for count in range(end, -1, -1):
+            carbon_needed = min_carbon
+            if ratio is not None and count != 0:
+                carbon_needed = max(min_carbon, math.ceil(count / ratio - 1e-9))
+                if count * mass + carbon_needed * carbon_mass > remaining:
+                    continue  # Too few carbons would be left for this many atoms
+            counts[level] = count
+            mass_after = mass_so_far + count * mass
+            units_after = units + count * weight
+            if not last_level:
+                yield from branch(level + 1, mass_after, units_after, carbon_needed)
+                continue
+            if solve_carbon:
+                # Skip the table search when no mass of the table is
+                # in the bins of the window.
+                filled = tables[units_after % 2 if even_electron else 0][0]
+                window_low = low - mass_after - 1e-9
+                if not (filled[int((high - mass_after + 1e-9) / bin_width)]
+                        or filled[int(window_low / bin_width) if window_low > 0 else 0]):
+                    continue
+            results = finish(mass_after, units_after, carbon_needed)
+            if len(results) != 0:
+                yield from results
+        counts[level] = 0
+
+    if depth == 0:
+        yield from finish(0.0, 0, 0)
+    else:
+        yield from branch(0, 0.0, 0, 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find the elemental compositions of a molar mass.")
+    parser.add_argument("mass", type=float, help="the measured molar mass in g/mol")
+    parser.add_argument("--tolerance", type=float, default=0.01, help="the tolerance in g/mol")
+    parser.add_argument("--ppm", type=float, help="the tolerance in parts per million of the mass")
+    parser.add_argument("--elements", default="C H N O P S", help="the element symbols, separated by spaces")
+    parser.add_argument("--min-rdbe", type=float, default=0.0, help="the smallest ring and double bond equivalent")
+    parser.add_argument("--max-rdbe", type=float, help="the largest ring and double bond equivalent")
+    parser.add_argument("--radicals", action="store_true", help="also keep compositions with a half RDBE")
+    parser.add_argument("--no-ratios", action="store_true", help="don't limit the element counts per carbon")
+    args = parser.parse_args(argv)
+
+    tolerance = args.tolerance if args.ppm is None else args.mass * args.ppm * 1e-6
+    count = 0
+    for formula, molar_mass, equivalents in decompose_mass(args.mass, tolerance,
+            args.elements.split(), args.min_rdbe, args.max_rdbe, not args.radicals,
+            None if args.no_ratios else ELEMENT_RATIOS):
+        print(f"{formula:24} {molar_mass:12.5f} {molar_mass - args.mass:+9.5f}  RDBE {equivalents:g}")
+        count += 1
+    print(f"{count} compositions")
+
+
+if __name__ == "__main__":
+    main()
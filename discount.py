@@ -1,16 +1,17 @@
 print()
 from datetime import datetime
+from pricing_rules import LARGE_ORDER_DISCOUNT_RULES, load_pricing_rules
 
-shop_sales_tax_rate = .10
 Sales_tax_rate = .06 
 
 subtotal = float(input("Enter your sub total: "))
 
 current_date_and_time = datetime.now()
-weekday = current_date_and_time.weekday()
+discount_rules = load_pricing_rules(default_rows=LARGE_ORDER_DISCOUNT_RULES)
+discount_rate = discount_rules.order_rate(current_date_and_time, subtotal)
 
-if subtotal >= 50 and (weekday==1 or weekday==2 ):
-    discount = round(subtotal * shop_sales_tax_rate, 1)
+if discount_rate > 0:
+    discount = round(subtotal * discount_rate, 1)
     print (f"the discount amount is: {discount:.1f}")
 
     subtotal -= discount
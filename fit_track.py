@@ -3,6 +3,10 @@
 # Purpose: This program is designed to track fitness activities and manage calorie intake. It allows users to log their activities and food consumption, calculates their Basal Metabolic Rate (BMR) and Total Daily Energy Expenditure (TDEE), and generates progress reports to help users monitor their fitness goals and make informed decisions about their diet and exercise routines.
 
 from datetime import datetime
+from pricing_rules import FIT_TRACK_DISCOUNT_RULES, load_pricing_rules
+
+# 10% off on Tuesday and Wednesday and every day before 11 AM
+discount_rules = load_pricing_rules(default_rows=FIT_TRACK_DISCOUNT_RULES)
 
 def calculate_bmr(weight, height, age, gender):
     """
@@ -229,7 +233,7 @@ def generate_report(user_profile, activities, foods):
     total_calories_burned = sum(activity['calories'] for activity in activities)
     total_calories_consumed = sum(food['calories'] for food in foods)
     
-    discount = 0.10 if datetime.now().weekday() in [1, 2] or datetime.now().hour < 11 else 0
+    discount = discount_rules.order_rate(datetime.now())
     discounted_calories = total_calories_consumed * (1 - discount)
     
     report['calories_burned'] = total_calories_burned
@@ -1,3 +1,8 @@
+from collections import OrderedDict
+from collections.abc import Mapping
+from types import MappingProxyType
+import threading
+
 
 class FormulaError(ValueError):
     """FormulaError is the type of error that the parse_formula
@@ -12,17 +17,169 @@ def parse_formula(formula, periodic_table_dict):
     "H2O" to [["H", 2], ["O", 1]] and
     "PO4H2(CH2)12CH3" to [["P", 1], ["O", 4], ["H", 29], ["C", 13]]
 
+    The formula is read once from left to right. Each open
+    parenthesis pushes a new group on a stack, so there is no limit
+    on how deeply groups can be nested, and element symbols are found
+    with a lookup table built from periodic_table_dict instead of
+    slicing the formula. The lookup table is kept between calls. For
+    a read-only view like chemistry.PERIODIC_TABLE it is used as it
+    is, but the symbols of a dictionary are compared with it on every
+    call in case the dictionary changed, which makes short formulas
+    slower to parse with a dictionary.
+
+    Parameters
+        formula is a string that contains a chemical formula
+        periodic_table_dict is the compound dictionary returned
+            from make_periodic_table, or chemistry.PERIODIC_TABLE
+    Return: a compound list that contains chemical symbols and
+        quantities like this [["Fe", 2], ["O", 3]]
+    """
+    assert isinstance(formula, str), \
+        "wrong data type for parameter formula; " \
+        f"formula is a {type(formula)} but must be a string"
+    assert isinstance(periodic_table_dict, Mapping), \
+        "wrong data type for parameter periodic_table_dict; " \
+        f"periodic_table_dict is a {type(periodic_table_dict)} " \
+        "but must be a dictionary"
+
+    symbol_lookup = _symbol_lookup(periodic_table_dict)
+    length = len(formula)
+    elem_dict = {}
+    stack = []  # (enclosing elem_dict, index of the open parenthesis)
+    index = 0
+    while index < length:
+        ch = formula[index]
+        if ch == "(":
+            stack.append((elem_dict, index))
+            elem_dict = {}
+            index += 1
+        elif ch == ")":
+            if len(stack) == 0:
+                raise FormulaError("invalid formula; "
+                    "unmatched close parenthesis",
+                    formula, index)
+            group_dict = elem_dict
+            elem_dict, _ = stack.pop()
+            quant, index = _parse_quant(formula, index + 1)
+            for symbol, count in group_dict.items():
+                elem_dict[symbol] = elem_dict.get(symbol, 0) + count * quant
+        elif ch.isalpha():
+            # Try a two letter symbol first, then a one letter symbol.
+            second_letters = symbol_lookup.get(ch, _NO_SYMBOLS)
+            symbol = second_letters.get(formula[index + 1]) \
+                if index + 1 < length else None
+            if symbol is not None:
+                index += 2
+            else:
+                symbol = second_letters.get("")
+                if symbol is None:
+                    raise FormulaError("invalid formula; "
+                        f"unknown element symbol: {ch}",
+                        formula, index)
+                index += 1
+            quant, index = _parse_quant(formula, index)
+            elem_dict[symbol] = elem_dict.get(symbol, 0) + quant
+        else:
+            if ch.isdecimal():
+                # Decimal digit not preceded by an
+                # element symbol or close parenthesis
+                message = "invalid formula"
+            else:
+                # Illegal character: [^()0-9a-zA-Z]
+                message = "invalid formula; " + \
+                    f"illegal character: {ch}"
+            raise FormulaError(message, formula, index)
+    if len(stack) != 0:
+        raise FormulaError("invalid formula; "
+            "unmatched open parenthesis",
+            formula, stack[-1][1])
+
+    # Return the compound list of element symbols and
+    # quantities. Each element in the compound list
+    # will be a list in this form: ["symbol", quantity]
+    return list(elem_dict.items())
+
+
+def _parse_quant(formula, index):
+    quant = 1
+    if index < len(formula) and formula[index].isdecimal():
+        if formula[index] == "0":
+            raise FormulaError("invalid formula, "
+                "quantity begins with zero (0), perhaps "
+                "you meant to type capital O for Oxygen "
+                "instead of zero", formula, index)
+        start = index
+        index += 1
+        while index < len(formula) and formula[index].isdecimal():
+            index += 1
+        quant = int(formula[start:index])
+    return quant, index
+
+
+_NO_SYMBOLS = {}
+_symbol_lookups = OrderedDict()  # id -> (table, symbols, lookup) of the last few tables
+_SYMBOL_LOOKUPS_SIZE = 8
+
+
+def _symbol_lookup(periodic_table_dict):
+    """Return a dictionary from the first letter of each symbol in
+    periodic_table_dict to a dictionary from the second letter, or ""
+    for a one letter symbol, to the symbol. The lookups of the last
+    few tables are kept and used again while the table has the same
+    symbols.
+    """
+    return _symbol_entry(periodic_table_dict)[2]
+
+
+def _table_symbols(periodic_table_dict):
+    """Return a frozenset of the symbols in periodic_table_dict, which
+    are all that parse_formula uses from the table.
+    """
+    return _symbol_entry(periodic_table_dict)[1]
+
+
+def _symbol_entry(periodic_table_dict):
+    # Return (table, frozenset of its symbols, symbol lookup). The
+    # symbols of a dictionary are compared on every call, because it
+    # may have changed since its lookup was made. A read-only view,
+    # such as chemistry.PERIODIC_TABLE, is taken not to change, which
+    # saves comparing its symbols every time.
+    entry = _symbol_lookups.get(id(periodic_table_dict))
+    if entry is not None and entry[0] is periodic_table_dict \
+            and (type(periodic_table_dict) is MappingProxyType
+                or periodic_table_dict.keys() == entry[1]):
+        return entry
+
+    symbols = frozenset(periodic_table_dict)
+    lookup = {}
+    for symbol in symbols:
+        if isinstance(symbol, str) and 1 <= len(symbol) <= 2:
+            lookup.setdefault(symbol[0], {})[symbol[1:]] = symbol
+    entry = (periodic_table_dict, symbols, lookup)
+    _symbol_lookups[id(periodic_table_dict)] = entry
+    if len(_symbol_lookups) > _SYMBOL_LOOKUPS_SIZE:
+        _symbol_lookups.popitem(last=False)
+    return entry
+
+
+def parse_formula_recursive(formula, periodic_table_dict):
+    """The first version of parse_formula, which calls itself for
+    each level of parentheses. It returns the same results and
+    raises the same errors as parse_formula, but a formula nested
+    deeper than Python's recursion limit raises RecursionError. It
+    is kept to compare parse_formula with in tests and benchmarks.
+
     Parameters
         formula is a string that contains a chemical formula
         periodic_table_dict is the compound dictionary returned
-            from make_periodic_table
+            from make_periodic_table, or chemistry.PERIODIC_TABLE
     Return: a compound list that contains chemical symbols and
         quantities like this [["Fe", 2], ["O", 3]]
     """
     assert isinstance(formula, str), \
         "wrong data type for parameter formula; " \
         f"formula is a {type(formula)} but must be a string"
-    assert isinstance(periodic_table_dict, dict), \
+    assert isinstance(periodic_table_dict, Mapping), \
         "wrong data type for parameter periodic_table_dict; " \
         f"periodic_table_dict is a {type(periodic_table_dict)} " \
         "but must be a dictionary"
@@ -102,3 +259,105 @@ def parse_formula(formula, periodic_table_dict):
     # will be a list in this form: ["symbol", quantity]
     elem_dict, _ = parse_r(formula, 0, 0)
     return list(elem_dict.items())
+
+
+class FormulaCache:
+    """A cache of parse_formula results with a size limit. When the
+    cache is full, the formula that was used least recently is
+    removed (LRU). Invalid formulas are cached too, and raise the
+    same FormulaError every time.
+
+    parse_formula only uses the symbols of a periodic table, so a
+    result is stored under the formula and the frozenset of the
+    table's symbols, or a version given by the caller. Tables with
+    the same symbols share results, even when make_periodic_table
+    builds a new table for every call, and the cache keeps no
+    reference to the tables themselves.
+    """
+
+    def __init__(self, maxsize=4096):
+        """Parameters
+            maxsize: the largest number of formulas to keep.
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._results = OrderedDict()  # key -> (True, tuple of pairs) or (False, error args)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._results)
+
+    def parse(self, formula, periodic_table_dict, table_version=None):
+        """Return the same list as parse_formula(formula,
+        periodic_table_dict), from the cache when possible. Each call
+        returns a new list, so changing it doesn't change the cache.
+
+        Parameters
+            formula is a string that contains a chemical formula
+            periodic_table_dict is the compound dictionary returned
+                from make_periodic_table
+            table_version is any hashable value that names the
+                contents of periodic_table_dict, or None to use the
+                symbols of the dictionary. Finding the symbols of a
+                dictionary compares all of them with the ones seen
+                before, so a caller that parses many formulas with a
+                table that doesn't change can pass a version, such
+                as the table's frozenset of symbols, to skip that.
+                Read-only views like chemistry.PERIODIC_TABLE are
+                never compared.
+        """
+        if table_version is None:
+            table_version = _table_symbols(periodic_table_dict)
+        key = (formula, table_version)
+
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is not None:
+                self.hits += 1
+                self._results.move_to_end(key)  # Most recently used
+        if entry is None:
+            try:
+                entry = (True, tuple(parse_formula(formula, periodic_table_dict)))
+            except FormulaError as error:
+                entry = (False, error.args)
+            with self._lock:
+                self.misses += 1
+                self._results[key] = entry
+                if len(self._results) > self.maxsize:
+                    self._results.popitem(last=False)  # Least recently used
+                    self.evictions += 1
+
+        is_valid, value = entry
+        if not is_valid:
+            raise FormulaError(*value)
+        return list(value)
+
+    def stats(self):
+        """Return a dictionary with the keys hits, misses, evictions,
+        size and maxsize.
+        """
+        return {"hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "size": len(self._results),
+                "maxsize": self.maxsize}
+
+    def clear(self):
+        """Remove every formula from the cache and set the counters to
+        zero.
+        """
+        with self._lock:
+            self._results.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+default_cache = FormulaCache()
+
+
+def parse_formula_cached(formula, periodic_table_dict):
+    """Parse a formula like parse_formula does, using default_cache
+    so a formula that was parsed before is not parsed again.
+    """
+    return default_cache.parse(formula, periodic_table_dict)
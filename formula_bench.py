@@ -0,0 +1,106 @@
+# A benchmark of parse_formula in formula.py. It times the stack based
+# parse_formula and the first, recursive version on generated formulas
+# from 10 to 1,000,000 characters long: long flat chains, many small
+# groups, and groups nested inside each other. The recursive version
+# can't parse groups nested deeper than Python's recursion limit; the
+# table shows "recursion" for those.
+#
+# The formulas are parsed with chemistry.PERIODIC_TABLE unless --dict
+# is given. parse_formula compares the symbols of a plain dictionary
+# with the ones it saw before on every call, so with a dictionary the
+# shortest formulas parse slower than with the recursive version.
+import argparse  # Import argparse to read the command line options
+import time  # Import time to measure how long each parse takes
+from chemistry import PERIODIC_TABLE
+from formula import parse_formula, parse_formula_recursive
+
+
+def make_formula(kind, length):
+    """Make a formula that is about length characters long.
+
+    Parameters
+        kind: "flat" for a chain like CH3CH2CH2...CH3, "groups" for
+            many groups like (C2H4O)3(C2H4O)3... or "nested" for
+            groups inside groups like ((((H2O))))
+        length: the number of characters in the formula.
+    Return: the formula.
+    """
+    if kind == "flat":
+        return "CH3" + "CH2" * max(0, (length - 6) // 3) + "CH3"
+    if kind == "groups":
+        return "(C2H4O)3" * max(1, length // 8)
+    if kind == "nested":
+        depth = max(1, (length - 3) // 2)
+        return "(" * depth + "H2O" + ")" * depth
+    raise ValueError(f"unknown kind of formula: {kind}")
+
+
+def time_parser(parser, formula, repeat, table=PERIODIC_TABLE):
+    """Return the smallest time in seconds that parser took to parse
+    formula with table in repeat runs, or None if it hit the
+    recursion limit.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            parser(formula, table)
+        except RecursionError:
+            return None
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def run_benchmark(lengths, kinds=("flat", "groups", "nested"), table=PERIODIC_TABLE):
+    """Time both parsers for every kind of formula and length, using
+    table as the periodic table.
+
+    Return: a list of dictionaries with the keys kind, length,
+        recursive and iterative (seconds, or None for the recursion
+        limit).
+    """
+    results = []
+    for kind in kinds:
+        for length in lengths:
+            formula = make_formula(kind, length)
+            repeat = max(1, min(1000, 100000 // len(formula)))
+            expected = None
+            recursive = time_parser(parse_formula_recursive, formula, repeat, table)
+            if recursive is not None:
+                expected = parse_formula_recursive(formula, table)
+            iterative = time_parser(parse_formula, formula, repeat, table)
+            if expected is not None and parse_formula(formula, table) != expected:
+                raise AssertionError(f"the parsers disagree on a {kind} formula of length {length}")
+            results.append({"kind": kind, "length": len(formula),
+                "recursive": recursive, "iterative": iterative})
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark parse_formula.")
+    parser.add_argument("--lengths", type=int, nargs="+",
+        default=[10, 100, 1000, 10**4, 10**5, 10**6],
+        help="the lengths of the generated formulas")
+    parser.add_argument("--dict", action="store_true",
+        help="parse with a plain dictionary copy of the periodic table")
+    args = parser.parse_args(argv)
+    table = dict(PERIODIC_TABLE) if args.dict else PERIODIC_TABLE
+
+    print(f"{'kind':8} {'length':>9} {'recursive':>12} {'iterative':>12} {'speedup':>8}")
+    for result in run_benchmark(args.lengths, table=table):
+        iterative = result["iterative"]
+        if result["recursive"] is None:
+            recursive, speedup = "recursion", ""
+        else:
+            recursive = f"{result['recursive'] * 1000:10.3f}ms"
+            speedup = f"{result['recursive'] / iterative:7.2f}x"
+        print(f"{result['kind']:8} {result['length']:9} {recursive:>12}"
+            f" {iterative * 1000:10.3f}ms {speedup:>8}")
+    if args.dict:
+        print("parse_formula compares the symbols of a dictionary on every call,"
+            " so short formulas may parse slower than with PERIODIC_TABLE.")
+
+
+if __name__ == "__main__":
+    main()
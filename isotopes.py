@@ -0,0 +1,190 @@
+# Monoisotopic masses and isotope distributions of chemical formulas.
+# compute_molar_mass in chemistry.py returns the average mass of a
+# molecule; a mass spectrometer sees a pattern of peaks instead, one
+# for each number of extra neutrons in the molecule.
+#
+# The pattern of one atom of an element is a polynomial: the
+# coefficient of x**k is the probability that the atom has k more
+# neutrons than the lightest isotope. The pattern of a molecule is the
+# product of the polynomials of all its atoms. Instead of multiplying
+# n copies of the same polynomial for an element with n atoms,
+# isotope_distribution squares it about log2(n) times, and after every
+# multiplication drops the peaks at the ends that are too small next to
+# the tallest one to matter, so even a protein with thousands of atoms
+# takes milliseconds. Each peak keeps the average exact mass of the
+# isotope combinations that fall in it.
+import argparse  # Import argparse to read the command line options
+from chemistry import ISOTOPE_ROWS, PERIODIC_TABLE
+from formula import FormulaError, parse_formula
+
+
+def make_isotope_table(rows=ISOTOPE_ROWS):
+    """Group isotope rows by element.
+
+    Parameters
+        rows is a compound list of [symbol, mass_number, isotopic_mass,
+            abundance] lists, like ISOTOPE_ROWS
+    Return: a dictionary from element symbol to a tuple of
+        (mass_number, isotopic_mass, abundance) tuples in order of
+        mass number.
+    """
+    table = {}
+    for symbol, mass_number, isotopic_mass, abundance in rows:
+        table.setdefault(symbol, []).append((mass_number, isotopic_mass, abundance))
+    return {symbol: tuple(sorted(isotopes)) for symbol, isotopes in table.items()}
+
+
+# The isotopes of each element, built once from ISOTOPE_ROWS.
+ISOTOPES = make_isotope_table()
+
+
+def _isotopes_of(symbol, isotope_table):
+    isotopes = isotope_table.get(symbol)
+    if isotopes is None:
+        raise ValueError(f"no isotope data for element {symbol}")
+    return isotopes
+
+
+def monoisotopic_mass(symbol_quantity_list, isotope_table=ISOTOPES):
+    """Compute the monoisotopic mass of a formula: the mass of the
+    molecule made of the most abundant isotope of each element.
+
+    Parameters
+        symbol_quantity_list is a compound list returned from
+            parse_formula
+        isotope_table is a dictionary like ISOTOPES
+    Return: the monoisotopic mass in u.
+    """
+    total_mass = 0.0
+    for symbol, quantity in symbol_quantity_list:
+        isotopes = _isotopes_of(symbol, isotope_table)
+        _, isotopic_mass, _ = max(isotopes, key=lambda isotope: isotope[2])
+        total_mass += isotopic_mass * quantity
+    return total_mass
+
+
+def _element_polynomial(isotopes):
+    # Coefficients by neutron count above the lightest isotope: the
+    # probability and the probability times the exact mass of each.
+    lightest = isotopes[0][0]
+    size = isotopes[-1][0] - lightest + 1
+    probabilities = [0.0] * size
+    mass_sums = [0.0] * size
+    for mass_number, isotopic_mass, abundance in isotopes:
+        probabilities[mass_number - lightest] += abundance
+        mass_sums[mass_number - lightest] += abundance * isotopic_mass
+    return lightest, probabilities, mass_sums
+
+
+def _multiply(first, second, cutoff):
+    # Multiply two isotope polynomials, then drop the smallest
+    # coefficients from both ends while they are below cutoff times
+    # the largest coefficient.
+    start_a, probabilities_a, mass_sums_a = first
+    start_b, probabilities_b, mass_sums_b = second
+    probabilities = [0.0] * (len(probabilities_a) + len(probabilities_b) - 1)
+    mass_sums = [0.0] * len(probabilities)
+    for i, probability_a in enumerate(probabilities_a):
+        if probability_a == 0:
+            continue
+        mass_sum_a = mass_sums_a[i]
+        for j, probability_b in enumerate(probabilities_b):
+            if probability_b == 0:
+                continue
+            probabilities[i + j] += probability_a * probability_b
+            # (mass_a + mass_b) * p_a * p_b, with the masses carried as
+            # probability times mass.
+            mass_sums[i + j] += mass_sum_a * probability_b + mass_sums_b[j] * probability_a
+    smallest = cutoff * max(probabilities)
+    low = 0
+    high = len(probabilities)
+    while high - low > 1 and probabilities[low] < smallest:
+        low += 1
+    while high - low > 1 and probabilities[high - 1] < smallest:
+        high -= 1
+    return start_a + start_b + low, probabilities[low:high], mass_sums[low:high]
+
+
+def _power(polynomial, exponent, cutoff):
+    # Raise an isotope polynomial to a power by repeated squaring.
+    # What a multiplication drops is multiplied again by the rest of
+    # the power, at most exponent times, so the cutoff is divided by
+    # the exponent.
+    cutoff /= exponent
+    result = None
+    while exponent > 0:
+        if exponent & 1:
+            result = polynomial if result is None else _multiply(result, polynomial, cutoff)
+        exponent >>= 1
+        if exponent > 0:
+            polynomial = _multiply(polynomial, polynomial, cutoff)
+    return result
+
+
+def isotope_distribution(symbol_quantity_list, threshold=1e-4, isotope_table=ISOTOPES):
+    """Compute the isotope distribution of a formula.
+
+    Peaks are grouped by the number of extra neutrons, which is what a
+    mass spectrometer of ordinary resolution sees; the mass of a peak
+    is the average exact mass of the isotope combinations in it.
+
+    Parameters
+        symbol_quantity_list is a compound list returned from
+            parse_formula; a symbol may appear more than once
+        threshold is the smallest peak to keep, as a fraction of the
+            tallest peak. While multiplying, the peaks at the ends
+            below threshold / 1000 of the tallest peak of each product
+            are dropped, and below threshold / 1000 / n while raising
+            an element's polynomial to the power n, because what is
+            dropped early is multiplied up to n times. Dropping only
+            makes peaks smaller, so each probability is at most the
+            exact one; all of them together are short by about
+            threshold / 1000 or less. A threshold of 0 drops nothing.
+        isotope_table is a dictionary like ISOTOPES
+    Return: a compound list of [mass, probability] lists in order of
+        mass; the probabilities of all the peaks, kept or not, add up
+        to 1.
+    """
+    if threshold < 0:
+        raise ValueError(f"the threshold must not be negative: {threshold}")
+    counts = {}
+    for symbol, quantity in symbol_quantity_list:
+        counts[symbol] = counts.get(symbol, 0) + quantity
+    cutoff = threshold / 1000
+    result = (0, [1.0], [0.0])
+    for symbol, quantity in counts.items():
+        if quantity == 0:
+            continue
+        element = _power(_element_polynomial(_isotopes_of(symbol, isotope_table)), quantity, cutoff)
+        result = _multiply(result, element, cutoff)
+
+    _, probabilities, mass_sums = result
+    tallest = max(probabilities)
+    return [[mass_sum / probability, probability]
+        for probability, mass_sum in zip(probabilities, mass_sums)
+        if probability > 0 and probability >= threshold * tallest]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print the isotope distribution of chemical formulas.")
+    parser.add_argument("formulas", nargs="+", help="the chemical formulas")
+    parser.add_argument("--threshold", type=float, default=1e-3,
+        help="the smallest peak to print, as a fraction of the tallest peak")
+    args = parser.parse_args(argv)
+
+    for formula in args.formulas:
+        try:
+            symbol_quantity_list = parse_formula(formula, PERIODIC_TABLE)
+            peaks = isotope_distribution(symbol_quantity_list, args.threshold)
+            mass = monoisotopic_mass(symbol_quantity_list)
+        except (FormulaError, ValueError) as error:
+            print(f"{formula}: {error.args[0]}")
+            continue
+        tallest = max(probability for _, probability in peaks)
+        print(f"{formula}: monoisotopic mass {mass:.5f}")
+        for peak_mass, probability in peaks:
+            print(f"    {peak_mass:12.5f} {probability * 100:9.4f}% {probability / tallest * 100:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# A reverse lookup from a measured mass to known compounds. MassIndex
+# computes the molar mass of every composition in a MoleculeIndex with
+# compute_molar_mass and keeps the masses in one sorted array, so the
+# compounds within a tolerance of a mass are found by two binary
+# searches, O(log n + k) for k compounds. search_many answers thousands
+# of targets in one call by searching them in order of mass, each
+# search starting where the one before it ended.
+import argparse  # Import argparse to read the command line options
+from array import array  # Import array to store the sorted masses
+from bisect import bisect_left, bisect_right  # Import bisect for the binary searches
+from chemistry import PERIODIC_TABLE, compute_molar_mass, known_molecules, load_molecules
+from formula import parse_formula
+
+
+def tolerance_of(target, tolerance=0.0, ppm=None):
+    """Return the absolute tolerance in g/mol for a target mass.
+
+    Parameters
+        target is the measured mass
+        tolerance is an absolute tolerance in g/mol
+        ppm is a tolerance in parts per million of target, or None;
+            when both are given the larger tolerance is used
+    """
+    if ppm is not None:
+        tolerance = max(tolerance, abs(target) * ppm * 1e-6)
+    if tolerance < 0:
+        raise ValueError(f"the tolerance must not be negative: {tolerance}")
+    return tolerance
+
+
+class MassIndex:
+    """The compositions of a MoleculeIndex sorted by molar mass."""
+
+    def __init__(self, molecule_index, periodic_table_dict=PERIODIC_TABLE):
+        pairs = sorted((compute_molar_mass(parse_formula(key, periodic_table_dict),
+            periodic_table_dict), key) for key in molecule_index)
+        self.molecules = molecule_index
+        self.masses = array("d", [mass for mass, _ in pairs])
+        self.keys = [key for _, key in pairs]
+
+    def __len__(self):
+        """Return the number of compositions in the index."""
+        return len(self.keys)
+
+    def window(self, low, high, start=0):
+        """Return the first and past the last position of the masses
+        from low to high, both included. The search starts at start.
+        """
+        first = bisect_left(self.masses, low, start)
+        return first, bisect_right(self.masses, high, first)
+
+    def search(self, target, tolerance=0.0, ppm=None):
+        """Find the compositions within a tolerance of a mass.
+
+        Parameters
+            target is the measured mass in g/mol
+            tolerance and ppm are the same as in tolerance_of
+        Return: a list of (key, molar_mass) tuples in order of mass.
+        """
+        tolerance = tolerance_of(target, tolerance, ppm)
+        first, end = self.window(target - tolerance, target + tolerance)
+        return list(zip(self.keys[first:end], self.masses[first:end]))
+
+    def search_many(self, targets, tolerance=0.0, ppm=None):
+        """Find the compositions within a tolerance of many masses.
+
+        The targets are searched from the smallest to the largest.
+        Because the lower end of each window never moves down, each
+        binary search only looks at the masses above the last window.
+
+        Parameters
+            targets is a sequence of measured masses
+            tolerance and ppm are the same as in tolerance_of
+        Return: a list with the result of search for each target, in
+            the same order as targets.
+        """
+        results = [None] * len(targets)
+        start = 0
+        for position in sorted(range(len(targets)), key=targets.__getitem__):
+            target = targets[position]
+            window_tolerance = tolerance_of(target, tolerance, ppm)
+            first, end = self.window(target - window_tolerance,
+                target + window_tolerance, start)
+            results[position] = list(zip(self.keys[first:end], self.masses[first:end]))
+            start = first
+        return results
+
+    def names(self, key):
+        """Return a tuple of the names of a composition."""
+        return self.molecules.names_of_key(key)
+
+
+def read_targets(filename):
+    """Read a text file with one mass on each line."""
+    with open(filename, "rt") as text_file:
+        return [float(line) for line in text_file if line.strip() != ""]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find the known compounds near a measured mass.")
+    parser.add_argument("masses", type=float, nargs="*", help="the measured masses in g/mol")
+    parser.add_argument("--targets", help="a text file with one measured mass on each line")
+    parser.add_argument("--molecules",
+        help="a molecule index file, or a CSV file of formulas and names (default: the built in molecules)")
+    parser.add_argument("--tolerance", type=float, default=0.01, help="the tolerance in g/mol")
+    parser.add_argument("--ppm", type=float, help="the tolerance in parts per million of each mass")
+    args = parser.parse_args(argv)
+
+    molecules = known_molecules if args.molecules is None else load_molecules(args.molecules)
+    index = MassIndex(molecules)
+    targets = list(args.masses)
+    if args.targets is not None:
+        targets.extend(read_targets(args.targets))
+    tolerance = 0.0 if args.ppm is not None else args.tolerance
+    for target, matches in zip(targets, index.search_many(targets, tolerance, args.ppm)):
+        print(f"{target}: {len(matches)} compounds")
+        for key, mass in matches:
+            print(f"    {mass:.5f} {key} {'; '.join(index.names(key))}")
+
+
+if __name__ == "__main__":
+    main()
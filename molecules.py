@@ -0,0 +1,239 @@
+# An index of known molecules for chemistry.py. Molecules are keyed by
+# their composition written in Hill order: carbon first, hydrogen
+# second and the other elements in alphabetical order, or every
+# element in alphabetical order if there is no carbon. "C2H5OH",
+# "CH3CH2OH" and "C2H6O" all have the key "C2H6O", so a formula finds
+# its names however the user writes the atoms. A composition can have
+# many names (ethanol and dimethyl ether are both C2H6O); all of them
+# are kept in the order they were first read.
+#
+# A compound file with millions of names can be converted once into an
+# index file. The index file holds the keys, the names and the place
+# where each key's names start as three compressed blocks, so loading
+# it is three decompressions, two splits and one dictionary build.
+import argparse  # Import argparse to read the command line options
+import csv  # Import the csv module to read compound files
+import struct  # Import struct to pack the index file header
+import sys  # Import sys to read the byte order of this computer
+import zlib  # Import zlib to compress the blocks of an index file
+from array import array  # Import array to store where each key's names start
+from formula import FormulaError, parse_formula
+
+MAGIC = b"KMOL0001"  # First bytes of every index file
+HEADER = struct.Struct("<8sQQQQQ")  # magic, keys, names, key bytes, name bytes, start bytes
+
+
+class MoleculeError(ValueError):
+    """MoleculeError is the type of error raised if an index file is
+    invalid.
+    """
+
+
+def hill_key(symbol_quantity_list):
+    """Write a composition in Hill order.
+
+    Parameters
+        symbol_quantity_list is a compound list of [symbol, quantity]
+            lists like the one parse_formula returns; a symbol may
+            appear more than once
+    Return: the composition as a string, for example "C2H6O".
+    """
+    counts = {}
+    for symbol, quantity in symbol_quantity_list:
+        counts[symbol] = counts.get(symbol, 0) + quantity
+    if "C" in counts:
+        order = ["C"]
+        if "H" in counts:
+            order.append("H")
+        order.extend(sorted(symbol for symbol in counts if symbol not in ("C", "H")))
+    else:
+        order = sorted(counts)
+    return "".join(symbol if counts[symbol] == 1 else f"{symbol}{counts[symbol]}"
+        for symbol in order if counts[symbol] != 0)
+
+
+class MoleculeIndex:
+    """Names of known molecules keyed by Hill order composition.
+
+    Create one with from_pairs, from_csv or load. Keys are numbered
+    in sorted order; the names of key i are
+    names[starts[i]:starts[i + 1]].
+    """
+
+    def __init__(self, keys, names, starts):
+        if len(starts) != len(keys) + 1 or starts[-1] != len(names):
+            raise MoleculeError("the keys, names and starts of a molecule index don't agree")
+        self._number_of = dict(zip(keys, range(len(keys))))
+        self._names = names
+        self._starts = starts
+
+    @classmethod
+    def from_pairs(cls, pairs, periodic_table_dict):
+        """Build an index from (formula, name) pairs.
+
+        Parameters
+            pairs is an iterable of (formula, name) tuples
+            periodic_table_dict is the periodic table used to parse
+                the formulas
+        Return: the index and the number of pairs whose formula
+            couldn't be parsed and were skipped.
+        """
+        groups = {}  # Hill key -> {name: None}, a set that keeps its order
+        parsed = {}  # formula -> Hill key, or None if it couldn't be parsed
+        skipped = 0
+        for formula, name in pairs:
+            name = " ".join(name.split())  # Names can't hold line ends
+            if formula in parsed:
+                key = parsed[formula]
+            else:
+                try:
+                    key = hill_key(parse_formula(formula, periodic_table_dict))
+                except FormulaError:
+                    key = None
+                parsed[formula] = key
+            if key is None or key == "" or name == "":
+                skipped += 1
+                continue
+            groups.setdefault(key, {})[name] = None
+
+        keys = sorted(groups)
+        names = []
+        starts = array("I", [0])
+        for key in keys:
+            names.extend(groups[key])
+            starts.append(len(names))
+        return cls(keys, names, starts), skipped
+
+    @classmethod
+    def from_csv(cls, filename, periodic_table_dict):
+        """Build an index from a CSV file with the columns formula and
+        name. A first row whose formula column is "formula" is a header.
+
+        Return: the index and the number of skipped rows.
+        """
+        def pairs():
+            with open(filename, "rt", newline="") as csv_file:
+                reader = csv.reader(csv_file)
+                for row in reader:
+                    if len(row) < 2:
+                        continue
+                    if reader.line_num == 1 and row[0].strip().lower() == "formula":
+                        continue
+                    yield row[0].strip(), row[1]
+
+        return cls.from_pairs(pairs(), periodic_table_dict)
+
+    @classmethod
+    def load(cls, filename):
+        """Read an index file written by save."""
+        with open(filename, "rb") as index_file:
+            data = index_file.read()
+        if len(data) < HEADER.size:
+            raise MoleculeError(f"{filename} is too short to be a molecule index")
+        magic, key_count, name_count, key_bytes, name_bytes, start_bytes = \
+            HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise MoleculeError(f"{filename} is not a molecule index")
+        offset = HEADER.size
+        blocks = []
+        for size in (key_bytes, name_bytes, start_bytes):
+            blocks.append(data[offset:offset + size])
+            offset += size
+        try:
+            keys, names, starts = (zlib.decompress(block) for block in blocks)
+        except zlib.error:
+            raise MoleculeError(f"{filename} is damaged")
+
+        keys = keys.decode("utf-8").split("\n") if key_count != 0 else []
+        names = names.decode("utf-8").split("\n") if name_count != 0 else []
+        starts_array = array("I")
+        starts_array.frombytes(starts)
+        if sys.byteorder != "little":
+            starts_array.byteswap()
+        if len(keys) != key_count or len(names) != name_count:
+            raise MoleculeError(f"{filename} is damaged")
+        return cls(keys, names, starts_array)
+
+    def save(self, filename):
+        """Write the index to an index file."""
+        keys = "\n".join(self._number_of).encode("utf-8")
+        names = "\n".join(self._names).encode("utf-8")
+        starts = array("I", self._starts)
+        if sys.byteorder != "little":
+            starts.byteswap()
+        blocks = [zlib.compress(block) for block in (keys, names, starts.tobytes())]
+        with open(filename, "wb") as index_file:
+            index_file.write(HEADER.pack(MAGIC, len(self._number_of), len(self._names),
+                *(len(block) for block in blocks)))
+            for block in blocks:
+                index_file.write(block)
+
+    def __len__(self):
+        """Return the number of compositions in the index."""
+        return len(self._number_of)
+
+    def __contains__(self, key):
+        return key in self._number_of
+
+    def __iter__(self):
+        """Return an iterator over the Hill order keys in sorted order."""
+        return iter(self._number_of)
+
+    def names_of_key(self, key):
+        """Return a tuple of the names of a Hill order composition, or
+        an empty tuple if there are none.
+        """
+        number = self._number_of.get(key)
+        if number is None:
+            return ()
+        return tuple(self._names[self._starts[number]:self._starts[number + 1]])
+
+    def names(self, symbol_quantity_list):
+        """Return a tuple of the names of a parsed formula."""
+        return self.names_of_key(hill_key(symbol_quantity_list))
+
+    def name(self, formula, periodic_table_dict, default="unknown compound"):
+        """Return the first name of a formula string, or default if
+        the index has no name for it.
+        """
+        names = self.names(parse_formula(formula, periodic_table_dict))
+        return names[0] if len(names) != 0 else default
+
+
+def main(argv=None):
+    # chemistry.py imports this module, so import it here, not at the top.
+    from chemistry import PERIODIC_TABLE
+
+    parser = argparse.ArgumentParser(description="Build or search an index of known molecules.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="convert a CSV file of formulas and names to an index file")
+    build.add_argument("compounds", help="a CSV file with the columns formula and name")
+    build.add_argument("index", help="the index file to write")
+    lookup = commands.add_parser("lookup", help="print the names of formulas")
+    lookup.add_argument("index", help="an index file or a CSV file of formulas and names")
+    lookup.add_argument("formulas", nargs="+", help="the formulas to look up")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        index, skipped = MoleculeIndex.from_csv(args.compounds, PERIODIC_TABLE)
+        index.save(args.index)
+        print(f"Wrote {len(index)} compositions to {args.index}; skipped {skipped} rows")
+        return
+
+    if args.index.endswith(".csv"):
+        index, _ = MoleculeIndex.from_csv(args.index, PERIODIC_TABLE)
+    else:
+        index = MoleculeIndex.load(args.index)
+    for formula in args.formulas:
+        try:
+            symbol_quantity_list = parse_formula(formula, PERIODIC_TABLE)
+        except FormulaError as error:
+            print(f"{formula}: {error.args[0]}")
+            continue
+        names = index.names(symbol_quantity_list)
+        print(f"{formula} ({hill_key(symbol_quantity_list)}): "
+            f"{'; '.join(names) if len(names) != 0 else 'unknown compound'}")
+
+
+if __name__ == "__main__":
+    main()
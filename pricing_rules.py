@@ -0,0 +1,274 @@
+# A discount rules engine for receipt.py, discount.py and fit_track.py.
+# Discount rules are data: the days of the week they apply on, a time
+# window, a minimum subtotal, the products they apply to and a rate.
+# compile_rules turns a list of rules into lookup tables for every
+# weekday, time window and subtotal level, so finding the discount for
+# one line of a receipt is a single dictionary access no matter how
+# many rules there are.
+import csv  # Import the csv module to read rule files
+from bisect import bisect_right  # Import bisect_right to find the subtotal level of an order
+
+DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday",
+        "Friday", "Saturday", "Sunday"]
+MINUTES_PER_DAY = 24 * 60
+
+# The discount printed on receipts from receipt.py: 10% off every
+# product on Tuesday and Wednesday. The columns are the same as the
+# columns of a rule file: name, days, start, end, min subtotal,
+# scope and rate.
+WEEKDAY_DISCOUNT_RULES = [
+    ["weekday discount", "Tuesday Wednesday", "", "", "0", "*", "0.10"],
+]
+
+# The discount in discount.py: 10% off a subtotal of $50 or more on
+# Tuesday and Wednesday.
+LARGE_ORDER_DISCOUNT_RULES = [
+    ["large order discount", "Tuesday Wednesday", "", "", "50", "*", "0.10"],
+]
+
+# The discount in fit_track.py: 10% on Tuesday and Wednesday and
+# every day before 11 AM.
+FIT_TRACK_DISCOUNT_RULES = [
+    ["weekday discount", "Tuesday Wednesday", "", "", "0", "*", "0.10"],
+    ["morning discount", "", "00:00", "11:00", "0", "*", "0.10"],
+]
+
+
+class RuleError(ValueError):
+    """RuleError is the type of error that parse_rule raises if a
+    rule is invalid.
+    """
+
+
+def parse_time(text):
+    """Convert a time such as "11:00" to minutes after midnight."""
+    try:
+        hours, minutes = text.split(":")
+        total = int(hours) * 60 + int(minutes)
+    except ValueError:
+        raise RuleError(f"invalid time: {text}")
+    if not 0 <= total <= MINUTES_PER_DAY:
+        raise RuleError(f"invalid time: {text}")
+    return total
+
+
+def parse_rule(row):
+    """Convert one row of a rule file into a rule dictionary.
+
+    The row has these columns:
+        name: a name for the rule.
+        days: weekday names separated by spaces, or blank for every day.
+        start, end: the time window as HH:MM, start included and end
+            excluded; a blank start is midnight and a blank end is
+            the end of the day.
+        min subtotal: the smallest order subtotal, before discounts,
+            that gets the discount; blank is 0.
+        scope: product numbers separated by spaces, where a number
+            that ends with * matches every product number with that
+            prefix (a category such as D* for dairy), or blank or *
+            for every product.
+        rate: the discount as a fraction, for example 0.10.
+
+    Parameters
+        row: a list of strings with the columns above.
+    Return: a dictionary with the keys name, days (a set of weekday
+        numbers, Monday is 0), start, end (minutes after midnight),
+        min_subtotal, products (a set), prefixes (a list) and rate.
+        products and prefixes are None for a rule that applies to
+        every product.
+    """
+    if len(row) != 7:
+        raise RuleError(f"a rule must have 7 columns but found {len(row)}: {row}")
+    name, days, start, end, min_subtotal, scope, rate = [text.strip() for text in row]
+
+    weekdays = set()
+    for day in days.split():
+        day = day.capitalize()
+        if day not in DAY_NAMES:
+            raise RuleError(f"rule {name}: unknown day: {day}")
+        weekdays.add(DAY_NAMES.index(day))
+    if len(weekdays) == 0:
+        weekdays = set(range(len(DAY_NAMES)))
+
+    start = parse_time(start) if start else 0
+    end = parse_time(end) if end else MINUTES_PER_DAY
+    if start >= end:
+        raise RuleError(f"rule {name}: the start time must be before the end time")
+
+    products = set()
+    prefixes = []
+    for item in scope.split():
+        if item == "*":
+            products = prefixes = None
+            break
+        if item.endswith("*"):
+            prefixes.append(item[:-1])
+        else:
+            products.add(item)
+    if products is not None and len(products) == 0 and len(prefixes) == 0:
+        products = prefixes = None
+
+    try:
+        min_subtotal = float(min_subtotal) if min_subtotal else 0.0
+        rate = float(rate)
+    except ValueError:
+        raise RuleError(f"rule {name}: invalid number")
+    if not 0 <= rate <= 1:
+        raise RuleError(f"rule {name}: the rate must be between 0 and 1")
+
+    return {"name": name, "days": weekdays, "start": start, "end": end,
+            "min_subtotal": min_subtotal, "products": products,
+            "prefixes": prefixes, "rate": rate}
+
+
+def read_rules(filename):
+    """Read a CSV file of discount rules. The first row is a header.
+
+    Parameters
+        filename: the name of the CSV file to read.
+    Return: a list of rule dictionaries from parse_rule.
+    """
+    with open(filename, "rt") as csv_file:
+        reader = csv.reader(csv_file)
+        next(reader)  # Skip the header row
+        return [parse_rule(row) for row in reader if len(row) != 0]
+
+
+class RateTable(dict):
+    """The discount rates for one weekday, time window and subtotal
+    level. The dictionary holds the rate of each product that has a
+    rate other than default; every other product gets default. Look
+    up a product with table.get(product_number, table.default).
+    """
+
+    def __init__(self, default=0.0, rates=()):
+        super().__init__(rates)
+        self.default = default
+
+    def rate(self, product_number):
+        """Return the discount rate of one product."""
+        return self.get(product_number, self.default)
+
+    def __reduce__(self):
+        return (RateTable, (self.default, dict(self)))
+
+
+class PricingRules:
+    """A compiled set of discount rules. Create one with
+    compile_rules and get the rates for an order with rates_for.
+    """
+
+    def __init__(self, segment_of_minute, thresholds, tables):
+        self._segment_of_minute = segment_of_minute
+        self.thresholds = thresholds
+        self._tables = tables
+
+    @property
+    def has_thresholds(self):
+        """True if any rule has a minimum subtotal."""
+        return len(self.thresholds) > 1
+
+    def rates_for(self, date, subtotal=0.0):
+        """Return the RateTable for an order.
+
+        Parameters
+            date: a datetime object for the time of the purchase.
+            subtotal: the order subtotal before discounts; only used
+                by rules with a minimum subtotal.
+        Return: a RateTable.
+        """
+        segment = self._segment_of_minute[date.hour * 60 + date.minute]
+        level = bisect_right(self.thresholds, subtotal) - 1
+        return self._tables[date.weekday()][segment][max(level, 0)]
+
+    def order_rate(self, date, subtotal=0.0):
+        """Return the rate that applies to every product in an order,
+        for programs such as discount.py that only know the subtotal.
+        """
+        return self.rates_for(date, subtotal).default
+
+
+def compile_rules(rules, product_numbers=()):
+    """Compile discount rules into lookup tables.
+
+    The day is cut into time segments at every rule's start and end
+    time, and the subtotals are cut into levels at every rule's
+    minimum subtotal. For each weekday, segment and level, the rules
+    that apply are merged into one RateTable. When several rules
+    apply to the same product the largest rate wins; rates are not
+    added together.
+
+    Parameters
+        rules: a list of rule dictionaries from parse_rule.
+        product_numbers: the product numbers in the catalog, used to
+            expand rules that apply to a prefix such as D*.
+    Return: a PricingRules object.
+    """
+    boundaries = sorted({0, MINUTES_PER_DAY}
+            | {rule["start"] for rule in rules}
+            | {rule["end"] for rule in rules})
+    segment_of_minute = []
+    for segment in range(len(boundaries) - 1):
+        segment_of_minute.extend([segment] * (boundaries[segment + 1] - boundaries[segment]))
+
+    thresholds = sorted({0.0} | {rule["min_subtotal"] for rule in rules})
+
+    # Expand each rule's scope into the product numbers it applies to.
+    scopes = []
+    for rule in rules:
+        if rule["products"] is None:
+            scopes.append(None)
+            continue
+        products = set(rule["products"])
+        if rule["prefixes"]:
+            prefixes = tuple(rule["prefixes"])
+            products.update(number for number in product_numbers
+                    if number.startswith(prefixes))
+        scopes.append(products)
+
+    tables = []
+    cache = {}  # Equal sets of rules share one table
+    for weekday in range(len(DAY_NAMES)):
+        day_tables = []
+        for segment in range(len(boundaries) - 1):
+            minute = boundaries[segment]
+            level_tables = []
+            for threshold in thresholds:
+                active = tuple(index for index, rule in enumerate(rules)
+                        if weekday in rule["days"]
+                        and rule["start"] <= minute < rule["end"]
+                        and rule["min_subtotal"] <= threshold)
+                table = cache.get(active)
+                if table is None:
+                    table = _merge_rules(rules, scopes, active)
+                    cache[active] = table
+                level_tables.append(table)
+            day_tables.append(level_tables)
+        tables.append(day_tables)
+
+    return PricingRules(segment_of_minute, thresholds, tables)
+
+
+def _merge_rules(rules, scopes, active):
+    default = max([rules[index]["rate"] for index in active
+            if scopes[index] is None], default=0.0)
+    rates = {}
+    for index in active:
+        rate = rules[index]["rate"]
+        if scopes[index] is None or rate <= default:
+            continue
+        for product_number in scopes[index]:
+            if rate > rates.get(product_number, default):
+                rates[product_number] = rate
+    return RateTable(default, rates)
+
+
+def load_pricing_rules(filename=None, product_numbers=(), default_rows=WEEKDAY_DISCOUNT_RULES):
+    """Read and compile a rule file, or compile the rule rows in
+    default_rows if filename is None.
+    """
+    if filename is None:
+        rules = [parse_rule(row) for row in default_rows]
+    else:
+        rules = read_rules(filename)
+    return compile_rules(rules, product_numbers)
@@ -0,0 +1,316 @@
+# Product name search for the cashiers of Ernesto's Daily Groceries.
+# ProductSearch builds an index over the name column of a product
+# catalog once, and then finds products by part of their name, for
+# example "cheddar" or "milk", without looking at every product.
+#
+# Results are ranked in four groups: names equal to the query, names
+# that start with the query, names with a word that starts with the
+# query, and names that contain the query anywhere. The last group is
+# found with a trigram (three letter) inverted index, so queries for
+# it need at least three letters.
+import argparse  # Import argparse to read the command line options
+import heapq  # Import heapq to merge the matches of two indexes
+import threading  # Import threading to build a new index in the background
+from array import array  # Import array to store compact posting lists
+from bisect import bisect_left  # Import bisect_left to find prefixes in sorted lists
+from itertools import islice  # Import islice to skip the short names in a posting list
+
+NAME_INDEX = 1  # Index of the name in a product row
+GRAM_SIZE = 3  # Length of the n-grams in the inverted index
+COMPACT_SIZE = 1000  # Changed products a FollowingSearch keeps beside its index
+
+
+def _grams(text):
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+class ProductSearch:
+    """A search index over the product names of a catalog."""
+
+    def __init__(self, products_dict):
+        """Build the index.
+
+        Parameters
+            products_dict: a dictionary from product number to
+                [product_number, name, price] row, such as the one
+                returned from receipt.read_dictionary, a ProductCatalog
+                or a ReloadingCatalog snapshot.
+        """
+        products_of_name = {}
+        for product_number, row in products_dict.items():
+            products_of_name.setdefault(row[NAME_INDEX].lower(), []).append(product_number)
+
+        # Name ids are given in order of length, so scanning a posting
+        # list from the start finds the shortest matching names first.
+        names = sorted(products_of_name, key=lambda name: (len(name), name))
+        self._names = names
+        self._products = [products_of_name[name] for name in names]
+
+        alphabetical = sorted(range(len(names)), key=names.__getitem__)
+        self._sorted_names = [names[name_id] for name_id in alphabetical]
+        self._sorted_ids = alphabetical
+
+        word_entries = sorted((word, name_id) for name_id, name in enumerate(names)
+                for word in set(name.split()))
+        self._words = [word for word, _ in word_entries]
+        self._word_ids = [name_id for _, name_id in word_entries]
+
+        postings = {}
+        for name_id, name in enumerate(names):
+            for gram in _grams(name):
+                posting = postings.get(gram)
+                if posting is None:
+                    posting = postings[gram] = array("i")
+                posting.append(name_id)  # Ids are added in order, so every list is sorted
+        self._postings = postings
+
+    def __len__(self):
+        """Return the number of distinct names in the index."""
+        return len(self._names)
+
+    def _prefix_positions(self, sorted_keys, query):
+        start = bisect_left(sorted_keys, query)
+        for position in range(start, len(sorted_keys)):
+            if not sorted_keys[position].startswith(query):
+                break
+            yield position
+
+    def _substring_matches(self, query):
+        grams = _grams(query)
+        if len(grams) == 0:
+            return
+        postings = []
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if posting is None:
+                return  # Some trigram of the query is in no name
+            postings.append(posting)
+        # Walk the shortest posting list and check each name, which is
+        # cheaper than intersecting the lists when only a few results
+        # are needed. Names shorter than the query are skipped: ids are
+        # in order of length, so they are at the start of every list.
+        posting = min(postings, key=len)
+        first_id = bisect_left(self._names, len(query), key=len)
+        names = self._names
+        for name_id in islice(posting, bisect_left(posting, first_id), None):
+            if query in names[name_id]:
+                yield name_id
+
+    def _matches(self, query):
+        # The name ids of each group of matches, best first.
+        sorted_ids = self._sorted_ids
+        word_ids = self._word_ids
+        return [
+            # A name equal to the query sorts before every longer name
+            # that starts with it, so exact matches come first.
+            (sorted_ids[position] for position in self._prefix_positions(self._sorted_names, query)),
+            (word_ids[position] for position in self._prefix_positions(self._words, query)),
+            self._substring_matches(query),
+        ]
+
+    def _keyed_matches(self, query):
+        # The names of each group of matches as (sort key, name) pairs
+        # in the order of _matches, so the matches of two indexes can
+        # be merged.
+        names = self._names
+        sorted_names = self._sorted_names
+        words = self._words
+        word_ids = self._word_ids
+        return [
+            ((sorted_names[position], sorted_names[position])
+                for position in self._prefix_positions(sorted_names, query)),
+            (((words[position], len(names[word_ids[position]]), names[word_ids[position]]),
+                names[word_ids[position]]) for position in self._prefix_positions(words, query)),
+            (((len(names[name_id]), names[name_id]), names[name_id])
+                for name_id in self._substring_matches(query)),
+        ]
+
+    def _products_named(self, name):
+        # Return the product numbers with a lower case name.
+        position = bisect_left(self._sorted_names, name)
+        if position < len(self._sorted_names) and self._sorted_names[position] == name:
+            return self._products[self._sorted_ids[position]]
+        return []
+
+    def search(self, query, limit=10):
+        """Find products by part of their name.
+
+        Parameters
+            query: the text to look for; upper and lower case letters
+                are the same.
+            limit: the largest number of product numbers to return.
+        Return: a list of product numbers, best matches first.
+        """
+        query = query.strip().lower()
+        if query == "" or limit <= 0:
+            return []
+
+        results = []
+        seen = set()
+        for name_ids in self._matches(query):
+            for name_id in name_ids:
+                if name_id in seen:
+                    continue
+                seen.add(name_id)
+                results.extend(self._products[name_id])
+                if len(results) >= limit:
+                    return results[:limit]
+        return results
+
+
+class FollowingSearch:
+    """A ProductSearch that stays in sync with a ReloadingCatalog.
+
+    Rebuilding the index takes seconds for a large catalog, far too
+    long to do for every change while the catalog holds its write
+    lock. Instead, the products that were added, removed or renamed
+    since the index was built are kept beside it: a small second
+    index of their new names, and the set of their product numbers,
+    which are no longer searched in the big index. A search merges
+    the matches of the two indexes in the order of ProductSearch,
+    except that of the products with the same name, the changed ones
+    come last.
+
+    When more than compact_size products have changed, a new big index
+    is built from a snapshot on a background thread, without holding
+    the catalog's lock, and the products changed since that snapshot
+    are kept beside it. Until then, searches use the index as it was
+    before the change that went over the limit. Each state is
+    published with a single assignment, the same way ReloadingCatalog
+    publishes its snapshots, so searches that are running keep using
+    the old one. Reloads that only change prices leave it as it is.
+    """
+
+    def __init__(self, catalog, compact_size=COMPACT_SIZE):
+        """Build the index and start following catalog.
+
+        Parameters
+            catalog: a ReloadingCatalog from catalog.py.
+            compact_size: the most changed products to keep beside
+                the index before building a new one.
+        """
+        self.compact_size = compact_size
+        self._catalog = catalog
+        self._lock = threading.Lock()  # Guards the fields below and publishing
+        self._compact_lock = threading.Lock()  # One new index is built at a time
+        self._base_snapshot = catalog.snapshot()
+        self._base = ProductSearch(self._base_snapshot)
+        self._changed = {}  # Product number -> new row, or None if deleted, since _base was built
+        self._pending = None  # Product numbers changed since a background build started
+        self._compacting = False
+        self._index = (self._base, None, frozenset(), len(self._base))  # The published state
+        catalog.add_listener(self._catalog_reloaded)
+
+    def _catalog_reloaded(self, old_snapshot, new_snapshot, changes):
+        keys = changes["inserted"] + changes["deleted"] + [key for key in changes["updated"]
+            if old_snapshot[key][NAME_INDEX] != new_snapshot[key][NAME_INDEX]]
+        if len(keys) == 0:
+            return
+        with self._lock:
+            for key in keys:
+                self._changed[key] = new_snapshot.get(key)
+            if self._pending is not None:
+                self._pending.update(keys)
+            if len(self._changed) <= self.compact_size:
+                self._publish()
+                return
+            if self._compacting:
+                return
+            self._compacting = True
+        threading.Thread(target=self._compact_in_background, daemon=True).start()
+
+    def _publish(self):
+        # Index the changed products and publish the new state. The
+        # caller must hold self._lock.
+        rows = {key: row for key, row in self._changed.items() if row is not None}
+        if len(self._changed) == 0:
+            self._index = (self._base, None, frozenset(), len(self._base))
+            return
+        base = self._base
+        overlay = ProductSearch(rows)
+        hidden = frozenset(self._changed)
+
+        # Count the names that are gone from the index or new to it.
+        size = len(base)
+        names = {self._base_snapshot[key][NAME_INDEX].lower()
+            for key in self._changed if key in self._base_snapshot}
+        names.update(row[NAME_INDEX].lower() for row in rows.values())
+        for name in names:
+            before = len(base._products_named(name)) != 0
+            after = len(overlay._products_named(name)) != 0 \
+                or any(key not in hidden for key in base._products_named(name))
+            size += after - before
+        self._index = (base, overlay, hidden, size)  # Publish the new state
+
+    def _compact_in_background(self):
+        while True:
+            self.compact()
+            with self._lock:
+                if len(self._changed) <= self.compact_size:
+                    self._compacting = False
+                    return
+
+    def compact(self):
+        """Build a new index from the current snapshot of the catalog,
+        without holding the catalog's lock, and publish it.
+        """
+        with self._compact_lock:
+            with self._lock:
+                snapshot = self._catalog.snapshot()
+                self._pending = set()
+            base = ProductSearch(snapshot)  # The slow part, with no lock held
+            with self._lock:
+                latest = self._catalog.snapshot()
+                self._base_snapshot = snapshot
+                self._base = base
+                self._changed = {key: latest.get(key) for key in self._pending}
+                self._pending = None
+                self._publish()
+
+    def __len__(self):
+        """Return the number of distinct names in the index."""
+        return self._index[3]
+
+    def search(self, query, limit=10):
+        """Find products by part of their name; see ProductSearch.search."""
+        base, overlay, hidden, _ = self._index
+        if overlay is None:
+            return base.search(query, limit)
+        query = query.strip().lower()
+        if query == "" or limit <= 0:
+            return []
+
+        results = []
+        seen = set()
+        for base_matches, overlay_matches in zip(base._keyed_matches(query),
+                overlay._keyed_matches(query)):
+            # A name in both indexes comes from the big one first.
+            for _, name in heapq.merge(base_matches, overlay_matches):
+                if name in seen:
+                    continue
+                seen.add(name)
+                results.extend(product_number for product_number in base._products_named(name)
+                    if product_number not in hidden)
+                results.extend(overlay._products_named(name))
+                if len(results) >= limit:
+                    return results[:limit]
+        return results
+
+
+def main(argv=None):
+    from receipt import read_products
+    parser = argparse.ArgumentParser(description="Find products by name.")
+    parser.add_argument("query", help="part of a product name")
+    parser.add_argument("--products", default="products.csv", help="the CSV file of products")
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    products_dict = read_products(args.products)
+    index = ProductSearch(products_dict)
+    for product_number in index.search(args.query, args.limit):
+        _, name, price = products_dict[product_number]
+        print(f"{product_number}  {name}  ${price}")
+
+
+if __name__ == "__main__":
+    main()
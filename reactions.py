@@ -0,0 +1,284 @@
+# Balance chemical equations. balance_reaction turns "H2 + O2 -> H2O"
+# into the smallest whole number coefficients, [2, 1, 2].
+#
+# Each formula is parsed with parse_formula into its atoms, and the
+# atoms make an elements x species matrix A: A[e][s] is the number of
+# atoms of element e in species s. The coefficients x balance the
+# equation when A D x = 0, where D is +1 for the reactants and -1 for
+# the products, so D x is in the null space of A. The null space is
+# found exactly with fractions by Gauss-Jordan elimination:
+#   - an empty null space means no coefficients balance the elements,
+#   - a null space of more than one vector means the species can be
+#     balanced in several independent ways, and the equation doesn't
+#     say which one is meant,
+#   - a single vector is scaled to whole numbers; its signs must match
+#     D, or the equation can only be balanced by moving a species to
+#     the other side.
+# The null space depends only on which species are in the equation,
+# not on their order or side, so ReactionBalancer caches it under the
+# sorted Hill order compositions of the species, and the thousands of
+# equations of a batch that share species are solved only once.
+import argparse  # Import argparse to read the command line options
+import math  # Import math for the gcd and lcm of the coefficients
+import re  # Import re to split an equation into its sides
+import threading  # Import threading to lock the cache
+from collections import OrderedDict  # Import OrderedDict for the LRU cache
+from fractions import Fraction  # Import Fraction for exact elimination
+from chemistry import PERIODIC_TABLE
+from composition import format_error
+from formula import FormulaError, parse_formula_cached
+from molecules import hill_key
+
+ARROW = re.compile(r"\s*(?:->|=>|→|=)\s*")  # The arrow between the sides of an equation
+COEFFICIENT = re.compile(r"^\d+\s*(?=\D)")  # A coefficient written before a formula
+
+
+class BalanceError(ValueError):
+    """BalanceError is the type of error raised if an equation is
+    invalid or can't be balanced.
+    """
+
+
+def parse_reaction(equation):
+    """Split an equation into the formulas of its reactants and
+    products. Coefficients written in the equation are ignored.
+
+    Parameters
+        equation is a string like "H2 + O2 -> H2O"; the arrow may be
+            ->, =>, = or →
+    Return: a list of the reactant formulas and a list of the product
+        formulas.
+    """
+    sides = ARROW.split(equation.strip())
+    if len(sides) != 2:
+        raise BalanceError(f"an equation needs one arrow: {equation}")
+    formulas = []
+    for side in sides:
+        species = []
+        for formula in side.split("+"):
+            formula = COEFFICIENT.sub("", formula.strip(), count=1).strip()
+            if formula == "":
+                raise BalanceError(f"a species is missing: {equation}")
+            species.append(formula)
+        formulas.append(species)
+    return formulas[0], formulas[1]
+
+
+def reaction_matrix(compositions):
+    """Make the elements x species matrix of atom counts.
+
+    Parameters
+        compositions is a list with a compound list of [symbol,
+            quantity] lists for each species, as parse_formula returns
+    Return: a list of the element symbols in the order they are first
+        found, and a compound list with a row of atom counts for each
+        element and a column for each species.
+    """
+    elements = []
+    row_of = {}
+    matrix = []
+    for column, symbol_quantity_list in enumerate(compositions):
+        for symbol, quantity in symbol_quantity_list:
+            if symbol not in row_of:
+                row_of[symbol] = len(elements)
+                elements.append(symbol)
+                matrix.append([0] * len(compositions))
+            matrix[row_of[symbol]][column] += quantity
+    return elements, matrix
+
+
+def null_space(matrix, columns):
+    """Find a basis of the null space of a matrix exactly.
+
+    Parameters
+        matrix is a compound list of rows of integers
+        columns is the number of columns, in case there are no rows
+    Return: a list of basis vectors; each is a tuple of the smallest
+        whole numbers in the direction of the vector, with its first
+        nonzero entry positive.
+    """
+    rows = [[Fraction(value) for value in row] for row in matrix]
+    pivots = []
+    for column in range(columns):
+        rank = len(pivots)
+        if rank == len(rows):
+            break
+        pivot = next((i for i in range(rank, len(rows)) if rows[i][column] != 0), None)
+        if pivot is None:
+            continue
+        rows[rank], rows[pivot] = rows[pivot], rows[rank]
+        pivot_value = rows[rank][column]
+        rows[rank] = [value / pivot_value for value in rows[rank]]
+        for i, row in enumerate(rows):
+            factor = row[column]
+            if i != rank and factor != 0:
+                rows[i] = [value - factor * pivot_entry
+                    for value, pivot_entry in zip(row, rows[rank])]
+        pivots.append(column)
+
+    basis = []
+    for free in (column for column in range(columns) if column not in pivots):
+        vector = [Fraction(0)] * columns
+        vector[free] = Fraction(1)
+        for row, column in enumerate(pivots):
+            vector[column] = -rows[row][free]
+        basis.append(_whole_numbers(vector))
+    return basis
+
+
+def _whole_numbers(vector):
+    # Scale a vector of fractions to the smallest whole numbers.
+    denominator = math.lcm(*(value.denominator for value in vector))
+    numbers = [int(value * denominator) for value in vector]
+    divisor = math.gcd(*numbers)
+    if next(number for number in numbers if number != 0) < 0:
+        divisor = -divisor
+    return tuple(number // divisor for number in numbers)
+
+
+class ReactionBalancer:
+    """Balances equations and keeps the null space of each set of
+    species it has seen in an LRU cache of at most maxsize entries.
+    """
+
+    def __init__(self, maxsize=4096, periodic_table_dict=PERIODIC_TABLE):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.periodic_table_dict = periodic_table_dict
+        self.hits = 0
+        self.misses = 0
+        self._null_spaces = OrderedDict()  # sorted Hill keys -> null space basis
+        self._lock = threading.Lock()
+
+    def _null_space_of(self, keys, compositions):
+        # Return the null space basis of the species in sorted order of
+        # their keys, and the place of each species in that order.
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        cache_key = tuple(keys[i] for i in order)
+        with self._lock:
+            basis = self._null_spaces.get(cache_key)
+            if basis is not None:
+                self.hits += 1
+                self._null_spaces.move_to_end(cache_key)  # Most recently used
+        if basis is None:
+            _, matrix = reaction_matrix([compositions[i] for i in order])
+            basis = null_space(matrix, len(order))
+            with self._lock:
+                self.misses += 1
+                self._null_spaces[cache_key] = basis
+                if len(self._null_spaces) > self.maxsize:
+                    self._null_spaces.popitem(last=False)  # Least recently used
+        place = [0] * len(order)
+        for position, species in enumerate(order):
+            place[species] = position
+        return basis, place
+
+    def balance(self, equation):
+        """Balance one equation.
+
+        Parameters
+            equation is a string like "H2 + O2 -> H2O"
+        Return: a list of the smallest whole number coefficients, the
+            reactants first and then the products, like [2, 1, 2].
+        """
+        reactants, products = parse_reaction(equation)
+        compositions = []
+        for formula in reactants + products:
+            try:
+                compositions.append(parse_formula_cached(formula, self.periodic_table_dict))
+            except FormulaError as error:
+                raise BalanceError(format_error(error))
+        keys = [hill_key(symbol_quantity_list) for symbol_quantity_list in compositions]
+
+        basis, place = self._null_space_of(keys, compositions)
+        if len(basis) == 0:
+            raise BalanceError(f"inconsistent: no coefficients balance the elements of {equation}")
+        if len(basis) > 1:
+            raise BalanceError(f"underdetermined: the species of {equation}"
+                f" can be balanced in {len(basis)} independent ways")
+        vector = basis[0]
+        coefficients = [vector[place[species]] if species < len(reactants)
+            else -vector[place[species]] for species in range(len(place))]
+        if all(coefficient < 0 for coefficient in coefficients):
+            coefficients = [-coefficient for coefficient in coefficients]
+        if not all(coefficient > 0 for coefficient in coefficients):
+            raise BalanceError(f"inconsistent: {equation} can't be balanced"
+                " with every species on its side")
+        return coefficients
+
+    def balance_many(self, equations):
+        """Balance many equations.
+
+        Return: a list with the coefficients of each equation, or None
+            for an equation that couldn't be balanced, and a
+            dictionary from the position of each such equation to its
+            error message.
+        """
+        results = []
+        errors = {}
+        for position, equation in enumerate(equations):
+            try:
+                results.append(self.balance(equation))
+            except BalanceError as error:
+                results.append(None)
+                errors[position] = str(error)
+        return results, errors
+
+    def stats(self):
+        """Return a dictionary with the keys hits, misses, size and
+        maxsize.
+        """
+        return {"hits": self.hits, "misses": self.misses,
+                "size": len(self._null_spaces), "maxsize": self.maxsize}
+
+
+# The balancer used by balance_reaction and balance_reactions.
+default_balancer = ReactionBalancer()
+
+
+def balance_reaction(equation):
+    """Balance one equation with default_balancer."""
+    return default_balancer.balance(equation)
+
+
+def balance_reactions(equations):
+    """Balance many equations with default_balancer; see
+    ReactionBalancer.balance_many.
+    """
+    return default_balancer.balance_many(equations)
+
+
+def format_reaction(equation, coefficients):
+    """Write an equation with its coefficients, for example
+    "2 H2 + O2 -> 2 H2O".
+    """
+    reactants, products = parse_reaction(equation)
+    terms = [formula if coefficient == 1 else f"{coefficient} {formula}"
+        for coefficient, formula in zip(coefficients, reactants + products)]
+    return " + ".join(terms[:len(reactants)]) + " -> " + " + ".join(terms[len(reactants):])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Balance chemical equations.")
+    parser.add_argument("equations", nargs="*", help='equations like "H2 + O2 -> H2O"')
+    parser.add_argument("--file", help="a text file with one equation on each line")
+    args = parser.parse_args(argv)
+
+    equations = list(args.equations)
+    if args.file is not None:
+        with open(args.file, "rt") as text_file:
+            equations.extend(line.strip() for line in text_file if line.strip() != "")
+    results, errors = balance_reactions(equations)
+    for position, (equation, coefficients) in enumerate(zip(equations, results)):
+        if coefficients is None:
+            print(f"{equation}: {errors[position]}")
+        else:
+            print(format_reaction(equation, coefficients))
+    stats = default_balancer.stats()
+    print(f"Balanced {len(equations) - len(errors)} of {len(equations)} equations;"
+        f" {stats['misses']} species sets solved, {stats['hits']} from the cache")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,24 @@
 #My creativity in this project includes implementing a 10% discount on product prices if today is Tuesday or Wednesday to encourage weekday shopping, and adding an invitation for customers to complete an online survey at the bottom of the receipt to gather valuable feedback
+import argparse  # Import argparse to read the command line options
 import csv  # Import the csv module to work with CSV files
+import io  # Import io to collect the receipts of a shard in memory
+import json  # Import json to write receipts as JSON Lines
+import operator  # Import operator to multiply and add whole columns at once
+import os  # Import os to count the CPUs
+import sys  # Import sys to write receipts to standard output
+from collections import deque  # Import deque to keep the pending shards in input order
+from concurrent.futures import ProcessPoolExecutor  # Import ProcessPoolExecutor to price shards in worker processes
+from functools import reduce  # Import reduce to add a column from left to right
 from datetime import datetime  # Import datetime module to work with dates and times
+from itertools import groupby, islice  # Import groupby to split a request stream into orders and islice to cut it into shards
+from catalog import ProductCatalog, is_snapshot  # Import the compact product catalog
+from pricing_rules import RateTable, RuleError, load_pricing_rules  # Import the discount rules engine
+from tax_engine import TaxError, load_tax_table  # Import the sales tax engine
 
 store_name = "Ernesto's Daily Groceries"  # Store name
+sales_tax_rate = 0.06  # Define the sales tax rate
+default_rules = load_pricing_rules()  # The 10% discount on Tuesday and Wednesday
+write_buffer_size = 1 << 16  # Receipts are collected until there is this much text, then written at once
 
 def read_dictionary(filename, key_column_index):
     """Read the contents of a CSV file into a compound dictionary and return the dictionary.
@@ -24,68 +40,572 @@ def read_dictionary(filename, key_column_index):
                 dictionary[key] = row_list  # Add the row to the dictionary with the key
     return dictionary  # Return the populated dictionary
 
-def main():
+def read_products(filename):
+    """Read the products for a receipt. A snapshot file written by
+    catalog.py is opened with mmap; any other file is read as CSV
+    with read_dictionary.
+
+    Parameters:
+        filename: the name of the products CSV or snapshot file.
+
+    Return: a dictionary or ProductCatalog keyed by product number.
+    """
+    if is_snapshot(filename):
+        return ProductCatalog.open(filename)  # Open the snapshot without parsing it
+    return read_dictionary(filename, 0)  # Read the CSV file into a dictionary
+
+def get_discount_rate(date):
+    """Return the discount rate for a shopping date. Customers get
+    a 10% discount on Tuesday and Wednesday to encourage weekday
+    shopping.
+
+    Parameters:
+        date: a datetime object for the day of the purchase.
+
+    Return: the discount rate as a fraction, for example 0.10.
+    """
+    return default_rules.order_rate(date)  # Look up the rate for every product on this day
+
+def get_order_discount(rules, items, products_dict, date):
+    """Return the discount rates for one order.
+
+    Parameters:
+        rules: a PricingRules object from pricing_rules.py.
+        items: a compound list of [product_number, quantity] lists.
+        products_dict: the dictionary returned from read_dictionary.
+        date: a datetime object for the time of the purchase.
+
+    Return: a RateTable to pass to price_order.
+    """
+    if not rules.has_thresholds:
+        return rules.rates_for(date)  # No rule depends on the subtotal
+    subtotal = 0.0
+    for product_number, quantity in items:
+        subtotal += float(products_dict[product_number][2]) * quantity  # Subtotal before discounts
+    return rules.rates_for(date, subtotal)
+
+def _split_rates(discount_rate):
+    """Return the per product rates and the default rate of a
+    discount that is either a number or a RateTable.
+    """
+    if isinstance(discount_rate, RateTable):
+        return discount_rate, discount_rate.default
+    return {}, discount_rate
+
+def _min_columns(order_column_index, product_column_index, quantity_column_index):
+    """Return the number of columns a usable request row needs."""
+    min_columns = max(product_column_index, quantity_column_index) + 1
+    if order_column_index is not None:
+        min_columns = max(min_columns, order_column_index + 1)
+    return min_columns
+
+def check_request_file(filename, products_dict, order_column_index=None, product_column_index=0, quantity_column_index=1):
+    """Find every problem in a request CSV file before any receipt is
+    printed, so all of them can be fixed at once.
+
+    The file is read once to collect the set of product numbers it
+    uses and to check each quantity. The unknown product numbers are
+    then found with one set difference against the catalog keys. Only
+    if there are unknown products is the file read a second time to
+    find the lines they are on.
+
+    Parameters:
+        filename: the name of the request CSV file to check.
+        products_dict: the dictionary returned from read_dictionary.
+        order_column_index: the index of the order id column or None.
+        product_column_index: the index of the product number column.
+        quantity_column_index: the index of the quantity column.
+
+    Return: a compound list of [line_number, message] lists sorted by
+        line number; an empty list if the file has no problems.
+    """
+    min_columns = _min_columns(order_column_index, product_column_index, quantity_column_index)
+    problems = []
+    product_numbers = set()
+
+    with open(filename, "rt") as csv_file:  # Open the request file for reading in text mode
+        reader = csv.reader(csv_file)  # Create a CSV reader object
+        next(reader, None)  # Skip the header row
+        for row in reader:
+            if len(row) < min_columns:
+                continue  # read_orders skips these rows too
+            product_numbers.add(row[product_column_index])
+            try:
+                int(row[quantity_column_index])
+            except ValueError:
+                problems.append([reader.line_num, f"invalid quantity {row[quantity_column_index]!r}"])
+
+    unknown = product_numbers - products_dict.keys()  # One set operation for the whole file
+    if len(unknown) != 0:
+        with open(filename, "rt") as csv_file:
+            reader = csv.reader(csv_file)
+            next(reader, None)
+            for row in reader:
+                if len(row) >= min_columns and row[product_column_index] in unknown:
+                    problems.append([reader.line_num, f"unknown product ID {row[product_column_index]!r}"])
+
+    problems.sort(key=lambda problem: problem[0])
+    return problems
+
+def read_orders(filename, order_column_index=None, product_column_index=0, quantity_column_index=1, skip_lines=None):
+    """Read a request CSV file one order at a time.
+
+    The rows of one order must be next to each other in the file, so
+    only the current order is kept in memory no matter how large the
+    file is. When order_column_index is None the whole file is one
+    order whose id is None, which is the layout of request.csv.
+
+    Parameters:
+        filename: the name of the request CSV file to read.
+        order_column_index: the index of the order id column or None.
+        product_column_index: the index of the product number column.
+        quantity_column_index: the index of the quantity column.
+        skip_lines: a set of line numbers to leave out, for example
+            the lines reported by check_request_file.
+
+    Return: a generator of (order_id, items) tuples where items is a
+        compound list of [product_number, quantity] lists.
+    """
+    min_columns = _min_columns(order_column_index, product_column_index, quantity_column_index)  # Number of columns a usable row needs
+
+    with open(filename, "rt") as csv_file:  # Open the request file for reading in text mode
+        reader = csv.reader(csv_file)  # Create a CSV reader object
+        next(reader, None)  # Skip the header row
+        rows = (row for row in reader if len(row) >= min_columns)  # Skip rows that don't have enough columns
+        if skip_lines:
+            rows = (row for row in rows if reader.line_num not in skip_lines)  # Skip the lines with problems
+
+        if order_column_index is None:
+            items = [[row[product_column_index], int(row[quantity_column_index])] for row in rows]
+            if len(items) != 0:
+                yield None, items  # The whole file is a single order
+            return
+
+        for order_id, order_rows in groupby(rows, key=lambda row: row[order_column_index]):
+            items = [[row[product_column_index], int(row[quantity_column_index])] for row in order_rows]
+            yield order_id, items  # Hand one order to the caller before reading the next one
+
+def price_order(items, products_dict, discount_rate, order_id=None, tax=None):
+    """Price the items of one order and return a receipt dictionary.
+
+    Parameters:
+        items: a compound list of [product_number, quantity] lists.
+        products_dict: the dictionary returned from read_dictionary.
+        discount_rate: the discount to apply to each product price,
+            or a RateTable with a discount for each product.
+        order_id: the id of the order, or None for a single order.
+        tax: a TaxTable from tax_engine.py, or None to apply
+            sales_tax_rate to the whole subtotal.
+
+    Return: a dictionary with the keys order_id, items (a compound
+        list of [product_name, quantity, price] lists), total_items,
+        subtotal, sales_tax and total.
+    A KeyError is raised if a product number is not in products_dict.
+    """
+    rates, default_rate = _split_rates(discount_rate)  # Discount for each product
+    priced_items = []  # Initialize the list of priced items
+    subtotal = 0.0  # Initialize subtotal
+    total_items = 0  # Initialize total items count
+
+    for product_number, quantity in items:
+        product = products_dict[product_number]  # Retrieve the product details from the dictionary using the product number
+        product_name = product[1]  # Get the product name from the product details
+        product_price = float(product[2])  # Get the product price from the product details and convert it to a float
+
+        # Apply discount if applicable
+        product_discount = rates.get(product_number, default_rate)  # One lookup no matter how many rules there are
+        if product_discount > 0:
+            product_price -= product_price * product_discount  # Apply the discount to the product price
+
+        total_items += quantity  # Add the quantity to the total items count
+        subtotal += product_price * quantity  # Add the total price of this product to the subtotal
+        priced_items.append([product_name, quantity, product_price])
+
+    if tax is None:
+        sales_tax = subtotal * sales_tax_rate  # Calculate the sales tax
+    else:
+        sales_tax = tax.sales_tax([product_number for product_number, _ in items],
+            [price * quantity for _, quantity, price in priced_items])  # Tax each category at its own rate
+    total = subtotal + sales_tax  # Calculate the total amount
+
+    return {
+        "order_id": order_id,
+        "items": priced_items,
+        "total_items": total_items,
+        "subtotal": subtotal,
+        "sales_tax": sales_tax,
+        "total": total,
+    }
+
+class _UnitPrices(dict):
+    """A dictionary of discounted unit prices that looks up and
+    converts each product's price the first time it is needed.
+    """
+
+    def __init__(self, products_dict, discount_rate):
+        super().__init__()
+        self.products_dict = products_dict
+        self.rates, self.default_rate = _split_rates(discount_rate)
+
+    def __missing__(self, product_number):
+        product_price = float(self.products_dict[product_number][2])  # Same conversion as price_order
+        product_discount = self.rates.get(product_number, self.default_rate)
+        if product_discount > 0:
+            product_price -= product_price * product_discount  # Same discount as price_order
+        self[product_number] = product_price
+        return product_price
+
+def total_orders(orders, products_dict, discount_rate, tax=None):
+    """Compute the totals of many orders without building their
+    receipts.
+
+    Each order is split into a product number column and a quantity
+    column. The discounted unit prices are gathered for the whole
+    column with one lookup per line into a table that converts each
+    product's price only once, and the columns are then multiplied
+    and added with map and reduce. The arithmetic is the same as in
+    price_order, in the same order, so every total is exactly equal
+    to the total that price_order computes.
+
+    Parameters:
+        orders: an iterable of (order_id, items) tuples, for example
+            the generator returned from read_orders.
+        products_dict: the dictionary returned from read_dictionary.
+        discount_rate: the discount to apply to each product price,
+            or a RateTable with a discount for each product.
+        tax: a TaxTable from tax_engine.py, or None to apply
+            sales_tax_rate to the whole subtotal. With a TaxTable each
+            dictionary also has the key taxes, a dictionary with the
+            tax of every jurisdiction in the table, all computed in
+            the same pass.
+
+    Return: a generator of dictionaries with the keys order_id,
+        total_items, subtotal, sales_tax and total.
+    A KeyError is raised if a product number is not in products_dict.
+    """
+    unit_prices = _UnitPrices(products_dict, discount_rate)
+    for order_id, items in orders:
+        if len(items) == 0:
+            product_numbers, quantities = (), ()
+        else:
+            product_numbers, quantities = zip(*items)  # Split the order into columns
+        prices = map(unit_prices.__getitem__, product_numbers)  # Gather the unit prices
+        if tax is None:
+            subtotal = reduce(operator.add, map(operator.mul, prices, quantities), 0.0)
+            sales_tax = subtotal * sales_tax_rate  # Calculate the sales tax
+            totals = {}
+        else:
+            amounts = list(map(operator.mul, prices, quantities))  # The amount of each line
+            subtotal = reduce(operator.add, amounts, 0.0)
+            taxes = tax.order_taxes(product_numbers, amounts)  # Every jurisdiction at once
+            sales_tax = taxes[0]
+            totals = {"taxes": dict(zip(tax.jurisdictions, taxes))}
+        yield {
+            "order_id": order_id,
+            "total_items": sum(quantities),
+            "subtotal": subtotal,
+            "sales_tax": sales_tax,
+            "total": subtotal + sales_tax,
+            **totals,
+        }
+
+def format_receipt(receipt, date):
+    """Render a receipt dictionary into the text that is printed for
+    the customer.
+
+    Parameters:
+        receipt: a dictionary returned from price_order.
+        date: the datetime object printed at the bottom of the receipt.
+
+    Return: the receipt text as one string.
+    """
+    lines = ["", store_name, ""]  # Store name surrounded by blank lines
+    if receipt["order_id"] is not None:
+        lines.append(f"Order: {receipt['order_id']}")  # Identify the order in batch mode
+    lines.append("Requested Items")  # Header for requested items
+
+    for product_name, quantity, product_price in receipt["items"]:
+        lines.append(f"{product_name}: {quantity} @ ${product_price:.2f}")  # Product name, quantity, and price
+
+    lines.extend([
+        "",
+        f"Number of items: {receipt['total_items']}",
+        f"Subtotal: ${receipt['subtotal']:.2f}",
+        f"Sales Tax: ${receipt['sales_tax']:.2f}",
+        f"Total: ${receipt['total']:.2f}",
+        "",
+        f"Thank you for shopping at {store_name}",
+        date.strftime("%a %b %d %H:%M:%S %Y"),  # Current date and time in the specified format
+        "",
+        "Please visit our website to complete a survey about your shopping experience!",
+        "Your feedback is valuable to us.",
+        "Survey URL: www.ernestosgroceries.com/survey",
+        "",
+    ])
+    return "\n".join(lines) + "\n"
+
+def receipt_record(receipt, date):
+    """Convert a receipt dictionary into a dictionary of plain values
+    that can be written as JSON. Money amounts are rounded to cents,
+    the same as in the printed receipt.
+
+    Parameters:
+        receipt: a dictionary returned from price_order.
+        date: the datetime object of the purchase.
+
+    Return: a dictionary with the keys order_id, date, items,
+        total_items, subtotal, sales_tax and total.
+    """
+    return {
+        "order_id": receipt["order_id"],
+        "date": date.isoformat(timespec="seconds"),
+        "items": [{"name": product_name, "quantity": quantity, "price": round(product_price, 2)}
+            for product_name, quantity, product_price in receipt["items"]],
+        "total_items": receipt["total_items"],
+        "subtotal": round(receipt["subtotal"], 2),
+        "sales_tax": round(receipt["sales_tax"], 2),
+        "total": round(receipt["total"], 2),
+    }
+
+def format_receipt_json(receipt, date):
+    """Render a receipt dictionary as one line of JSON.
+
+    Parameters:
+        receipt: a dictionary returned from price_order.
+        date: the datetime object of the purchase.
+
+    Return: the JSON text followed by a newline.
+    """
+    return json.dumps(receipt_record(receipt, date)) + "\n"
+
+csv_receipt_header = ["Order #", "Date", "Product", "Quantity", "Price", "Subtotal", "Sales Tax", "Total"]
+
+def format_receipt_csv(receipt, date):
+    """Render a receipt dictionary as CSV rows with the columns in
+    csv_receipt_header. There is one row for each requested item and
+    then one row for the receipt totals with an empty product name
+    and the number of items in the quantity column.
+
+    Parameters:
+        receipt: a dictionary returned from price_order.
+        date: the datetime object of the purchase.
+
+    Return: the CSV text of all the rows.
+    """
+    order_id = "" if receipt["order_id"] is None else receipt["order_id"]
+    when = date.isoformat(timespec="seconds")
+    rows = [[order_id, when, product_name, quantity, f"{product_price:.2f}", "", "", ""]
+        for product_name, quantity, product_price in receipt["items"]]
+    rows.append([order_id, when, "", receipt["total_items"], "",
+        f"{receipt['subtotal']:.2f}", f"{receipt['sales_tax']:.2f}", f"{receipt['total']:.2f}"])
+    text = io.StringIO()
+    csv.writer(text, lineterminator="\n").writerows(rows)
+    return text.getvalue()
+
+def _no_header():
+    return ""
+
+def _csv_header():
+    text = io.StringIO()
+    csv.writer(text, lineterminator="\n").writerow(csv_receipt_header)
+    return text.getvalue()
+
+# Output formats for write_receipts: format name -> (function that
+# renders one receipt, function that returns the text written once
+# before the first receipt)
+output_formats = {
+    "text": (format_receipt, _no_header),
+    "json": (format_receipt_json, _no_header),
+    "csv": (format_receipt_csv, _csv_header),
+}
+
+def write_receipts(orders, products_dict, out_file, date, rules=None, output_format="text", header=True, journal=None,
+        tax=None):
+    """Price each order and write its receipt to out_file.
+
+    Each receipt is rendered into one string. The strings are
+    collected until they hold write_buffer_size characters and then
+    written with a single call, so the cost of writing stays small
+    even for millions of receipts.
+
+    Parameters:
+        orders: an iterable of (order_id, items) tuples, for example
+            the generator returned from read_orders.
+        products_dict: the dictionary returned from read_dictionary.
+        out_file: a text file object to write the receipts to.
+        date: the datetime object used for the discount and printed
+            on each receipt.
+        rules: a PricingRules object, or None for the weekday discount.
+        output_format: "text" for the printed receipt, "json" for
+            JSON Lines or "csv" for CSV rows.
+        header: False to leave out the CSV header row.
+        journal: a ReceiptJournal from receipt_journal.py to store
+            every receipt in, or None.
+        tax: a TaxTable from tax_engine.py, or None to apply
+            sales_tax_rate to the whole subtotal.
+
+    Return: the number of receipts written.
+    """
+    if rules is None:
+        rules = default_rules
+    render, make_header = output_formats[output_format]
+    buffer = [make_header()] if header else []
+    buffered = 0
+    count = 0
     try:
-        sales_tax_rate = 0.06  # Define the sales tax rate
-        subtotal = 0.0  # Initialize subtotal
-        total_items = 0  # Initialize total items count
+        for order_id, items in orders:
+            discount_rate = get_order_discount(rules, items, products_dict, date)
+            receipt = price_order(items, products_dict, discount_rate, order_id, tax)
+            if journal is not None:
+                journal.append(receipt, date)  # Keep the receipt for reprints
+            text = render(receipt, date)  # Render the whole receipt into one string
+            buffer.append(text)
+            buffered += len(text)
+            count += 1
+            if buffered >= write_buffer_size:
+                out_file.write("".join(buffer))  # Write many receipts at once
+                buffer = []
+                buffered = 0
+    finally:
+        # Write the receipts that were finished before an error, too.
+        out_file.write("".join(buffer))
+    return count
+
+_worker_products = None  # Products loaded once in each worker process
+_worker_rules = None  # Discount rules sent once to each worker process
+_worker_tax = None  # Tax table sent once to each worker process
+
+def _init_worker(products_filename, rules=None, tax=None):
+    """Load the products once when a worker process starts, and keep
+    the rules and tax table, which are sent to it only once.
+    """
+    global _worker_products, _worker_rules, _worker_tax
+    _worker_products = read_products(products_filename)
+    _worker_rules = rules
+    _worker_tax = tax
 
-        # Check for discount based on the day of the week
+def _price_shard(shard, date, output_format):
+    """Price a shard of orders in a worker process and return the
+    text of all its receipts.
+    """
+    out_file = io.StringIO()
+    write_receipts(shard, _worker_products, out_file, date, _worker_rules, output_format,
+        header=False, tax=_worker_tax)
+    return out_file.getvalue()
+
+def write_receipts_parallel(orders, products_filename, out_file, date, workers=None, shard_size=1000, rules=None,
+        output_format="text", tax=None):
+    """Price orders in a pool of worker processes and write the
+    receipts to out_file in the same order as the orders. The output
+    is exactly the same as the output of write_receipts.
+
+    The orders are cut into shards of shard_size orders. Each worker
+    reads the products file and receives the rules and tax table once
+    when it starts, so only the orders are sent with each shard. At most two
+    shards per worker are waiting at any time, so memory stays bounded
+    no matter how many orders there are.
+
+    Parameters:
+        orders: an iterable of (order_id, items) tuples, for example
+            the generator returned from read_orders.
+        products_filename: the products CSV or snapshot file that each
+            worker process reads.
+        out_file: a text file object to write the receipts to.
+        date: the datetime object used for the discount and printed
+            on each receipt.
+        workers: the number of worker processes; None uses one per CPU.
+        shard_size: the number of orders sent to a worker at a time.
+        rules: a PricingRules object, or None for the weekday discount.
+        output_format: "text", "json" or "csv", as in write_receipts.
+        tax: a TaxTable from tax_engine.py, or None to apply
+            sales_tax_rate to the whole subtotal.
+
+    Return: the number of receipts written.
+    """
+    out_file.write(output_formats[output_format][1]())  # The CSV header is written once, not once per shard
+    if workers is None:
+        workers = os.cpu_count() or 1
+    max_pending = 2 * workers  # Shards in flight before waiting for the oldest one
+    orders = iter(orders)
+    count = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+            initargs=(products_filename, rules, tax)) as executor:
+        pending = deque()
+        while True:
+            shard = list(islice(orders, shard_size))  # Take the next shard of orders
+            if len(shard) != 0:
+                pending.append(executor.submit(_price_shard, shard, date, output_format))
+                count += len(shard)
+            if len(pending) != 0 and (len(shard) == 0 or len(pending) >= max_pending):
+                out_file.write(pending.popleft().result())  # Write the oldest shard so the output keeps the input order
+            elif len(shard) == 0:
+                break
+    return count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=f"Print receipts for {store_name}.")
+    parser.add_argument("request_file", nargs="?", default="request.csv", help="the CSV file of requested items")
+    parser.add_argument("--products", default="products.csv", help="the CSV file of products")
+    parser.add_argument("--batch", action="store_true",
+        help="the first column of the request file is an order id; print one receipt per order")
+    parser.add_argument("--workers", type=int, default=0,
+        help="price the orders in this many worker processes (default: price them in this process)")
+    parser.add_argument("--rules", help="a CSV file of discount rules (default: 10%% off on Tuesday and Wednesday)")
+    parser.add_argument("--format", choices=sorted(output_formats), default="text",
+        help="print receipts as text, JSON Lines or CSV (default: text)")
+    parser.add_argument("--journal", help="also append every receipt to this receipt journal")
+    parser.add_argument("--tax-rates", help="a CSV file of sales tax rates for each jurisdiction and tax category"
+        " (default: 6%% on everything)")
+    parser.add_argument("--tax-categories", help="a CSV file that assigns the products to tax categories")
+    parser.add_argument("--jurisdiction", help="the jurisdiction in the tax rates file to use (default: the first one)")
+    args = parser.parse_args(argv)
+    if args.journal and args.workers > 0:
+        parser.error("--journal can't be used with --workers")
+
+    # receipt_journal imports this module, so import it here, not at the top.
+    from receipt_journal import ReceiptJournal, JournalError
+
+    try:
         current_date_and_time = datetime.now()  # Get the current date and time
-        current_day = current_date_and_time.strftime("%A")  # Get the current day of the week
-        discount = 0.10 if current_day in ["Tuesday", "Wednesday"] else 0.0  # Apply a 10% discount if today is Tuesday or Wednesday
-
-        dictionary = read_dictionary('products.csv', 0)  # Call read_dictionary to read products.csv and store the result in dictionary
-        print()
-        print(store_name)  # Print the store name
-        print()
-        print("Requested Items")  # Print a header for requested items
-
-        with open('request.csv', 'rt') as csv_file:  # Open the request.csv file for reading in text mode
-            reader = csv.reader(csv_file)  # Create a CSV reader object
-            next(reader)  # Skip the header row
-
-            for row in reader:  # Iterate over each row in the request CSV file
-                if len(row) < 2:  # Skip rows that don't have enough columns
-                    continue
-                product_number = row[0]  # Get the product number from the first column
-                quantity = int(row[1])  # Get the quantity from the second column and convert it to an integer
-                product = dictionary[product_number]  # Retrieve the product details from the dictionary using the product number
-                product_name = product[1]  # Get the product name from the product details
-                product_price = float(product[2])  # Get the product price from the product details and convert it to a float
-
-                # Apply discount if applicable
-                if discount > 0:
-                    product_price -= product_price * discount  # Apply the discount to the product price
-
-                total_items += quantity  # Add the quantity to the total items count
-                subtotal += product_price * quantity  # Add the total price of this product to the subtotal
-
-                # Print the product name, quantity, and price in the specified format
-                print(f"{product_name}: {quantity} @ ${product_price:.2f}")
+        dictionary = read_products(args.products)  # Read the products CSV or snapshot file and store the result in dictionary
+        # The worker processes read the products file again; reading it here
+        # first reports a missing or unreadable file before any worker starts.
 
-        sales_tax = subtotal * sales_tax_rate  # Calculate the sales tax
-        total = subtotal + sales_tax  # Calculate the total amount
-
-        print()
-        print(f"Number of items: {total_items}")  # Print the total number of items
-        print(f"Subtotal: ${subtotal:.2f}")  # Print the subtotal amount
-        print(f"Sales Tax: ${sales_tax:.2f}")  # Print the sales tax amount
-        print(f"Total: ${total:.2f}")  # Print the total amount
-        print()
-        print(f"Thank you for shopping at {store_name}")  # Print a thank you message with the store name
-        print(current_date_and_time.strftime("%a %b %d %H:%M:%S %Y"))  # Print the current date and time in the specified format
-        print()
-        print("Please visit our website to complete a survey about your shopping experience!")  # Print a survey invitation
-        print("Your feedback is valuable to us.")  # Print a message emphasizing the value of feedback
-        print("Survey URL: www.ernestosgroceries.com/survey")  # Print the survey URL
-        print()
+        columns = (0, 1, 2) if args.batch else (None, 0, 1)  # Order id, product number and quantity columns
+        problems = check_request_file(args.request_file, dictionary, *columns)  # Find every bad line before printing anything
+        for line_number, message in problems:
+            print(f"Error: line {line_number} of {args.request_file}: {message}", file=sys.stderr)
+        skip_lines = {line_number for line_number, _ in problems}
+        orders = read_orders(args.request_file, *columns, skip_lines=skip_lines)  # Price only the valid lines
+        rules = load_pricing_rules(args.rules, dictionary.keys())  # Compile the discount rules for these products
+        tax = None
+        if args.tax_rates or args.tax_categories or args.jurisdiction:
+            # Give every product its tax category once, before any receipt is priced.
+            tax = load_tax_table(dictionary.keys(), args.tax_rates, args.tax_categories, args.jurisdiction)
+
+        if args.workers > 0:
+            write_receipts_parallel(orders, args.products, sys.stdout, current_date_and_time, args.workers,
+                rules=rules, output_format=args.format, tax=tax)
+        else:
+            journal = ReceiptJournal(args.journal) if args.journal else None
+            try:
+                write_receipts(orders, dictionary, sys.stdout, current_date_and_time, rules, args.format, journal=journal,
+                    tax=tax)
+            finally:
+                if journal is not None:
+                    journal.close()
     except KeyError as key_err:  # Handle KeyError exceptions
         print(f"Error: Unknown product ID in the request.csv {key_err}")  # Print an error message for unknown product IDs
     except FileNotFoundError as not_found_err:  # Handle FileNotFoundError exceptions
         print(f"Error: Missing file {not_found_err}")  # Print an error message for missing files
     except PermissionError as perm_err:  # Handle PermissionError exceptions
         print(f"Error: Permission denied {perm_err}")  # Print an error message for permission errors
+    except JournalError as journal_err:  # Handle a damaged or out of order journal
+        print(f"Error: {journal_err}")  # Print an error message for the journal
+    except RuleError as rule_err:  # Handle invalid discount rules
+        print(f"Error: {rule_err}")  # Print an error message for an invalid rule
+    except TaxError as tax_err:  # Handle invalid tax categories or rates
+        print(f"Error: {tax_err}")  # Print an error message for the tax files
 
 if __name__ == "__main__":
     main()  # Call the main function if the script is executed directly
@@ -0,0 +1,390 @@
+# Benchmarks for the receipt code in receipt.py. Run this program to
+# generate synthetic product catalogs and request files of several
+# sizes and measure how long it takes, and how much memory it needs,
+# to load the catalog, look up products, total the orders and write
+# the receipts. The results can be saved as a JSON baseline and later
+# runs compared with it, so a slower receipt path shows up as numbers.
+# With --lanes it runs checkout lane threads that read an RcuCatalog
+# while a writer thread changes prices, and reports lookups per second.
+import argparse  # Import argparse to read the command line options
+import json  # Import json to read and write baselines
+import os  # Import os to write receipts to the null device
+import platform  # Import platform to record the Python version in a baseline
+import random  # Import random to make synthetic products and orders
+import sys  # Import sys to set the exit status when a benchmark regresses
+import tempfile  # Import tempfile for the generated files
+import threading  # Import threading to run checkout lanes next to a price writer
+import time  # Import time to measure how long each step takes
+import tracemalloc  # Import tracemalloc to measure peak memory
+from datetime import datetime  # Import datetime for the date printed on the receipts
+from catalog import ProductCatalog, RcuCatalog
+from receipt import read_dictionary, read_orders, price_order, total_orders, \
+    write_receipts, output_formats
+
+
+def make_products(product_count, seed=0):
+    """Make a synthetic products dictionary like the one returned
+    from receipt.read_dictionary.
+
+    Parameters
+        product_count: the number of products to make.
+        seed: the seed for the random prices.
+    Return: a dictionary of [product_number, name, price] lists.
+    """
+    return {row[0]: row for row in product_rows(product_count, seed)}
+
+
+def product_number(index):
+    """Return the synthetic product number of product index."""
+    return f"P{index:07d}"
+
+
+def product_rows(product_count, seed=0):
+    """Return a generator of synthetic [product_number, name, price]
+    rows. Names repeat every 1000 products, like the sizes and
+    flavors of a real catalog.
+    """
+    rand = random.Random(seed)
+    for index in range(product_count):
+        price = f"{rand.randint(25, 2500) / 100:.2f}"
+        yield [product_number(index), f"product {index % 1000}", price]
+
+
+def write_catalog_file(filename, product_count, seed=0):
+    """Write a synthetic products CSV file with the same columns as
+    products.csv, one row at a time.
+    """
+    with open(filename, "wt") as csv_file:
+        csv_file.write("Product #,Name,Price\n")
+        for row in product_rows(product_count, seed):
+            csv_file.write(",".join(row) + "\n")
+
+
+def write_request_file(filename, product_count, line_count, lines_per_order=20, seed=1):
+    """Write a synthetic request CSV file with an order id column,
+    the layout that receipt.py --batch reads, one row at a time.
+    """
+    rand = random.Random(seed)
+    with open(filename, "wt") as csv_file:
+        csv_file.write("Order #,Product #,Quantity\n")
+        for line in range(line_count):
+            order_id = line // lines_per_order
+            product = product_number(rand.randrange(product_count))
+            csv_file.write(f"{order_id},{product},{rand.randint(1, 5)}\n")
+
+
+def make_orders(products_dict, line_count, lines_per_order=20, seed=1):
+    """Make a list of synthetic orders.
+
+    Parameters
+        products_dict: the products to choose from.
+        line_count: the total number of request lines.
+        lines_per_order: the number of lines in each order.
+        seed: the seed for the random choices.
+    Return: a list of (order_id, items) tuples like the ones
+        returned from receipt.read_orders.
+    """
+    rand = random.Random(seed)
+    product_numbers = list(products_dict)
+    orders = []
+    for start in range(0, line_count, lines_per_order):
+        size = min(lines_per_order, line_count - start)
+        items = [[rand.choice(product_numbers), rand.randint(1, 5)]
+                for _ in range(size)]
+        orders.append((str(len(orders)), items))
+    return orders
+
+
+def timed(function, *args):
+    """Call function and return its result and the seconds it took."""
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def measured(function, *args, memory=True):
+    """Call function, then call it again with tracemalloc running.
+
+    Return: a dictionary with the seconds the first call took and the
+        peak memory in bytes that the second call allocated, or None
+        when memory is False.
+    """
+    _, seconds = timed(function, *args)
+    peak_bytes = None
+    if memory:
+        tracemalloc.start()
+        try:
+            function(*args)
+            _, peak_bytes = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return {"seconds": seconds, "peak_bytes": peak_bytes}
+
+
+def run_suite(size, workdir, memory=True, lookups=100000):
+    """Run every benchmark for one size: a catalog of size products
+    and a request file of size lines.
+
+    Parameters
+        size: the number of products and of request lines.
+        workdir: a directory for the generated files.
+        memory: False to skip the tracemalloc runs.
+        lookups: the number of product lookups to time.
+    Return: a dictionary from benchmark name to the dictionary
+        returned from measured.
+    """
+    catalog_file = os.path.join(workdir, f"products_{size}.csv")
+    snapshot_file = os.path.join(workdir, f"products_{size}.pcat")
+    request_file = os.path.join(workdir, f"request_{size}.csv")
+    write_catalog_file(catalog_file, size)
+    write_request_file(request_file, size, size)
+    ProductCatalog.from_csv(catalog_file).save(snapshot_file)
+
+    products_dict = read_dictionary(catalog_file, 0)
+    catalog = ProductCatalog.open(snapshot_file)
+    rand = random.Random(2)
+    keys = [product_number(rand.randrange(size)) for _ in range(lookups)]
+    date = datetime(2024, 6, 4, 12, 0)
+
+    def lookup_dictionary():
+        for key in keys:
+            float(products_dict[key][2])
+
+    def lookup_catalog():
+        price_cents = catalog.price_cents
+        for key in keys:
+            price_cents(key)
+
+    def total_stream():
+        for _ in total_orders(read_orders(request_file, 0, 1, 2), products_dict, 0.10):
+            pass
+
+    def write_stream():
+        with open(os.devnull, "wt") as out_file:
+            write_receipts(read_orders(request_file, 0, 1, 2), products_dict, out_file, date)
+
+    benchmarks = {
+        "load_read_dictionary": (read_dictionary, catalog_file, 0),
+        "load_catalog_csv": (ProductCatalog.from_csv, catalog_file),
+        "open_catalog_snapshot": (lambda: ProductCatalog.open(snapshot_file).close(),),
+        "lookup_dictionary": (lookup_dictionary,),
+        "lookup_catalog": (lookup_catalog,),
+        "total_orders_stream": (total_stream,),
+        "write_receipts_stream": (write_stream,),
+    }
+    results = {}
+    for name, (function, *args) in benchmarks.items():
+        results[name] = measured(function, *args, memory=memory)
+    catalog.close()
+    return results
+
+
+def compare_results(results, baseline, tolerance=0.25):
+    """Compare results with a baseline that has the same layout.
+
+    Parameters
+        results: the "results" of a run: size -> benchmark -> values.
+        baseline: the "results" of an earlier run.
+        tolerance: the fraction by which a time or peak memory may
+            grow before it counts as a regression.
+    Return: a list of messages, one for each regression.
+    """
+    regressions = []
+    for size, benchmarks in results.items():
+        for name, values in benchmarks.items():
+            old_values = baseline.get(size, {}).get(name)
+            if old_values is None:
+                continue
+            for key in ["seconds", "peak_bytes"]:
+                old, new = old_values.get(key), values.get(key)
+                if old and new and new > old * (1 + tolerance):
+                    regressions.append(f"{name} at size {size}: {key} "
+                            f"grew from {old:.6g} to {new:.6g}")
+    return regressions
+
+
+def bench_totaling(line_count, product_count=10000, discount_rate=0.10):
+    """Total line_count request lines with price_order and with
+    total_orders and check that both give the same totals to the cent.
+
+    Return: a dictionary with the seconds each function took.
+    """
+    products_dict = make_products(product_count)
+    orders = make_orders(products_dict, line_count)
+
+    def loop_totals():
+        return [price_order(items, products_dict, discount_rate, order_id)
+                for order_id, items in orders]
+
+    def bulk_totals():
+        return list(total_orders(orders, products_dict, discount_rate))
+
+    loop_receipts, loop_seconds = timed(loop_totals)
+    bulk_receipts, bulk_seconds = timed(bulk_totals)
+
+    for loop, bulk in zip(loop_receipts, bulk_receipts):
+        for key in ["total_items", "subtotal", "sales_tax", "total"]:
+            if f"{loop[key]:.2f}" != f"{bulk[key]:.2f}":
+                raise AssertionError(f"order {loop['order_id']}: {key} "
+                        f"{loop[key]:.2f} != {bulk[key]:.2f}")
+
+    return {"lines": line_count, "price_order": loop_seconds,
+            "total_orders": bulk_seconds}
+
+
+def bench_writing(line_count, product_count=10000):
+    """Write the receipts for line_count request lines to the null
+    device in each output format.
+
+    Return: a dictionary with the seconds each format took.
+    """
+    products_dict = make_products(product_count)
+    orders = make_orders(products_dict, line_count)
+    date = datetime(2024, 6, 4, 12, 0)
+    result = {"lines": line_count}
+    with open(os.devnull, "wt") as out_file:
+        for output_format in sorted(output_formats):
+            _, seconds = timed(write_receipts, orders, products_dict,
+                    out_file, date, None, output_format)
+            result[output_format] = seconds
+    return result
+
+
+def bench_lanes(lanes, updates_per_second, seconds=1.0, product_count=10000,
+        prices_per_update=10, items_per_receipt=20):
+    """Run checkout lane threads that look up prices in an RcuCatalog
+    while a writer thread changes prices.
+
+    Each lane takes one snapshot per receipt and looks up every item
+    of the receipt in it, the way a lane prices a receipt.
+
+    Parameters
+        lanes: the number of checkout lane threads.
+        updates_per_second: how often the writer changes prices; 0
+            for no writer.
+        seconds: how long to run.
+        product_count: the number of products in the catalog.
+        prices_per_update: the number of prices in each change.
+        items_per_receipt: the number of lookups in each receipt.
+    Return: a dictionary with the keys lanes, updates_per_second,
+        lookups, updates and lookups_per_second.
+    """
+    products_dict = make_products(product_count)
+    catalog = RcuCatalog(products_dict)
+    product_numbers = list(products_dict)
+    stop = threading.Event()
+    lookups = [0] * lanes
+    updates = 0
+
+    def lane(index):
+        rand = random.Random(index)
+        receipts = [[rand.choice(product_numbers) for _ in range(items_per_receipt)]
+                for _ in range(100)]
+        count = 0
+        while not stop.is_set():
+            for receipt in receipts:
+                snapshot = catalog.snapshot()  # One consistent catalog per receipt
+                for product_number in receipt:
+                    float(snapshot[product_number][2])
+            count += len(receipts) * items_per_receipt
+        lookups[index] = count
+
+    def writer():
+        nonlocal updates
+        rand = random.Random(-1)
+        while not stop.wait(1 / updates_per_second):
+            catalog.update(prices={rand.choice(product_numbers): f"{rand.randint(25, 2500) / 100:.2f}"
+                    for _ in range(prices_per_update)})
+            updates += 1
+
+    threads = [threading.Thread(target=lane, args=(index,)) for index in range(lanes)]
+    if updates_per_second > 0:
+        threads.append(threading.Thread(target=writer))
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    stop.wait(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return {"lanes": lanes, "updates_per_second": updates_per_second,
+            "lookups": sum(lookups), "updates": updates,
+            "lookups_per_second": sum(lookups) / elapsed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the receipt code.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10**3, 10**4, 10**5],
+            help="the numbers of products and request lines to generate")
+    parser.add_argument("--no-memory", action="store_true",
+            help="skip the tracemalloc runs that measure peak memory")
+    parser.add_argument("--output", help="write the results to this JSON baseline file")
+    parser.add_argument("--compare", help="compare the results with this JSON baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+            help="the fraction a benchmark may grow before it is a regression")
+    parser.add_argument("--lines", type=int,
+            help="only compare price_order with total_orders and time the"
+            " output formats for this many request lines")
+    parser.add_argument("--lanes", type=int, nargs="+",
+            help="only run the checkout lane stress test with these numbers of lane threads")
+    parser.add_argument("--update-rates", type=float, nargs="+", default=[0, 10, 100, 1000],
+            help="the price changes per second for the lane stress test")
+    parser.add_argument("--seconds", type=float, default=1.0,
+            help="how long each lane stress test runs")
+    args = parser.parse_args(argv)
+
+    if args.lanes is not None:
+        print(f"{'lanes':>5} {'updates/s':>10} {'updates':>8} {'lookups/s':>12}")
+        for lanes in args.lanes:
+            for rate in args.update_rates:
+                result = bench_lanes(lanes, rate, args.seconds)
+                print(f"{lanes:5} {rate:10g} {result['updates']:8} {result['lookups_per_second']:12.0f}")
+        return
+
+    if args.lines is None:
+        run_sizes(args)
+        return
+
+    result = bench_totaling(args.lines)
+    print(f"Request lines: {result['lines']}")
+    print(f"price_order loop: {result['price_order']:.3f} s")
+    print(f"total_orders:     {result['total_orders']:.3f} s")
+    print(f"Speedup: {result['price_order'] / result['total_orders']:.1f}x")
+
+    result = bench_writing(args.lines)
+    for output_format in sorted(output_formats):
+        print(f"write_receipts {output_format:5}: {result[output_format]:.3f} s")
+
+
+def run_sizes(args):
+    """Run the suite for every size in args.sizes and handle the
+    --output and --compare options.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            results[str(size)] = run_suite(size, workdir, memory=not args.no_memory)
+            for name, values in results[str(size)].items():
+                peak = values["peak_bytes"]
+                memory = "" if peak is None else f"  peak {peak / 2**20:9.2f} MiB"
+                print(f"{size:>9} {name:24} {values['seconds']:9.4f} s{memory}")
+
+    if args.output:
+        with open(args.output, "wt") as json_file:
+            json.dump({"python": platform.python_version(),
+                    "results": results}, json_file, indent=2)
+
+    if args.compare:
+        with open(args.compare, "rt") as json_file:
+            baseline = json.load(json_file)["results"]
+        regressions = compare_results(results, baseline, args.tolerance)
+        for message in regressions:
+            print(f"Regression: {message}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
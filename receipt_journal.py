@@ -0,0 +1,250 @@
+# An append-only journal of the receipts printed by receipt.py. Every
+# receipt is appended to a data file as one JSON record, and a side
+# index file holds one fixed size entry for each receipt: its
+# timestamp and the position of its record in the data file. Receipt
+# ids are numbered 1, 2, 3, ... so the index entry of a receipt is
+# found by multiplying, and the receipts of a date range are found by
+# a binary search over the timestamps. Reprinting a receipt reads one
+# index entry and one record, no matter how many receipts there are.
+import argparse  # Import argparse to read the command line options
+import calendar  # Import calendar to turn a date into seconds
+import json  # Import json to store the receipt records
+import os  # Import os to find the size of the journal files
+import struct  # Import struct to pack the index entries
+import zlib  # Import zlib to check each record
+from datetime import datetime  # Import datetime to read the dates of receipts
+from receipt import receipt_record, format_receipt
+
+RECORD_HEADER = struct.Struct("<II")  # record length, CRC-32 of the record
+INDEX_ENTRY = struct.Struct("<qQ")  # timestamp in seconds, position of the record
+
+
+class JournalError(ValueError):
+    """JournalError is the type of error that ReceiptJournal raises
+    if a journal file is damaged or a receipt is out of order.
+    """
+
+
+def to_timestamp(date):
+    """Return the seconds from 1970-01-01 to date, reading date as
+    a wall clock time so the result does not depend on time zones.
+    """
+    return calendar.timegm(date.timetuple())
+
+
+def record_to_receipt(record):
+    """Convert a journal record back into a receipt dictionary like
+    the one returned from receipt.price_order and its date.
+
+    Return: a (receipt, date) tuple to pass to receipt.format_receipt.
+    """
+    receipt = {
+        "order_id": record["order_id"],
+        "items": [[item["name"], item["quantity"], item["price"]] for item in record["items"]],
+        "total_items": record["total_items"],
+        "subtotal": record["subtotal"],
+        "sales_tax": record["sales_tax"],
+        "total": record["total"],
+    }
+    return receipt, datetime.fromisoformat(record["date"])
+
+
+class ReceiptJournal:
+    """An append-only receipt journal stored in two files: filename
+    holds the records and filename + ".idx" holds the index.
+
+    Receipts must be appended in time order, because the date range
+    lookup searches the timestamps in the order they were appended.
+    """
+
+    def __init__(self, filename, sync=False, read_only=False):
+        """Open a journal, creating its files if they don't exist.
+
+        If the program stopped while a receipt was being appended,
+        the unfinished record or index entry is removed, so the
+        journal always ends with a complete receipt. A journal opened
+        read only is never changed: an unfinished receipt at its end,
+        which may be one that another program is appending right now,
+        is left out but not removed.
+
+        Parameters
+            filename: the name of the data file.
+            sync: True to call os.fsync after every receipt.
+            read_only: True to only read the receipts of a journal
+                whose files must already exist.
+        """
+        self.filename = filename
+        self.index_filename = filename + ".idx"
+        self.sync = sync
+        self.read_only = read_only
+        mode = "rb" if read_only else "a+b"
+        self._data = open(filename, mode)
+        try:
+            self._index = open(self.index_filename, mode)
+        except OSError:
+            self._data.close()
+            raise
+        self._recover()
+
+    def _recover(self):
+        index_size = os.fstat(self._index.fileno()).st_size
+        data_size = os.fstat(self._data.fileno()).st_size
+        count = index_size // INDEX_ENTRY.size  # Leave out a half written entry
+
+        # Without sync, the index can reach the disk before the data,
+        # so the last entries may point at records that are cut short.
+        # Those receipts were never completely written; remove them.
+        data_end = 0
+        self._last_timestamp = None
+        while count > 0:
+            timestamp, position = self._entry(count)
+            self._data.seek(position)
+            header = self._data.read(RECORD_HEADER.size)
+            if len(header) == RECORD_HEADER.size:
+                length, _ = RECORD_HEADER.unpack(header)
+                if position + RECORD_HEADER.size + length <= data_size:
+                    self._last_timestamp = timestamp
+                    data_end = position + RECORD_HEADER.size + length
+                    break
+            count -= 1
+        self._count = count
+        if self.read_only:
+            return
+        if index_size != count * INDEX_ENTRY.size:
+            self._index.truncate(count * INDEX_ENTRY.size)
+        if data_size > data_end:
+            self._data.truncate(data_end)  # Remove a record that has no index entry
+
+    def close(self):
+        """Close the journal files."""
+        self._data.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def append(self, receipt, date):
+        """Append a receipt to the journal.
+
+        Parameters
+            receipt: a dictionary returned from receipt.price_order.
+            date: the datetime object of the purchase.
+        Return: the id of the new receipt.
+        """
+        if self.read_only:
+            raise JournalError(f"{self.filename} is open read only")
+        timestamp = to_timestamp(date)
+        if self._last_timestamp is not None and timestamp < self._last_timestamp:
+            raise JournalError(f"receipt for {date} is older than the last receipt in the journal")
+
+        receipt_id = self._count + 1
+        record = receipt_record(receipt, date)
+        record["receipt_id"] = receipt_id
+        payload = json.dumps(record).encode()
+
+        self._data.seek(0, os.SEEK_END)
+        position = self._data.tell()
+        self._data.write(RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+        self._data.flush()
+        if self.sync:
+            os.fsync(self._data.fileno())
+        # The index entry is written after the record, so an entry
+        # never points at a record that isn't there.
+        self._index.write(INDEX_ENTRY.pack(timestamp, position))
+        self._index.flush()
+        if self.sync:
+            os.fsync(self._index.fileno())
+
+        self._count = receipt_id
+        self._last_timestamp = timestamp
+        return receipt_id
+
+    def _entry(self, receipt_id):
+        self._index.seek((receipt_id - 1) * INDEX_ENTRY.size)
+        return INDEX_ENTRY.unpack(self._index.read(INDEX_ENTRY.size))
+
+    def _read_record(self, position):
+        self._data.seek(position)
+        header = self._data.read(RECORD_HEADER.size)
+        if len(header) != RECORD_HEADER.size:
+            raise JournalError(f"damaged record at byte {position} of {self.filename}")
+        length, checksum = RECORD_HEADER.unpack(header)
+        payload = self._data.read(length)
+        if len(payload) != length or zlib.crc32(payload) != checksum:
+            raise JournalError(f"damaged record at byte {position} of {self.filename}")
+        return json.loads(payload)
+
+    def get(self, receipt_id):
+        """Return the record of one receipt: the dictionary written by
+        receipt.receipt_record with a receipt_id key added. Raise
+        KeyError if there is no receipt with that id.
+        """
+        if not 1 <= receipt_id <= self._count:
+            raise KeyError(receipt_id)
+        _, position = self._entry(receipt_id)
+        return self._read_record(position)
+
+    def reprint(self, receipt_id):
+        """Return the text of one receipt, exactly as receipt.py
+        printed it.
+        """
+        return format_receipt(*record_to_receipt(self.get(receipt_id)))
+
+    def _first_at_or_after(self, timestamp):
+        """Return the id of the first receipt whose timestamp is at
+        least timestamp, or len(self) + 1 if there is none.
+        """
+        low, high = 1, self._count + 1
+        while low < high:
+            middle = (low + high) // 2
+            if self._entry(middle)[0] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def between(self, start, end):
+        """Return a generator of the records of the receipts with a
+        date from start up to, but not including, end.
+
+        Parameters
+            start, end: datetime objects.
+        """
+        first = self._first_at_or_after(to_timestamp(start))
+        stop = self._first_at_or_after(to_timestamp(end))
+        for receipt_id in range(first, stop):
+            yield self.get(receipt_id)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read a receipt journal.")
+    parser.add_argument("journal", help="the journal file written by receipt.py --journal")
+    commands = parser.add_subparsers(dest="command", required=True)
+    reprint = commands.add_parser("reprint", help="print one receipt again")
+    reprint.add_argument("receipt_id", type=int)
+    dates = commands.add_parser("range", help="print the receipts of a date range as JSON Lines")
+    dates.add_argument("start", help="the first date, for example 2024-06-01")
+    dates.add_argument("end", help="the date after the last one, for example 2024-07-01")
+    args = parser.parse_args(argv)
+
+    with ReceiptJournal(args.journal, read_only=True) as journal:
+        if args.command == "reprint":
+            try:
+                print(journal.reprint(args.receipt_id), end="")
+            except KeyError:
+                print(f"Error: no receipt {args.receipt_id} in {args.journal}")
+        else:
+            start = datetime.fromisoformat(args.start)
+            end = datetime.fromisoformat(args.end)
+            for record in journal.between(start, end):
+                print(json.dumps(record))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+# A receipt pricing service for Ernesto's Daily Groceries. The server
+# reads the products file once and then prices receipts for clients
+# that connect over TCP or a Unix socket, so the catalog is not read
+# again for every receipt. The same program has a load generator that
+# sends many requests to a server and reports the latency.
+#
+# The protocol is JSON Lines. Each request is one line like
+#     {"id": 7, "items": [["D150", 1], ["W112", 2]]}
+# with an optional "date" in ISO format, and each response is one line
+# with the same "id" and the fields written by receipt_record, or an
+# "error" message. A client may send many requests without waiting for
+# the responses (pipelining); the responses come back in the same order.
+import argparse  # Import argparse to read the command line options
+import asyncio  # Import asyncio to serve many connections at once
+import json  # Import json to read requests and write responses
+import time  # Import time to measure latency in the load generator
+from datetime import datetime  # Import datetime for the date of each receipt
+from receipt import read_products, default_rules, get_order_discount, \
+    price_order, receipt_record
+
+MAX_REQUEST_BYTES = 16 * 1024 * 1024  # The longest request line the server reads
+
+
+def price_request(line, products_dict, rules=None):
+    """Price one request line and return the response line.
+
+    Parameters
+        line: a request as JSON text or bytes.
+        products_dict: the dictionary returned from read_dictionary.
+        rules: a PricingRules object, or None for the weekday discount.
+    Return: the response as JSON text followed by a newline.
+    """
+    if rules is None:
+        rules = default_rules
+    request_id = None
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict) or "items" not in request:
+            raise ValueError("a request must be an object with items")
+        request_id = request.get("id")
+        items = [[str(product_number), int(quantity)]
+                for product_number, quantity in request["items"]]
+        date = datetime.fromisoformat(request["date"]) \
+                if "date" in request else datetime.now()
+        discount_rate = get_order_discount(rules, items, products_dict, date)
+        receipt = price_order(items, products_dict, discount_rate, request.get("order_id"))
+        response = receipt_record(receipt, date)
+    except KeyError as key_err:
+        response = {"error": f"unknown product ID {key_err}"}
+    except (ValueError, TypeError, OverflowError) as err:
+        response = {"error": f"invalid request: {err}"}
+    except RecursionError:
+        response = {"error": "invalid request: nested too deeply"}
+    response["id"] = request_id
+    return json.dumps(response) + "\n"
+
+
+async def _read_request(reader):
+    """Read one request line.
+
+    Return: the line, b"" at the end of the stream, or None for a line
+        longer than the reader's limit, which is read and dropped.
+    """
+    try:
+        return await reader.readuntil(b"\n")
+    except asyncio.IncompleteReadError as error:
+        return error.partial  # The last line has no newline
+    except asyncio.LimitOverrunError as error:
+        overrun = error
+    while True:  # Drop the rest of the long line
+        try:
+            await reader.readexactly(overrun.consumed)
+            await reader.readuntil(b"\n")
+            return None
+        except asyncio.LimitOverrunError as error:
+            overrun = error
+        except asyncio.IncompleteReadError:
+            return None
+
+
+async def _handle_connection(reader, writer, products_dict, rules, in_flight, max_request_bytes):
+    """Read pipelined requests from one connection and write the
+    responses in the same order.
+    """
+    responses = asyncio.Queue()
+    too_long = json.dumps({"error": f"invalid request: longer than {max_request_bytes} bytes",
+        "id": None}) + "\n"
+    failed = json.dumps({"error": "the request could not be priced", "id": None}) + "\n"
+
+    async def price(line):
+        await asyncio.sleep(0)  # Let other connections run between requests
+        if line is None:
+            return too_long
+        return price_request(line, products_dict, rules)
+
+    async def write_responses():
+        connected = True
+        while True:
+            task = await responses.get()
+            if task is None:
+                break
+            try:
+                try:
+                    response = await task
+                except Exception:
+                    # An error price_request didn't expect must not
+                    # stop the responses, or the permits of the
+                    # requests after it would never be released.
+                    response = failed
+                if connected:
+                    writer.write(response.encode())
+                    # Wait while the client is slow to read, so the
+                    # responses it hasn't read don't pile up here.
+                    await writer.drain()
+            except ConnectionError:
+                connected = False
+            finally:
+                in_flight.release()  # The request is answered
+
+    writer_task = asyncio.create_task(write_responses())
+    try:
+        while True:
+            line = await _read_request(reader)
+            if line == b"":
+                break  # The client closed the connection
+            if line is not None and line.strip() == b"":
+                continue
+            # Wait here when too many requests are read but not yet
+            # answered, so a client that sends faster than it reads
+            # can't make the server buffer without limit.
+            await in_flight.acquire()
+            responses.put_nowait(asyncio.create_task(price(line)))
+    except ConnectionError:
+        pass
+    finally:
+        responses.put_nowait(None)
+        try:
+            await writer_task
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def start_server(products_dict, host="127.0.0.1", port=8765, path=None,
+        rules=None, max_in_flight=256, max_request_bytes=MAX_REQUEST_BYTES):
+    """Start a receipt server.
+
+    Parameters
+        products_dict: the products, read once by the caller.
+        host, port: the TCP address to listen on; port 0 picks a
+            free port.
+        path: the path of a Unix socket to listen on instead of TCP.
+        rules: a PricingRules object, or None for the weekday discount.
+        max_in_flight: the largest number of requests, over all
+            connections, that are read but not yet answered.
+        max_request_bytes: the longest request line; a longer line
+            gets an error response and the connection stays open.
+    Return: an asyncio Server.
+    """
+    in_flight = asyncio.Semaphore(max_in_flight)
+
+    async def handle(reader, writer):
+        await _handle_connection(reader, writer, products_dict, rules, in_flight,
+            max_request_bytes)
+
+    if path is not None:
+        return await asyncio.start_unix_server(handle, path=path, limit=max_request_bytes)
+    return await asyncio.start_server(handle, host, port, limit=max_request_bytes)
+
+
+def percentile(values, percent):
+    """Return the percent percentile of a sorted list of numbers by
+    the nearest rank method.
+    """
+    if len(values) == 0:
+        return 0.0
+    rank = max(1, -(-len(values) * percent // 100))  # Round up
+    return values[int(rank) - 1]
+
+
+async def run_load(product_numbers, request_count, host="127.0.0.1", port=8765,
+        path=None, connections=4, pipeline_depth=16, items_per_request=5):
+    """Send requests to a receipt server and measure their latency.
+
+    Parameters
+        product_numbers: a list of product numbers to put in requests.
+        request_count: the total number of requests to send.
+        host, port, path: the address of the server.
+        connections: the number of connections to open.
+        pipeline_depth: the most requests a connection sends before
+            it waits for a response.
+        items_per_request: the number of items in each request.
+    Return: a dictionary with the keys requests, errors, seconds,
+        p50 and p99 (latencies in seconds).
+    """
+    latencies = []
+    errors = 0
+
+    async def client(first_id, count):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        window = asyncio.Semaphore(pipeline_depth)
+        sent_at = {}
+
+        async def receive():
+            nonlocal errors
+            for _ in range(count):
+                response = json.loads(await reader.readline())
+                latencies.append(time.perf_counter() - sent_at.pop(response["id"]))
+                if "error" in response:
+                    errors += 1
+                window.release()
+
+        receiver = asyncio.create_task(receive())
+        for request_id in range(first_id, first_id + count):
+            await window.acquire()
+            items = [[product_numbers[(request_id + i) % len(product_numbers)], i + 1]
+                    for i in range(items_per_request)]
+            sent_at[request_id] = time.perf_counter()
+            writer.write((json.dumps({"id": request_id, "items": items}) + "\n").encode())
+            await writer.drain()
+        await receiver
+        writer.close()
+        await writer.wait_closed()
+
+    start = time.perf_counter()
+    share = -(-request_count // connections)
+    await asyncio.gather(*[client(first, min(share, request_count - first))
+            for first in range(0, request_count, share)])
+    seconds = time.perf_counter() - start
+
+    latencies.sort()
+    return {"requests": len(latencies), "errors": errors, "seconds": seconds,
+            "p50": percentile(latencies, 50), "p99": percentile(latencies, 99)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Receipt pricing service.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="run the receipt server")
+    load = commands.add_parser("load", help="send requests to a running server")
+    for command in [serve, load]:
+        command.add_argument("--host", default="127.0.0.1")
+        command.add_argument("--port", type=int, default=8765)
+        command.add_argument("--unix", help="use a Unix socket at this path instead of TCP")
+        command.add_argument("--products", default="products.csv", help="the CSV file of products")
+    serve.add_argument("--max-in-flight", type=int, default=256,
+            help="the most requests being priced at once")
+    load.add_argument("--requests", type=int, default=10000)
+    load.add_argument("--connections", type=int, default=4)
+    load.add_argument("--pipeline", type=int, default=16,
+            help="the most requests a connection sends before it waits")
+    args = parser.parse_args(argv)
+
+    products_dict = read_products(args.products)  # Read the catalog once
+
+    if args.command == "serve":
+        async def serve_forever():
+            server = await start_server(products_dict, args.host, args.port,
+                    args.unix, max_in_flight=args.max_in_flight)
+            address = args.unix or f"{args.host}:{args.port}"
+            print(f"Serving receipts on {address}")
+            async with server:
+                await server.serve_forever()
+        try:
+            asyncio.run(serve_forever())
+        except KeyboardInterrupt:
+            pass
+    else:
+        result = asyncio.run(run_load(list(products_dict), args.requests,
+                args.host, args.port, args.unix, args.connections, args.pipeline))
+        print(f"Requests: {result['requests']} ({result['errors']} errors)")
+        print(f"Throughput: {result['requests'] / result['seconds']:.0f} requests/s")
+        print(f"p50 latency: {result['p50'] * 1000:.2f} ms")
+        print(f"p99 latency: {result['p99'] * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+# Sales reports for Ernesto's Daily Groceries. SalesAnalytics reads
+# sales one order at a time, from a request file with a date column or
+# from the priced receipts in a receipt journal, and adds them up by
+# day and by week: the units and revenue of each product, the orders,
+# the discount given on Tuesday and Wednesday and the sales tax.
+#
+# Only the current day and the current week are kept in memory; a day
+# or week is handed to the caller as soon as a sale from a later day
+# arrives, so a year of sales needs no more memory than one week. The
+# best selling products of the whole stream are counted with the
+# Space-Saving algorithm, which keeps a fixed number of counters no
+# matter how many different products are sold.
+import argparse  # Import argparse to read the command line options
+import csv  # Import csv to read dated request files
+import heapq  # Import heapq to find the smallest Space-Saving counter
+from datetime import datetime, timedelta  # Import datetime to read the dates of sales
+from itertools import count, groupby  # Import count to number heap entries and groupby to split a request stream into orders
+from receipt import read_products, default_rules, get_order_discount, \
+    price_order, sales_tax_rate
+
+UNITS_INDEX = 0  # Index of the units in a product total
+REVENUE_INDEX = 1  # Index of the revenue in a product total
+
+
+class SpaceSaving:
+    """Approximate heavy hitters of a stream with a fixed number of
+    counters (Metwally, Agrawal and El Abbadi, 2005).
+
+    While there are fewer different keys than counters every count is
+    exact. After that, a new key takes over the smallest counter and
+    inherits its count as error, so each reported count is at most
+    error above the true count, and every key whose true count is more
+    than total / capacity is sure to be reported.
+    """
+
+    def __init__(self, capacity):
+        """Parameters
+            capacity: the number of counters to keep.
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.total = 0
+        self._counts = {}
+        self._errors = {}
+        self._heap = []  # (count, number, key) entries; a count may be out of date
+        self._numbers = count()  # Break ties without comparing keys
+
+    def __len__(self):
+        return len(self._counts)
+
+    def add(self, key, weight=1):
+        """Add weight to the count of key."""
+        self.total += weight
+        counts = self._counts
+        if key in counts:
+            counts[key] += weight  # The heap entry is fixed when it reaches the top
+            return
+        if len(counts) < self.capacity:
+            counts[key] = weight
+            self._errors[key] = 0
+            heapq.heappush(self._heap, (weight, next(self._numbers), key))
+            return
+
+        heap = self._heap
+        while True:
+            smallest_count, _, smallest = heapq.heappop(heap)
+            if counts[smallest] == smallest_count:
+                break
+            # Out of date; put it back with its current count.
+            heapq.heappush(heap, (counts[smallest], next(self._numbers), smallest))
+        del counts[smallest]
+        del self._errors[smallest]
+        counts[key] = smallest_count + weight
+        self._errors[key] = smallest_count
+        heapq.heappush(heap, (smallest_count + weight, next(self._numbers), key))
+
+    def top(self, n):
+        """Return the n keys with the largest counts as a compound
+        list of [key, count, error] lists, largest count first.
+        """
+        keys = heapq.nlargest(n, self._counts, key=self._counts.get)
+        return [[key, self._counts[key], self._errors[key]] for key in keys]
+
+
+def week_start(date):
+    """Return the Monday of the week of date as a date object."""
+    day = date.date() if isinstance(date, datetime) else date
+    return day - timedelta(days=day.weekday())
+
+
+def _new_period(period, start):
+    return {"period": period, "start": start, "orders": 0, "units": 0,
+            "revenue": 0.0, "discount": 0.0, "discounted_units": 0,
+            "sales_tax": 0.0, "products": {}}
+
+
+class SalesAnalytics:
+    """Daily and weekly sales rollups and top selling products.
+
+    Sales must arrive in time order, the order of a receipt journal.
+    add_order and add_receipt return the periods that the new sale
+    finished, and finish returns the rest. Each period is a dictionary
+    with the keys period ("day" or "week"), start (a date), orders,
+    units, revenue (after discounts, before tax), discount (the money
+    taken off by discounts), discounted_units, sales_tax and products,
+    a dictionary from product number to [units, revenue] list.
+    """
+
+    def __init__(self, products_dict, rules=None, top_capacity=1000):
+        """Parameters
+            products_dict: the dictionary returned from read_dictionary.
+            rules: a PricingRules object, or None for the weekday
+                discount of receipt.py.
+            top_capacity: the number of Space-Saving counters for the
+                top selling products.
+        """
+        self.products_dict = products_dict
+        self.rules = default_rules if rules is None else rules
+        self.top_units = SpaceSaving(top_capacity)
+        self.top_revenue = SpaceSaving(top_capacity)
+        self._day = None
+        self._week = None
+        self._product_of_name = None
+
+    def add_order(self, date, items):
+        """Price one order the way receipt.py does and add it.
+
+        Parameters
+            date: the datetime object of the purchase.
+            items: a compound list of [product_number, quantity] lists.
+        Return: a list of the periods that ended before this order.
+        A KeyError is raised if a product number is not in products_dict.
+        """
+        discount_rate = get_order_discount(self.rules, items, self.products_dict, date)
+        receipt = price_order(items, self.products_dict, discount_rate)
+        lines = []
+        for (product_number, quantity), (_, _, price) in zip(items, receipt["items"]):
+            list_price = float(self.products_dict[product_number][2])
+            lines.append((product_number, quantity, price, list_price))
+        return self._add(date, lines, receipt["subtotal"] * sales_tax_rate)
+
+    def add_receipt(self, record):
+        """Add one priced receipt: a record from a receipt journal or
+        a line of receipt.py --format json. The items of a record have
+        names, not product numbers; a name is counted under the first
+        product in the catalog with that name, or under the name if no
+        product has it.
+
+        Return: a list of the periods that ended before this receipt.
+        """
+        if self._product_of_name is None:
+            self._product_of_name = {}
+            for product_number, row in self.products_dict.items():
+                self._product_of_name.setdefault(row[1], product_number)
+        lines = []
+        for item in record["items"]:
+            product_number = self._product_of_name.get(item["name"], item["name"])
+            row = self.products_dict.get(product_number)
+            list_price = float(row[2]) if row is not None else item["price"]
+            lines.append((product_number, item["quantity"], item["price"], list_price))
+        return self._add(datetime.fromisoformat(record["date"]), lines, record["sales_tax"])
+
+    def _add(self, date, lines, sales_tax):
+        finished = []
+        day = date.date()
+        if self._day is not None and day != self._day["start"]:
+            if day < self._day["start"]:
+                raise ValueError(f"sale on {day} arrived after a sale on {self._day['start']}")
+            finished.append(self._day)
+            self._day = None
+            week = week_start(day)
+            if week != self._week["start"]:
+                finished.append(self._week)
+                self._week = None
+        if self._day is None:
+            self._day = _new_period("day", day)
+        if self._week is None:
+            self._week = _new_period("week", week_start(day))
+
+        for period in (self._day, self._week):
+            period["orders"] += 1
+            period["sales_tax"] += sales_tax
+            products = period["products"]
+            for product_number, quantity, price, list_price in lines:
+                revenue = price * quantity
+                period["units"] += quantity
+                period["revenue"] += revenue
+                if price < list_price:
+                    period["discount"] += (list_price - price) * quantity
+                    period["discounted_units"] += quantity
+                total = products.get(product_number)
+                if total is None:
+                    products[product_number] = [quantity, revenue]
+                else:
+                    total[UNITS_INDEX] += quantity
+                    total[REVENUE_INDEX] += revenue
+
+        for product_number, quantity, price, _ in lines:
+            self.top_units.add(product_number, quantity)
+            self.top_revenue.add(product_number, price * quantity)
+        return finished
+
+    def finish(self):
+        """Return the periods that are still open: the last day and
+        the last week.
+        """
+        finished = [period for period in (self._day, self._week) if period is not None]
+        self._day = self._week = None
+        return finished
+
+
+def read_sales(filename, date_column_index=0, order_column_index=1,
+        product_column_index=2, quantity_column_index=3):
+    """Read a request CSV file with a date column one order at a time.
+    The rows of one order must be next to each other, like in the
+    files that receipt.py --batch reads, and the date of an order is
+    the date on its first row, in ISO format such as 2024-06-04T09:30.
+
+    Return: a generator of (date, order_id, items) tuples.
+    """
+    min_columns = max(date_column_index, order_column_index,
+            product_column_index, quantity_column_index) + 1
+    with open(filename, "rt") as csv_file:
+        reader = csv.reader(csv_file)
+        next(reader, None)  # Skip the header row
+        rows = (row for row in reader if len(row) >= min_columns)
+        for order_id, order_rows in groupby(rows, key=lambda row: row[order_column_index]):
+            order_rows = list(order_rows)
+            date = datetime.fromisoformat(order_rows[0][date_column_index])
+            items = [[row[product_column_index], int(row[quantity_column_index])]
+                    for row in order_rows]
+            yield date, order_id, items
+
+
+def rollups(analytics, sales=(), receipts=()):
+    """Add sales to analytics and hand out each period as soon as it
+    ends.
+
+    Parameters
+        analytics: a SalesAnalytics object.
+        sales: (date, order_id, items) tuples from read_sales.
+        receipts: receipt records, for example from a journal.
+    Return: a generator of period dictionaries.
+    """
+    for date, _, items in sales:
+        yield from analytics.add_order(date, items)
+    for record in receipts:
+        yield from analytics.add_receipt(record)
+    yield from analytics.finish()
+
+
+def print_periods(periods):
+    """Print one line for each period dictionary."""
+    for period in periods:
+        print(f"{period['start']} {period['period']:4}  orders {period['orders']:6}"
+                f"  units {period['units']:7}  revenue ${period['revenue']:11.2f}"
+                f"  discount ${period['discount']:9.2f}  tax ${period['sales_tax']:9.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Daily and weekly sales reports.")
+    parser.add_argument("sales_file", nargs="?",
+            help="a CSV file with the columns date, order, product and quantity")
+    parser.add_argument("--journal", help="read the priced receipts of this receipt journal")
+    parser.add_argument("--products", default="products.csv", help="the CSV file of products")
+    parser.add_argument("--top", type=int, default=10, help="the number of top products to print")
+    parser.add_argument("--capacity", type=int, default=1000,
+            help="the number of counters for the top products")
+    args = parser.parse_args(argv)
+    if (args.sales_file is None) == (args.journal is None):
+        parser.error("give either a sales file or --journal")
+
+    products_dict = read_products(args.products)
+    analytics = SalesAnalytics(products_dict, top_capacity=args.capacity)
+    if args.journal is not None:
+        from receipt_journal import ReceiptJournal
+        with ReceiptJournal(args.journal, read_only=True) as journal:
+            print_periods(rollups(analytics, receipts=(journal.get(receipt_id)
+                    for receipt_id in range(1, len(journal) + 1))))
+    else:
+        print_periods(rollups(analytics, sales=read_sales(args.sales_file)))
+
+    print(f"Top {args.top} products by revenue:")
+    for product_number, revenue, error in analytics.top_revenue.top(args.top):
+        row = products_dict.get(product_number)
+        name = row[1] if row is not None else ""
+        print(f"{product_number:10} {name:30} ${revenue:11.2f}  (± ${error:.2f})")
+
+
+if __name__ == "__main__":
+    main()
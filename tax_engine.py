@@ -0,0 +1,229 @@
+# A sales tax engine for receipt.py. Each product in the catalog gets
+# a tax category, such as grocery or non-food, when the catalog is
+# loaded, and each jurisdiction (a state, county or city) has a rate
+# for every category. compile_tax turns the catalog and the rates into
+# a TaxTable: a category number for each product and, for each
+# jurisdiction, a list of rates in category order. The tax of a
+# receipt is then found by adding the line amounts of each category
+# and multiplying those few sums by the rates, and the taxes of many
+# jurisdictions come from the same sums in the same pass.
+import csv  # Import the csv module to read category and rate files
+import operator  # Import operator to multiply the category sums by the rates
+
+# The tax categories of the products in products.csv. The columns are
+# the same as the columns of a category file: category and scope,
+# where scope is product numbers separated by spaces and a number that
+# ends with * matches every product number with that prefix.
+DEFAULT_CATEGORY_ROWS = [
+    ["grocery", "D* P* W*"],
+    ["prepared food", ""],
+    ["non-food", "C* H*"],
+]
+DEFAULT_CATEGORY = "non-food"  # Category of products that no row matches
+
+# The 6% sales tax of receipt.py on every category. The columns are the
+# same as the columns of a rate file: jurisdiction, category and rate.
+DEFAULT_RATE_ROWS = [
+    ["store", "grocery", "0.06"],
+    ["store", "prepared food", "0.06"],
+    ["store", "non-food", "0.06"],
+]
+
+
+class TaxError(ValueError):
+    """TaxError is the type of error that the tax engine raises if a
+    category or rate file is invalid.
+    """
+
+
+def _read_rows(filename, columns):
+    with open(filename, "rt") as csv_file:
+        reader = csv.reader(csv_file)
+        next(reader)  # Skip the header row
+        rows = [row for row in reader if len(row) != 0]
+    for row in rows:
+        if len(row) != columns:
+            raise TaxError(f"a row of {filename} must have {columns} columns but found {len(row)}: {row}")
+    return rows
+
+
+def read_category_rows(filename):
+    """Read a CSV file of tax categories with the columns category
+    and scope. The first row is a header.
+    """
+    return _read_rows(filename, 2)
+
+
+def read_rate_rows(filename):
+    """Read a CSV file of tax rates with the columns jurisdiction,
+    category and rate. The first row is a header.
+    """
+    return _read_rows(filename, 3)
+
+
+def assign_categories(product_numbers, category_rows, default_category=DEFAULT_CATEGORY):
+    """Give every product a tax category.
+
+    When a product matches several rows, a row that names the product
+    number wins over a prefix, and a longer prefix wins over a shorter
+    one.
+
+    Parameters
+        product_numbers: the product numbers in the catalog.
+        category_rows: a compound list of [category, scope] lists.
+        default_category: the category of products no row matches.
+    Return: a list of the category names, in the order they are first
+        named, and a dictionary from product number to category index.
+    """
+    categories = []
+    exact = {}
+    prefixes = []
+    for category, scope in category_rows:
+        category = category.strip()
+        if category == "":
+            raise TaxError(f"a tax category needs a name: {[category, scope]}")
+        if category not in categories:
+            categories.append(category)
+        index = categories.index(category)
+        for item in scope.split():
+            if item.endswith("*"):
+                prefixes.append((item[:-1], index))
+            else:
+                exact[item] = index
+    if default_category not in categories:
+        categories.append(default_category)
+    default_index = categories.index(default_category)
+    prefixes.sort(key=lambda prefix: len(prefix[0]), reverse=True)  # Longest prefix first
+
+    category_of = {}
+    for product_number in product_numbers:
+        index = exact.get(product_number)
+        if index is None:
+            index = next((index for prefix, index in prefixes
+                    if product_number.startswith(prefix)), default_index)
+        category_of[product_number] = index
+    return categories, category_of
+
+
+def parse_rates(rate_rows, categories):
+    """Convert rate rows into one rate list for each jurisdiction.
+
+    Parameters
+        rate_rows: a compound list of [jurisdiction, category, rate]
+            lists; every jurisdiction needs a rate for every category.
+        categories: the list of category names.
+    Return: a dictionary from jurisdiction name to a list of rates in
+        the same order as categories.
+    """
+    rates = {}
+    for jurisdiction, category, rate in rate_rows:
+        jurisdiction, category = jurisdiction.strip(), category.strip()
+        if category not in categories:
+            raise TaxError(f"jurisdiction {jurisdiction}: unknown tax category: {category}")
+        try:
+            rate = float(rate)
+        except ValueError:
+            raise TaxError(f"jurisdiction {jurisdiction}: invalid rate: {rate}")
+        if not 0 <= rate <= 1:
+            raise TaxError(f"jurisdiction {jurisdiction}: the rate must be between 0 and 1")
+        rates.setdefault(jurisdiction, [None] * len(categories))[categories.index(category)] = rate
+
+    for jurisdiction, jurisdiction_rates in rates.items():
+        if None in jurisdiction_rates:
+            missing = categories[jurisdiction_rates.index(None)]
+            raise TaxError(f"jurisdiction {jurisdiction} has no rate for {missing}")
+    if len(rates) == 0:
+        raise TaxError("there are no tax rates")
+    return rates
+
+
+class TaxTable:
+    """The tax categories of a catalog and the rates of one or more
+    jurisdictions. Create one with compile_tax.
+
+    The first jurisdiction is the one printed on receipts; order_taxes
+    returns the taxes of all of them.
+    """
+
+    def __init__(self, categories, category_of, default_index, rates):
+        self.categories = categories
+        self._category_of = category_of
+        self._default_index = default_index
+        self.jurisdictions = list(rates)
+        self._rates = [rates[jurisdiction] for jurisdiction in self.jurisdictions]
+
+    def category(self, product_number):
+        """Return the tax category name of one product."""
+        return self.categories[self._category_of.get(product_number, self._default_index)]
+
+    def select(self, jurisdiction):
+        """Return a TaxTable with the same categories and only the
+        rates of one jurisdiction. Raise KeyError if there is no such
+        jurisdiction.
+        """
+        if jurisdiction not in self.jurisdictions:
+            raise KeyError(jurisdiction)
+        rates = {jurisdiction: self._rates[self.jurisdictions.index(jurisdiction)]}
+        return TaxTable(self.categories, self._category_of, self._default_index, rates)
+
+    def order_taxes(self, product_numbers, amounts):
+        """Compute the taxes of one order in every jurisdiction.
+
+        Parameters
+            product_numbers: the product number of each line.
+            amounts: the amount of each line after discounts, in the
+                same order as product_numbers.
+        Return: a list with the tax of each jurisdiction, in the same
+            order as the jurisdictions attribute.
+        """
+        category_of = self._category_of
+        default_index = self._default_index
+        sums = [0.0] * len(self.categories)
+        for product_number, amount in zip(product_numbers, amounts):
+            sums[category_of.get(product_number, default_index)] += amount  # Gather the category of each line
+        return [sum(map(operator.mul, rates, sums)) for rates in self._rates]
+
+    def sales_tax(self, product_numbers, amounts):
+        """Return the tax of one order in the first jurisdiction."""
+        return self.order_taxes(product_numbers, amounts)[0]
+
+
+def compile_tax(product_numbers, category_rows=DEFAULT_CATEGORY_ROWS,
+        rate_rows=DEFAULT_RATE_ROWS, default_category=DEFAULT_CATEGORY):
+    """Assign a tax category to every product and compile the rates.
+
+    Parameters
+        product_numbers: the product numbers in the catalog.
+        category_rows: a compound list of [category, scope] lists.
+        rate_rows: a compound list of [jurisdiction, category, rate]
+            lists.
+        default_category: the category of products no row matches.
+    Return: a TaxTable.
+    """
+    categories, category_of = assign_categories(product_numbers, category_rows, default_category)
+    rates = parse_rates(rate_rows, categories)
+    return TaxTable(categories, category_of, categories.index(default_category), rates)
+
+
+def load_tax_table(product_numbers, rates_filename=None, categories_filename=None, jurisdiction=None):
+    """Read and compile the category and rate files, using the
+    default rows for a file name that is None.
+
+    Parameters
+        product_numbers: the product numbers in the catalog.
+        rates_filename: a CSV file of tax rates or None.
+        categories_filename: a CSV file of tax categories or None.
+        jurisdiction: the jurisdiction to keep, or None to keep all
+            of them with the first one printed on receipts.
+    Return: a TaxTable.
+    """
+    category_rows = DEFAULT_CATEGORY_ROWS if categories_filename is None \
+            else read_category_rows(categories_filename)
+    rate_rows = DEFAULT_RATE_ROWS if rates_filename is None else read_rate_rows(rates_filename)
+    table = compile_tax(product_numbers, category_rows, rate_rows)
+    if jurisdiction is not None:
+        try:
+            table = table.select(jurisdiction)
+        except KeyError:
+            raise TaxError(f"no tax rates for jurisdiction {jurisdiction}")
+    return table
@@ -0,0 +1,203 @@
+"""Verify that the compact product catalog in catalog.py works correctly."""
+
+from catalog import ProductCatalog, ReloadingCatalog, RcuCatalog, load_catalog, \
+    price_to_cents, cents_to_price
+from receipt import read_dictionary
+from os import path, utime
+import threading
+import pytest
+
+
+PRODUCTS_FILE = path.join(path.dirname(__file__), "products.csv")
+
+
+def test_price_conversion():
+    """Verify that prices convert to cents and back without
+    rounding errors.
+    Parameters: none
+    Return: nothing
+    """
+    assert price_to_cents("4.50") == 450
+    assert price_to_cents("0.75") == 75
+    assert price_to_cents("2.85") == 285
+    assert price_to_cents("12") == 1200
+    assert cents_to_price(450) == "4.50"
+    assert cents_to_price(5) == "0.05"
+    assert cents_to_price(-125) == "-1.25"
+
+
+def test_catalog_matches_read_dictionary():
+    """Verify that a ProductCatalog returns the same rows as the
+    dictionary from read_dictionary.
+    Parameters: none
+    Return: nothing
+    """
+    products_dict = read_dictionary(PRODUCTS_FILE, 0)
+    catalog = ProductCatalog.from_csv(PRODUCTS_FILE)
+
+    assert len(catalog) == len(products_dict)
+    assert list(catalog) == list(products_dict)
+    for product_number, row in products_dict.items():
+        assert product_number in catalog
+        assert catalog[product_number] == row
+        assert catalog.name(product_number) == row[1]
+        assert catalog.price_cents(product_number) == price_to_cents(row[2])
+
+    assert "XXXX" not in catalog
+    assert catalog.row_index("XXXX") == -1
+    with pytest.raises(KeyError):
+        catalog["XXXX"]
+    with pytest.raises(KeyError):
+        catalog.price_cents("XXXX")
+
+
+def test_catalog_interns_names():
+    """Verify that duplicate product numbers replace earlier rows
+    and that equal names are stored once.
+    Parameters: none
+    Return: nothing
+    """
+    catalog = ProductCatalog.from_rows([
+        ["A1", "apple", "1.00"],
+        ["A2", "apple", "1.10"],
+        ["A1", "green apple", "1.20"],
+    ])
+    assert len(catalog) == 2
+    assert catalog["A1"] == ["A1", "green apple", "1.20"]
+    assert catalog["A2"] == ["A2", "apple", "1.10"]
+    assert catalog._name_ids[1] == 0
+
+    empty = ProductCatalog.from_rows([])
+    assert len(empty) == 0
+    assert "A1" not in empty
+
+
+def test_snapshot(tmp_path):
+    """Verify that a catalog saved to a snapshot file opens with
+    the same contents.
+    Parameters: none
+    Return: nothing
+    """
+    catalog = ProductCatalog.from_csv(PRODUCTS_FILE)
+    snapshot_file = str(tmp_path / "products.pcat")
+    catalog.save(snapshot_file)
+
+    with load_catalog(snapshot_file) as opened:
+        assert dict(opened) == dict(catalog)
+        assert opened.price_cents("H025") == 450
+
+    # load_catalog reads a CSV file when it isn't a snapshot.
+    assert dict(load_catalog(PRODUCTS_FILE)) == dict(catalog)
+
+    # A file that isn't a snapshot can't be opened as one.
+    with pytest.raises(ValueError):
+        ProductCatalog.open(PRODUCTS_FILE)
+    truncated_file = tmp_path / "truncated.pcat"
+    truncated_file.write_bytes(catalog._view[:100].tobytes())
+    with pytest.raises(ValueError):
+        ProductCatalog.open(str(truncated_file))
+
+
+def write_products(filename, lines, mtime_ns):
+    """Write a products CSV file and set its modification time.
+    Parameters
+        filename: the name of the file to write
+        lines: the rows of the file without the header
+        mtime_ns: the modification time in nanoseconds
+    Return: nothing
+    """
+    with open(filename, "wt") as products_file:
+        products_file.write("Product #,Name,Price\n")
+        for line in lines:
+            products_file.write(line + "\n")
+    utime(filename, ns=(mtime_ns, mtime_ns))
+
+
+def test_reloading_catalog(tmp_path):
+    """Verify that ReloadingCatalog applies inserts, updates and
+    deletes and keeps old snapshots unchanged.
+    Parameters: none
+    Return: nothing
+    """
+    filename = str(tmp_path / "products.csv")
+    write_products(filename, ["D150,1 gallon milk,2.85",
+            "D083,1 cup yogurt,0.75", "W112,wheat bread,2.55"], 10**18)
+    catalog = ReloadingCatalog(filename)
+    assert len(catalog) == 3
+    assert catalog["D150"] == ["D150", "1 gallon milk", "2.85"]
+    assert catalog.reload_if_changed() is None
+
+    old_snapshot = catalog.snapshot()
+    old_bread = old_snapshot["W112"]
+    write_products(filename, ["D150,1 gallon milk,2.99",
+            "W112,wheat bread,2.55", "C013,twix candy bar,0.85"],
+            10**18 + 1)
+    changes = catalog.reload_if_changed()
+    assert changes == {"inserted": ["C013"], "updated": ["D150"],
+            "deleted": ["D083"]}
+
+    # The new snapshot has the changes and reuses unchanged rows.
+    assert catalog["D150"] == ["D150", "1 gallon milk", "2.99"]
+    assert catalog["C013"] == ["C013", "twix candy bar", "0.85"]
+    assert "D083" not in catalog
+    assert catalog["W112"] is old_bread
+
+    # The old snapshot still shows the catalog before the reload.
+    assert old_snapshot["D150"] == ["D150", "1 gallon milk", "2.85"]
+    assert "D083" in old_snapshot
+    assert "C013" not in old_snapshot
+    with pytest.raises(TypeError):
+        old_snapshot["X"] = ["X", "x", "1.00"]
+
+
+def test_rcu_catalog():
+    """Verify that RcuCatalog publishes changes as new snapshots and
+    that readers on other threads always see a whole change.
+    Parameters: none
+    Return: nothing
+    """
+    products_dict = read_dictionary(PRODUCTS_FILE, 0)
+    catalog = RcuCatalog(products_dict)
+    assert catalog.snapshot() == products_dict
+
+    old_snapshot = catalog.snapshot()
+    changes = catalog.update(rows=[["C999", "gum", "0.99"]],
+            prices={"D150": "2.99"}, deleted=["H025"])
+    assert changes == {"inserted": ["C999"], "updated": ["D150"], "deleted": ["H025"]}
+    assert catalog["D150"] == ["D150", "1 gallon milk", "2.99"]
+    assert "H025" not in catalog
+    assert old_snapshot["D150"] == ["D150", "1 gallon milk", "2.85"]
+    assert products_dict["D150"][2] == "2.85"
+
+    # A price for an unknown product changes nothing.
+    with pytest.raises(KeyError):
+        catalog.update(prices={"D150": "1.00", "XXXX": "1.00"})
+    assert catalog["D150"][2] == "2.99"
+
+    # Every change sets all prices to the same value, so a reader
+    # that sees two different prices in one snapshot saw half a change.
+    catalog.update(prices={key: "0" for key in catalog})
+    stop = threading.Event()
+    torn = []
+
+    def reader():
+        while not stop.is_set():
+            snapshot = catalog.snapshot()
+            if len({row[2] for row in snapshot.values()}) != 1:
+                torn.append(snapshot)
+
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    for version in range(1, 200):
+        catalog.update(prices={key: str(version) for key in catalog})
+    stop.set()
+    for thread in readers:
+        thread.join()
+    assert torn == []
+    assert catalog["D150"][2] == "199"
+
+
+# Call the main function that is part of pytest so that the
+# computer will execute the test functions in this file.
+pytest.main(["-v", "--tb=line", "-rN", __file__])
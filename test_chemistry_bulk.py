@@ -0,0 +1,88 @@
+"""Verify that the bulk mode of chemistry.py computes the same molar
+masses and moles as compute_molar_mass and keeps the input order.
+"""
+
+from chemistry import read_samples, process_samples, run_bulk, main, \
+    compute_molar_mass, PERIODIC_TABLE
+from formula import parse_formula
+from pytest import approx
+import io
+import json
+import pytest
+
+
+def test_process_samples():
+    """Verify the results of valid and invalid samples.
+    Parameters: none
+    Return: nothing
+    """
+    text = io.StringIO("formula,sample_mass\nH2O,18\nC6H6,abc\nH2L,3\n,5\nC13H16N2O2,10\n"
+            "H99999999999999999999,1\n")
+    samples = list(read_samples(text, "csv"))
+    assert samples[0] == ("H2O", "18")
+    results = process_samples(samples)
+
+    water = results[0]
+    assert water["molar_mass"] == compute_molar_mass(parse_formula("H2O", PERIODIC_TABLE), PERIODIC_TABLE)
+    assert water["moles"] == approx(18 / 18.01528)
+    assert water["name"] == "water"
+    assert water["error"] is None
+    assert results[1]["error"] == "invalid sample mass: abc"
+    assert "unknown element symbol" in results[2]["error"]
+    assert results[3]["error"] == "the molar mass is zero"
+    assert results[4]["name"] == "melatonin"
+    assert "too many atoms of H" in results[5]["error"]
+
+    text = io.StringIO('{"formula": "FeS2", "sample_mass": 2.5}\n\n'
+            '{"formula": "H2O", \n[1, 2]\n{"formula": 5}\n{"formula": "O2", "sample_mass": 8}\n')
+    samples = list(read_samples(text, "jsonl"))
+    assert samples[0] == ("FeS2", 2.5)
+    assert samples[-1] == ("O2", 8)
+    results = process_samples(samples)
+    assert [result["error"] is None for result in results] == [True, False, False, False, True]
+    assert results[1]["formula"] == '{"formula": "H2O",'
+    assert results[1]["error"].startswith("invalid JSON line")
+    assert results[2]["error"] == "a JSON line must be an object"
+    assert results[3]["error"] == "the formula must be text: 5"
+
+    # A line nested too deeply for the JSON parser is one bad row.
+    text = io.StringIO("[" * 100000 + "\n" + '{"formula": "O2", "sample_mass": 8}\n')
+    samples = list(read_samples(text, "jsonl"))
+    assert samples[0][1:] == (None, "invalid JSON line: nested too deeply")
+    assert samples[1] == ("O2", 8)
+
+
+def test_run_bulk(tmp_path):
+    """Verify that the results of a pool of workers are in the same
+    order as the samples and equal to the results of one process.
+    Parameters: none
+    Return: nothing
+    """
+    formulas = ["H2O", "C6H6", "Fe2O3", "X", "CH3(CH2)6CH3"]
+    samples = [(formulas[i % len(formulas)], str(i + 1)) for i in range(200)]
+
+    serial = io.StringIO()
+    stats = run_bulk(samples, serial, "jsonl", workers=0, chunk_size=7)
+    assert stats["rows"] == 200
+    assert stats["errors"] == 40
+    parallel = io.StringIO()
+    run_bulk(samples, parallel, "jsonl", workers=2, chunk_size=7)
+    assert parallel.getvalue() == serial.getvalue()
+
+    rows = [json.loads(line) for line in serial.getvalue().splitlines()]
+    assert [row["formula"] for row in rows] == [formula for formula, _ in samples]
+    assert rows[4]["name"] == "octane"
+
+    input_file = tmp_path / "samples.csv"
+    input_file.write_text("".join(f"{formula},{mass}\n" for formula, mass in samples))
+    output_file = tmp_path / "results.csv"
+    main([str(input_file), "--output", str(output_file), "--chunk-size", "50"])
+    lines = output_file.read_text().splitlines()
+    assert lines[0] == "formula,sample_mass,molar_mass,moles,name,error"
+    assert len(lines) == 201
+    assert lines[1].startswith("H2O,1.0,18.01528,")
+
+
+# Call the main function that is part of pytest so that the
+# computer will execute the test functions in this file.
+pytest.main(["-v", "--tb=line", "-rN", __file__])
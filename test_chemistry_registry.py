@@ -0,0 +1,59 @@
+"""Verify that the element registry in chemistry.py matches the
+dictionary returned from make_periodic_table.
+"""
+
+from chemistry import ElementRegistry, ELEMENT_ROWS, PERIODIC_TABLE, \
+    periodic_table, make_periodic_table, compute_molar_mass
+from formula import parse_formula
+from pytest import approx
+import pytest
+
+
+def test_element_registry():
+    """Verify that the registry arrays are in order of atomic number
+    and agree with make_periodic_table.
+    Parameters: none
+    Return: nothing
+    """
+    periodic_table_dict = make_periodic_table()
+    assert len(periodic_table) == len(periodic_table_dict) == len(ELEMENT_ROWS)
+    assert list(periodic_table.atomic_numbers) == sorted(periodic_table.atomic_numbers)
+    assert periodic_table.symbols[:3] == ("H", "He", "Li")
+
+    index = periodic_table.index_of["O"]
+    assert periodic_table.atomic_numbers[index] == 8
+    assert periodic_table.names[index] == "Oxygen"
+    assert periodic_table.masses[index] == approx(15.9994)
+
+    for symbol, (name, mass) in PERIODIC_TABLE.items():
+        assert periodic_table_dict[symbol] == [name, mass]
+
+    # A new dictionary each call; the registry can't be changed.
+    periodic_table_dict["O"][1] = 0
+    assert make_periodic_table()["O"][1] == approx(15.9994)
+    with pytest.raises(TypeError):
+        PERIODIC_TABLE["Xx"] = ("Unknown", 1.0)
+    with pytest.raises(TypeError):
+        periodic_table.index_of["Xx"] = 0
+
+    assert len(ElementRegistry([[1, "H", "Hydrogen", 1.00794]])) == 1
+
+
+def test_registry_molar_mass():
+    """Verify that the read only view works with parse_formula and
+    compute_molar_mass, and that masses by index are the same.
+    Parameters: none
+    Return: nothing
+    """
+    for formula in ["H2O", "C13H16N2O2", "(C2(NaCl)4H2)2C4Na", "PO4H2(CH2)12CH3"]:
+        symbol_quantity_list = parse_formula(formula, PERIODIC_TABLE)
+        assert symbol_quantity_list == parse_formula(formula, make_periodic_table())
+        molar_mass = compute_molar_mass(symbol_quantity_list, PERIODIC_TABLE)
+        assert molar_mass == compute_molar_mass(symbol_quantity_list, make_periodic_table())
+        index_quantity_list = periodic_table.to_indexes(symbol_quantity_list)
+        assert periodic_table.molar_mass(index_quantity_list) == molar_mass
+
+
+# Call the main function that is part of pytest so that the
+# computer will execute the test functions in this file.
+pytest.main(["-v", "--tb=line", "-rN", __file__])
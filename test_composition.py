@@ -0,0 +1,63 @@
+"""Verify that the batch molar masses in composition.py are the same
+as the molar masses from compute_molar_mass.
+"""
+
+from composition import CompositionMatrix, parse_formulas, read_formulas, batch_molar_masses
+from chemistry import PERIODIC_TABLE, periodic_table, compute_molar_mass
+from formula import parse_formula
+import pytest
+
+
+def test_parse_formulas():
+    """Verify the rows of a composition matrix, including the rows
+    of formulas that repeat or can't be parsed.
+    Parameters: none
+    Return: nothing
+    """
+    matrix = parse_formulas(["H2O", "4H", "C6H6", "H2O"])
+    assert len(matrix) == 4
+    H, O, C = [periodic_table.index_of[symbol] for symbol in ["H", "O", "C"]]
+    assert matrix.row(0) == [[H, 2], [O, 1]]
+    assert matrix.row(1) == []
+    assert matrix.row(2) == [[C, 6], [H, 6]]
+    assert matrix.row(3) == matrix.row(0)
+    assert matrix.errors == {1: "invalid formula at position 0 of 4H"}
+    assert len(CompositionMatrix()) == 0
+
+    # A count too big for the matrix is an error of its row only.
+    matrix = parse_formulas(["H99999999999999999999", "H2O", "C9223372036854775807"])
+    assert matrix.errors == {0: "invalid formula; too many atoms of H: 99999999999999999999"}
+    assert matrix.row(1) == [[H, 2], [O, 1]]
+    assert matrix.row(2) == [[C, 9223372036854775807]]
+    with pytest.raises(OverflowError):
+        matrix.append(bytes([H]), [2**63])
+    assert len(matrix) == 3 and len(matrix.element_indexes) == len(matrix.counts)
+
+
+def test_batch_molar_masses(tmp_path):
+    """Verify that every molar mass is exactly the one that
+    compute_molar_mass returns and that errors are kept per row.
+    Parameters: none
+    Return: nothing
+    """
+    formulas = ["H2O", "C13H16N2O2", "(C2(NaCl)4H2)2C4Na", "H2L4",
+            "PO4H2(CH2)12CH3", "", "(H2O", "Fe2O3"]
+    filename = tmp_path / "formulas.txt"
+    filename.write_text("".join(formula + "\n" for formula in formulas))
+
+    molar_masses, errors = batch_molar_masses(read_formulas(str(filename)))
+    assert len(molar_masses) == len(formulas)
+    assert sorted(errors) == [3, 6]
+    assert errors[3].startswith("invalid formula; unknown element symbol: L")
+    assert errors[6] == "invalid formula; unmatched open parenthesis at position 0 of (H2O"
+    for formula, molar_mass in zip(formulas, molar_masses):
+        if molar_mass is not None:
+            expected = compute_molar_mass(parse_formula(formula, PERIODIC_TABLE), PERIODIC_TABLE)
+            assert molar_mass == expected
+    assert molar_masses[3] is None
+    assert molar_masses[5] == 0.0
+
+
+# Call the main function that is part of pytest so that the
+# computer will execute the test functions in this file.
+pytest.main(["-v", "--tb=line", "-rN", __file__])
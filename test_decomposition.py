@@ -0,0 +1,94 @@
+"""Verify that decompose_mass in decomposition.py finds every
+composition of a mass and nothing else.
+"""
+
+from decomposition import decompose_mass, rdbe, ELEMENT_RATIOS
+from chemistry import PERIODIC_TABLE, compute_molar_mass
+from molecules import hill_key
+from pytest import approx
+import pytest
+
+
+def brute_force(target, tolerance, elements, even_electron, ratios):
+    """Try every count of every element and return the Hill order
+    formulas that decompose_mass should find.
+    """
+    masses = [PERIODIC_TABLE[symbol][1] for symbol in elements]
+    found = set()
+
+    def count_element(level, symbol_quantity_list, mass):
+        if level == len(elements):
+            symbol_quantity_list = [entry for entry in symbol_quantity_list if entry[1] != 0]
+            if len(symbol_quantity_list) == 0:
+                return
+            molar_mass = compute_molar_mass(symbol_quantity_list, PERIODIC_TABLE)
+            equivalents = rdbe(symbol_quantity_list)
+            if abs(molar_mass - target) > tolerance or equivalents < 0:
+                return
+            if even_electron and equivalents != int(equivalents):
+                return
+            carbon = dict(symbol_quantity_list).get("C", 0)
+            if ratios and any(quantity > ratios[symbol] * carbon + 1e-9
+                    for symbol, quantity in symbol_quantity_list if symbol in ratios):
+                return
+            found.add(hill_key(symbol_quantity_list))
+            return
+        for count in range(int((target + tolerance - mass) // masses[level]) + 1):
+            count_element(level + 1, symbol_quantity_list + [[elements[level], count]],
+                mass + count * masses[level])
+
+    count_element(0, [], 0.0)
+    return found
+
+
+def test_known_compositions():
+    """Verify a few compositions of well known masses.
+    Parameters: none
+    Return: nothing
+    """
+    results = list(decompose_mass(180.156, 0.001))
+    assert [formula for formula, _, _ in results] == ["C6H12O6"]
+    formula, molar_mass, equivalents = results[0]
+    assert molar_mass == approx(180.15588)
+    assert equivalents == 1
+
+    # The element ratios need carbon, so water is found only without them.
+    assert list(decompose_mass(18.0153, 0.001)) == []
+    formulas = [formula for formula, _, _ in decompose_mass(18.0153, 0.001, ratios=None)]
+    assert formulas == ["H2O"]
+    assert "C6H6" in [formula for formula, _, _ in decompose_mass(78.11, 0.01, "CH")]
+    assert list(decompose_mass(1.0, 0.01)) == []
+
+    with pytest.raises(ValueError):
+        list(decompose_mass(100, 0.01, ["C", "Xx"]))
+    with pytest.raises(ValueError):
+        list(decompose_mass(100, -0.01))
+
+
+def test_matches_brute_force():
+    """Verify that the branch and bound finds the same compositions as
+    trying every count of every element.
+    Parameters: none
+    Return: nothing
+    """
+    cases = [
+        (150.2, 0.05, ["C", "H", "N", "O", "P", "S"], True, ELEMENT_RATIOS),
+        (190.2, 0.05, ["C", "H", "N", "O", "P", "S"], True, None),
+        (180.2, 0.05, ["C", "H", "N", "O"], False, None),
+        (200.1, 0.1, ["C", "H", "Cl", "Br"], False, ELEMENT_RATIOS),
+        (100.1, 0.1, ["N", "O", "S"], False, None),
+        (200.2, 0.05, ["C", "H", "N", "Si"], True, {"H": 2.5, "N": 0, "Si": 0.5}),
+        (180.2, 0.05, ["C", "H", "N", "O"], True, {"O": 0}),
+    ]
+    for target, tolerance, elements, even_electron, ratios in cases:
+        formulas = [formula for formula, _, _ in decompose_mass(target, tolerance,
+            elements, even_electron=even_electron, ratios=ratios)]
+        assert len(formulas) == len(set(formulas))
+        assert set(formulas) == brute_force(target, tolerance, elements, even_electron, ratios)
+        if ratios is not None and ratios.get("N") == 0:
+            assert all("N" not in formula for formula in formulas)
+
+
+# Call the main function that is part of pytest so that the
+# computer will execute the test functions in this file.
+pytest.main(["-v", "--tb=line", "-rN", __file__])
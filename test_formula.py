@@ -0,0 +1,139 @@
+"""Verify that parse_formula in formula.py gives the same results as
+the recursive parser, and that the formula cache returns the same
+results as parse_formula and counts its hits, misses and evictions.
+"""
+
+from chemistry import make_periodic_table, PERIODIC_TABLE
+from formula import FormulaCache, FormulaError, parse_formula, parse_formula_cached, \
+    parse_formula_recursive
+from formula_bench import make_formula, run_benchmark
+import random
+import pytest
+
+
+def test_formula_cache():
+    """Verify that FormulaCache returns the results of parse_formula
+    as new lists and evicts the least recently used formula.
+    Parameters: none
+    Return: nothing
+    """
+    periodic_table_dict = make_periodic_table()
+    cache = FormulaCache(maxsize=2)
+    for formula in ["H2O", "(C2(NaCl)4H2)2C4Na", "H2O"]:
+        assert cache.parse(formula, periodic_table_dict) \
+                == parse_formula(formula, periodic_table_dict)
+    assert cache.stats() == {"hits": 1, "misses": 2, "evictions": 0,
+            "size": 2, "maxsize": 2}
+
+    # Changing a returned list doesn't change the cache.
+    result = cache.parse("H2O", periodic_table_dict)
+    result.append(("C", 1))
+    assert cache.parse("H2O", periodic_table_dict) == [("H", 2), ("O", 1)]
+
+    # H2O was used last, so the long formula is evicted.
+    cache.parse("C6H6", periodic_table_dict)
+    assert cache.evictions == 1
+    misses = cache.misses
+    cache.parse("H2O", periodic_table_dict)
+    assert cache.misses == misses
+    cache.parse("(C2(NaCl)4H2)2C4Na", periodic_table_dict)
+    assert cache.misses == misses + 1
+
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.stats()["hits"] == 0
+    with pytest.raises(ValueError):
+        FormulaCache(maxsize=0)
+
+
+def test_formula_cache_tables_and_errors():
+    """Verify that results are kept apart for different periodic
+    tables and that invalid formulas raise FormulaError every time.
+    Parameters: none
+    Return: nothing
+    """
+    periodic_table_dict = make_periodic_table()
+    small_table = {"H": ["Hydrogen", 1.00794], "O": ["Oxygen", 15.9994]}
+    cache = FormulaCache()
+    assert cache.parse("CO", periodic_table_dict) == [("C", 1), ("O", 1)]
+    with pytest.raises(FormulaError):
+        cache.parse("CO", small_table)
+    with pytest.raises(FormulaError) as error:
+        cache.parse("CO", small_table)
+    assert error.value.args == ("invalid formula; unknown element symbol: C", "CO", 0)
+    assert cache.hits == 1
+    assert cache.misses == 2
+
+    # A version given by the caller is used instead of the identity.
+    cache.parse("H2O", periodic_table_dict, table_version="full")
+    assert cache.parse("H2O", make_periodic_table(), table_version="full") == [("H", 2), ("O", 1)]
+    assert cache.hits == 2
+
+    assert parse_formula_cached("H2O", periodic_table_dict) == [("H", 2), ("O", 1)]
+
+    # A new table with the same symbols on every call shares results
+    # and isn't kept by the cache.
+    cache = FormulaCache(maxsize=10)
+    for _ in range(200):
+        assert cache.parse("CH4", make_periodic_table()) == [("C", 1), ("H", 4)]
+    assert cache.misses == 1
+    assert cache.hits == 199
+    assert len(cache) == 1
+
+
+def parse_result(parser, formula, periodic_table_dict):
+    """Return ("ok", the result of parser) or ("error", the arguments
+    of the FormulaError that parser raised).
+    """
+    try:
+        return "ok", parser(formula, periodic_table_dict)
+    except FormulaError as error:
+        return "error", error.args
+
+
+def test_parse_formula_matches_recursive():
+    """Verify that parse_formula returns the same results and raises
+    the same errors, at the same positions, as the recursive parser.
+    Parameters: none
+    Return: nothing
+    """
+    periodic_table_dict = make_periodic_table()
+    odd_table = {"H": 1, "He": 2, "C1": 3, "Cl": 4}
+    pieces = ["(", ")", "H", "C", "O", "Na", "Cl", "c", "l", "2", "0", "12", "-", " ", "X"]
+    rand = random.Random(5)
+    for _ in range(20000):
+        formula = "".join(rand.choice(pieces) for _ in range(rand.randint(0, 10)))
+        for table in [periodic_table_dict, PERIODIC_TABLE, odd_table]:
+            assert parse_result(parse_formula, formula, table) \
+                    == parse_result(parse_formula_recursive, formula, table), formula
+
+    assert parse_result(parse_formula, "(C(H2O", periodic_table_dict) \
+            == ("error", ("invalid formula; unmatched open parenthesis", "(C(H2O", 2))
+    assert parse_result(parse_formula, "H2O)", periodic_table_dict) \
+            == ("error", ("invalid formula; unmatched close parenthesis", "H2O)", 3))
+    assert parse_result(parse_formula, "CaX", periodic_table_dict) \
+            == ("error", ("invalid formula; unknown element symbol: X", "CaX", 2))
+
+
+def test_parse_formula_long_and_deep():
+    """Verify that parse_formula handles formulas that are very long
+    or nested deeper than the recursion limit.
+    Parameters: none
+    Return: nothing
+    """
+    formula = make_formula("nested", 100001)
+    assert parse_formula(formula, PERIODIC_TABLE) == [("H", 2), ("O", 1)]
+    with pytest.raises(RecursionError):
+        parse_formula_recursive(formula, PERIODIC_TABLE)
+
+    formula = make_formula("flat", 30000)
+    assert parse_formula(formula, PERIODIC_TABLE) == [("C", 10000), ("H", 20002)]
+
+    results = run_benchmark([10, 100])
+    assert len(results) == 6
+    assert all(result["iterative"] > 0 for result in results)
+
+
+# Call the main function that is part of pytest so that the
+# computer will execute the test functions in this file.
+pytest.main(["-v", "--tb=line", "-rN", __file__])
@@ -0,0 +1,98 @@
+"""Verify the monoisotopic masses and isotope distributions computed
+by isotopes.py.
+"""
+
+from isotopes import isotope_distribution, monoisotopic_mass, ISOTOPES
+from chemistry import PERIODIC_TABLE, compute_molar_mass
+from formula import parse_formula
+from pytest import approx
+import pytest
+
+
+def expand(symbol_quantity_list):
+    """Compute an isotope distribution one atom at a time, with no
+    pruning, and return it as a list of [mass, probability] lists.
+    """
+    peaks = {0: [1.0, 0.0]}  # extra neutrons -> [probability, probability * mass]
+    for symbol, quantity in symbol_quantity_list:
+        lightest = ISOTOPES[symbol][0][0]
+        for _ in range(quantity):
+            new_peaks = {}
+            for neutrons, (probability, mass_sum) in peaks.items():
+                for mass_number, isotopic_mass, abundance in ISOTOPES[symbol]:
+                    peak = new_peaks.setdefault(neutrons + mass_number - lightest, [0.0, 0.0])
+                    peak[0] += probability * abundance
+                    peak[1] += (mass_sum + probability * isotopic_mass) * abundance
+            peaks = new_peaks
+    return [[mass_sum / probability, probability]
+        for _, (probability, mass_sum) in sorted(peaks.items())]
+
+
+def test_monoisotopic_mass():
+    """Verify the monoisotopic masses of a few formulas.
+    Parameters: none
+    Return: nothing
+    """
+    def mass(formula):
+        return monoisotopic_mass(parse_formula(formula, PERIODIC_TABLE))
+
+    assert mass("H2O") == approx(18.010565, abs=1e-6)
+    assert mass("C6H12O6") == approx(180.063388, abs=1e-6)
+    assert mass("CH3Cl") == approx(49.992328, abs=1e-6)
+    with pytest.raises(ValueError):
+        mass("UO2")
+
+
+def test_isotope_distribution():
+    """Verify that the distribution matches expanding one atom at a
+    time, and that the pruned distribution of a large molecule has the
+    average mass of compute_molar_mass.
+    Parameters: none
+    Return: nothing
+    """
+    for formula in ["H2O", "CH2Cl2", "C6H12O6S", "C2H5BrSe", "C3H7NO2S"]:
+        symbol_quantity_list = parse_formula(formula, PERIODIC_TABLE)
+        peaks = isotope_distribution(symbol_quantity_list, threshold=0)
+        expected = expand(symbol_quantity_list)
+        assert len(peaks) == len(expected)
+        for (mass, probability), (expected_mass, expected_probability) in zip(peaks, expected):
+            assert mass == approx(expected_mass, abs=1e-9)
+            assert probability == approx(expected_probability, abs=1e-12)
+
+    # Chlorine has two isotopes 2 u apart in a ratio of about 3 to 1.
+    peaks = isotope_distribution(parse_formula("CH3Cl", PERIODIC_TABLE), threshold=0.01)
+    assert [round(mass) for mass, _ in peaks] == [50, 51, 52]
+    assert peaks[2][1] / peaks[0][1] == approx(0.2424 / 0.7576, rel=0.02)
+
+    # A protein of about 44,000 u.
+    symbol_quantity_list = parse_formula("C2000H3000N500O600S10", PERIODIC_TABLE)
+    peaks = isotope_distribution(symbol_quantity_list, threshold=1e-4)
+    total = sum(probability for _, probability in peaks)
+    assert total == approx(1, abs=1e-3)
+    average = sum(mass * probability for mass, probability in peaks) / total
+    assert average == approx(compute_molar_mass(symbol_quantity_list, PERIODIC_TABLE), abs=0.5)
+    tallest = max(probability for _, probability in peaks)
+    assert min(probability for _, probability in peaks) >= 1e-4 * tallest
+
+
+def test_isotope_distribution_error():
+    """Verify that the peaks of a pruned distribution are at most the
+    peaks of the distribution with no pruning, and short of them by
+    less than threshold / 1000 in total.
+    Parameters: none
+    Return: nothing
+    """
+    for formula in ["C254H377N65O75S6", "C2000H3000N500O600S10"]:
+        symbol_quantity_list = parse_formula(formula, PERIODIC_TABLE)
+        exact = {round(mass): probability
+            for mass, probability in isotope_distribution(symbol_quantity_list, threshold=0)}
+        for threshold in [1e-2, 1e-4, 1e-6]:
+            peaks = isotope_distribution(symbol_quantity_list, threshold)
+            differences = [exact[round(mass)] - probability for mass, probability in peaks]
+            assert min(differences) >= 0
+            assert sum(differences) < threshold / 1000
+
+
+# Call the main function that is part of pytest so that the
+# computer will execute the test functions in this file.
+pytest.main(["-v", "--tb=line", "-rN", __file__])
@@ -0,0 +1,66 @@
+"""Verify that mass_index.py finds every known compound within a
+tolerance of a mass.
+"""
+
+from mass_index import MassIndex, tolerance_of
+from molecules import MoleculeIndex
+from chemistry import PERIODIC_TABLE, compute_molar_mass, known_molecules
+from formula import parse_formula
+from pytest import approx
+import random
+import pytest
+
+
+def test_search():
+    """Verify single searches against the built in molecules.
+    Parameters: none
+    Return: nothing
+    """
+    index = MassIndex(known_molecules)
+    assert len(index) == len(known_molecules)
+    assert list(index.masses) == sorted(index.masses)
+
+    water = index.search(18.0, tolerance=0.1)
+    assert [key for key, _ in water] == ["H2O"]
+    assert water[0][1] == approx(18.01528)
+    assert index.names("H2O") == ("water",)
+    assert index.search(18.0, tolerance=0.001) == []
+    assert [key for key, _ in index.search(46.06844, ppm=1)] == ["C2H6O"]
+
+    assert tolerance_of(200.0, ppm=5) == approx(0.001)
+    assert tolerance_of(200.0, 0.01, ppm=5) == 0.01
+    with pytest.raises(ValueError):
+        tolerance_of(200.0, -1)
+
+
+def test_search_many():
+    """Verify that a batch of searches returns the same compounds as
+    a linear scan, in the order of the targets.
+    Parameters: none
+    Return: nothing
+    """
+    rand = random.Random(22)
+    pairs = []
+    for number in range(2000):
+        formula = f"C{rand.randint(1, 40)}H{rand.randint(1, 80)}N{rand.randint(0, 5)}O{rand.randint(0, 10)}"
+        pairs.append((formula.replace("N0", "").replace("O0", ""), f"compound {number}"))
+    molecules, _ = MoleculeIndex.from_pairs(pairs, PERIODIC_TABLE)
+    index = MassIndex(molecules)
+    masses = {key: compute_molar_mass(parse_formula(key, PERIODIC_TABLE), PERIODIC_TABLE)
+        for key in molecules}
+
+    targets = [rand.uniform(0, 800) for _ in range(500)]
+    for ppm in (None, 20):
+        results = index.search_many(targets, 0.05, ppm)
+        assert len(results) == len(targets)
+        for target, matches in zip(targets, results):
+            tolerance = tolerance_of(target, 0.05, ppm)
+            expected = sorted(key for key, mass in masses.items()
+                if target - tolerance <= mass <= target + tolerance)
+            assert sorted(key for key, _ in matches) == expected
+            assert matches == index.search(target, 0.05, ppm)
+
+
+# Call the main function that is part of pytest so that the
+# computer will execute the test functions in this file.
+pytest.main(["-v", "--tb=line", "-rN", __file__])
@@ -0,0 +1,86 @@
+"""Verify that the molecule index in molecules.py finds the names of
+a formula whatever order its atoms are written in.
+"""
+
+from molecules import MoleculeIndex, MoleculeError, hill_key
+from chemistry import PERIODIC_TABLE, known_molecules, get_formula_name, known_molecules_dict
+from formula import parse_formula
+import pytest
+
+
+def test_hill_key():
+    """Verify that hill_key writes carbon, then hydrogen, then the
+    other elements in alphabetical order.
+    Parameters: none
+    Return: nothing
+    """
+    def key(formula):
+        return hill_key(parse_formula(formula, PERIODIC_TABLE))
+
+    assert key("C2H5OH") == "C2H6O"
+    assert key("CH3(CH2)6CH3") == "C8H18"
+    assert key("OH2") == "H2O"
+    assert key("NaCl") == "ClNa"
+    assert key("HCl") == "ClH"
+    assert key("CH3Br") == "CH3Br"
+    assert key("C6H12O6") == "C6H12O6"
+    assert hill_key([["O", 1], ["H", 1], ["H", 1], ["C", 1]]) == "CH2O"
+
+
+def test_molecule_index(tmp_path):
+    """Verify names, several names of one composition, and that an
+    index file loads back the same index.
+    Parameters: none
+    Return: nothing
+    """
+    compounds = tmp_path / "compounds.csv"
+    compounds.write_text("formula,name\n"
+            "C2H5OH,ethanol\n"
+            "CH3OCH3,dimethyl ether\n"
+            "C2H6O,ethanol\n"
+            "H2O,water\n"
+            "Xy2,not a compound\n"
+            "NaCl,sodium chloride\n")
+    index, skipped = MoleculeIndex.from_csv(str(compounds), PERIODIC_TABLE)
+    assert skipped == 1
+    assert len(index) == 3
+    assert index.names_of_key("C2H6O") == ("ethanol", "dimethyl ether")
+    assert index.names(parse_formula("CH3CH2OH", PERIODIC_TABLE)) == ("ethanol", "dimethyl ether")
+    assert index.name("OH2", PERIODIC_TABLE) == "water"
+    assert index.name("ClNa", PERIODIC_TABLE) == "sodium chloride"
+    assert index.name("H2O2", PERIODIC_TABLE) == "unknown compound"
+
+    filename = tmp_path / "compounds.kmol"
+    index.save(str(filename))
+    loaded = MoleculeIndex.load(str(filename))
+    assert len(loaded) == len(index)
+    for key in ("C2H6O", "H2O", "ClNa", "CO2"):
+        assert loaded.names_of_key(key) == index.names_of_key(key)
+
+    empty, _ = MoleculeIndex.from_pairs([], PERIODIC_TABLE)
+    empty.save(str(filename))
+    assert len(MoleculeIndex.load(str(filename))) == 0
+
+    filename.write_bytes(b"not an index file at all, just some bytes")
+    with pytest.raises(MoleculeError):
+        MoleculeIndex.load(str(filename))
+
+
+def test_known_molecules():
+    """Verify that get_formula_name finds the built in molecules by
+    composition and still works with a plain dictionary.
+    Parameters: none
+    Return: nothing
+    """
+    assert get_formula_name("C8H18", known_molecules) == "octane"
+    assert get_formula_name("CH3(CH2)6CH3", known_molecules) == "octane"
+    assert get_formula_name("OH2", known_molecules) == "water"
+    assert get_formula_name("CH3CH2OH", known_molecules) == "ethanol"
+    assert get_formula_name("H2O2", known_molecules) == "unknown compound"
+    assert get_formula_name("H2O", known_molecules_dict) == "water"
+    assert get_formula_name("OH2", known_molecules_dict) == "unknown compound"
+
+
+# Call the main function that is part of pytest so that the
+# computer will execute the test functions in this file.
+pytest.main(["-v", "--tb=line", "-rN", __file__])
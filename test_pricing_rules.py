@@ -0,0 +1,130 @@
+"""Verify that the discount rules engine in pricing_rules.py works correctly."""
+
+from pricing_rules import parse_rule, compile_rules, read_rules, \
+    load_pricing_rules, RuleError, FIT_TRACK_DISCOUNT_RULES, \
+    LARGE_ORDER_DISCOUNT_RULES
+from receipt import read_dictionary, price_order, get_order_discount
+from datetime import datetime
+from os import path
+from pytest import approx
+import pytest
+
+
+# June 3, 2024 was a Monday.
+MONDAY = datetime(2024, 6, 3, 14, 0)
+TUESDAY = datetime(2024, 6, 4, 14, 0)
+WEDNESDAY = datetime(2024, 6, 5, 14, 0)
+SATURDAY = datetime(2024, 6, 8, 14, 0)
+
+
+def test_parse_rule():
+    """Verify that the parse_rule function converts a rule row.
+    Parameters: none
+    Return: nothing
+    """
+    rule = parse_rule(["dairy", "tuesday Friday", "09:30", "12:00",
+            "20", "D150 P*", "0.15"])
+    assert rule["days"] == {1, 4}
+    assert rule["start"] == 570
+    assert rule["end"] == 720
+    assert rule["min_subtotal"] == 20
+    assert rule["products"] == {"D150"}
+    assert rule["prefixes"] == ["P"]
+    assert rule["rate"] == approx(0.15)
+
+    rule = parse_rule(["all", "", "", "", "", "*", "0.05"])
+    assert rule["days"] == {0, 1, 2, 3, 4, 5, 6}
+    assert rule["start"] == 0
+    assert rule["end"] == 24 * 60
+    assert rule["products"] is None
+
+    with pytest.raises(RuleError):
+        parse_rule(["bad day", "Caturday", "", "", "", "", "0.1"])
+    with pytest.raises(RuleError):
+        parse_rule(["bad time", "", "12:00", "11:00", "", "", "0.1"])
+    with pytest.raises(RuleError):
+        parse_rule(["bad rate", "", "", "", "", "", "10"])
+    with pytest.raises(RuleError):
+        parse_rule(["too short", "", "0.1"])
+
+
+def test_compile_rules():
+    """Verify that compiled rules give the right rate for each day,
+    time, subtotal and product.
+    Parameters: none
+    Return: nothing
+    """
+    rules = compile_rules([
+        parse_rule(["weekday", "Tuesday Wednesday", "", "", "", "*", "0.10"]),
+        parse_rule(["dairy", "Tuesday", "", "", "", "D*", "0.20"]),
+        parse_rule(["happy hour", "", "17:00", "18:00", "", "C013", "0.50"]),
+        parse_rule(["big order", "", "", "", "100", "*", "0.12"]),
+    ], ["D150", "D083", "C013", "W112"])
+
+    assert rules.rates_for(MONDAY).rate("D150") == 0
+    assert rules.rates_for(WEDNESDAY).rate("D150") == approx(0.10)
+    assert rules.rates_for(TUESDAY).rate("D150") == approx(0.20)
+    assert rules.rates_for(TUESDAY).rate("W112") == approx(0.10)
+
+    happy_hour = datetime(2024, 6, 3, 17, 30)
+    assert rules.rates_for(happy_hour).rate("C013") == approx(0.50)
+    assert rules.rates_for(happy_hour).rate("D150") == 0
+    assert rules.rates_for(datetime(2024, 6, 3, 18, 0)).rate("C013") == 0
+
+    # The largest rate wins when several rules apply.
+    assert rules.rates_for(TUESDAY, 150).rate("W112") == approx(0.12)
+    assert rules.rates_for(TUESDAY, 150).rate("D083") == approx(0.20)
+    assert rules.rates_for(TUESDAY, 99.99).rate("W112") == approx(0.10)
+    assert rules.order_rate(SATURDAY, 100) == approx(0.12)
+
+
+def test_existing_discounts():
+    """Verify that the built in rules match the discounts that
+    receipt.py, discount.py and fit_track.py used to compute.
+    Parameters: none
+    Return: nothing
+    """
+    weekday = load_pricing_rules()
+    assert weekday.order_rate(MONDAY) == 0
+    assert weekday.order_rate(TUESDAY) == approx(0.10)
+    assert weekday.order_rate(WEDNESDAY) == approx(0.10)
+
+    large_order = load_pricing_rules(default_rows=LARGE_ORDER_DISCOUNT_RULES)
+    assert large_order.order_rate(TUESDAY, 49.99) == 0
+    assert large_order.order_rate(TUESDAY, 50) == approx(0.10)
+    assert large_order.order_rate(SATURDAY, 80) == 0
+
+    fit_track = load_pricing_rules(default_rows=FIT_TRACK_DISCOUNT_RULES)
+    assert fit_track.order_rate(datetime(2024, 6, 8, 10, 59)) == approx(0.10)
+    assert fit_track.order_rate(datetime(2024, 6, 8, 11, 0)) == 0
+    assert fit_track.order_rate(WEDNESDAY) == approx(0.10)
+
+
+def test_rules_in_receipt(tmp_path):
+    """Verify that rules read from a file price a receipt.
+    Parameters: none
+    Return: nothing
+    """
+    filename = tmp_path / "rules.csv"
+    filename.write_text("Name,Days,Start,End,Min Subtotal,Scope,Rate\n"
+            "bread,Monday,,,,W112,0.50\n"
+            "big order,,,,10,*,0.10\n")
+    products_file = path.join(path.dirname(__file__), "products.csv")
+    products_dict = read_dictionary(products_file, 0)
+    rules = compile_rules(read_rules(str(filename)), products_dict)
+
+    items = [["W112", 2], ["D083", 4]]
+    discount = get_order_discount(rules, items, products_dict, MONDAY)
+    receipt = price_order(items, products_dict, discount)
+    assert receipt["items"][0][2] == approx(1.275)
+    assert receipt["items"][1][2] == approx(0.75)
+
+    items = [["W112", 2], ["H001", 1]]
+    discount = get_order_discount(rules, items, products_dict, TUESDAY)
+    receipt = price_order(items, products_dict, discount)
+    assert receipt["subtotal"] == approx((5.10 + 6.45) * 0.9)
+
+
+# Call the main function that is part of pytest so that the
+# computer will execute the test functions in this file.
+pytest.main(["-v", "--tb=line", "-rN", __file__])
@@ -0,0 +1,137 @@
+"""Verify that the product name search in product_search.py finds
+and ranks products correctly.
+"""
+
+from product_search import ProductSearch, FollowingSearch
+from catalog import ReloadingCatalog, RcuCatalog
+from receipt import read_dictionary
+from test_catalog import write_products
+from os import path
+import pytest
+import time
+
+
+PRODUCTS_FILE = path.join(path.dirname(__file__), "products.csv")
+
+
+def test_search_ranking():
+    """Verify that exact names come first, then names that start
+    with the query, then names with a word that starts with it, then
+    names that contain it.
+    Parameters: none
+    Return: nothing
+    """
+    index = ProductSearch({
+        "A1": ["A1", "cheese puffs", "2.00"],
+        "A2": ["A2", "cheese", "3.00"],
+        "A3": ["A3", "cheddar cheese", "3.35"],
+        "A4": ["A4", "macaroni and cheese", "1.25"],
+        "A5": ["A5", "cheesecake", "6.50"],
+        "A6": ["A6", "Cream Cheese", "1.99"],
+        "A7": ["A7", "apple", "0.50"],
+    })
+    assert len(index) == 7
+    assert index.search("cheese") == ["A2", "A1", "A5", "A6", "A3", "A4"]
+    assert index.search("CHEESE", limit=2) == ["A2", "A1"]
+    assert index.search("eesec") == ["A5"]
+    assert index.search("  apple ") == ["A7"]
+    assert index.search("ch") == ["A3", "A2", "A1", "A5", "A6", "A4"]
+    assert index.search("pear") == []
+    assert index.search("") == []
+    assert index.search("cheese", limit=0) == []
+
+
+def test_search_products_file():
+    """Verify the search with the products in products.csv, and that
+    products with the same name are all found.
+    Parameters: none
+    Return: nothing
+    """
+    products_dict = read_dictionary(PRODUCTS_FILE, 0)
+    index = ProductSearch(products_dict)
+    assert index.search("lettuce") == ["P019", "P021", "P020"]
+    assert index.search("milk") == ["D150"]
+    assert index.search("1 gallon") == ["D150"]
+    assert index.search("ddar") == ["D215"]
+
+    index = ProductSearch({"B1": ["B1", "banana", "0.25"], "B2": ["B2", "Banana", "0.30"]})
+    assert index.search("nan") == ["B1", "B2"]
+
+
+def test_following_search(tmp_path):
+    """Verify that FollowingSearch sees the products that a reload
+    adds, renames and removes.
+    Parameters: none
+    Return: nothing
+    """
+    filename = str(tmp_path / "products.csv")
+    write_products(filename, ["D150,1 gallon milk,2.85",
+            "D083,1 cup yogurt,0.75"], 10**18)
+    catalog = ReloadingCatalog(filename)
+    search = FollowingSearch(catalog)
+    assert search.search("yogurt") == ["D083"]
+    old_index = search._index
+
+    # A price change doesn't rebuild the index.
+    write_products(filename, ["D150,1 gallon milk,2.99",
+            "D083,1 cup yogurt,0.75"], 10**18 + 1)
+    catalog.reload_if_changed()
+    assert search._index is old_index
+
+    write_products(filename, ["D150,1 gallon skim milk,2.99",
+            "W112,wheat bread,2.55"], 10**18 + 2)
+    catalog.reload_if_changed()
+    assert search.search("yogurt") == []
+    assert search.search("bread") == ["W112"]
+    assert search.search("skim") == ["D150"]
+    assert len(search) == 2
+
+
+def test_following_search_changes():
+    """Verify that FollowingSearch merges the products changed since
+    its index was built with the index, in the order of a new index,
+    and that compacting builds a new index with the same results.
+    Parameters: none
+    Return: nothing
+    """
+    catalog = RcuCatalog({
+        "A1": ["A1", "cheese puffs", "2.00"],
+        "A2": ["A2", "cheese", "3.00"],
+        "A3": ["A3", "cheddar cheese", "3.35"],
+        "A4": ["A4", "macaroni and cheese", "1.25"],
+        "A7": ["A7", "apple", "0.50"],
+    })
+    search = FollowingSearch(catalog, compact_size=100)
+    base = search._index[0]
+    catalog.update(rows=[["A5", "cheesecake", "6.50"], ["A6", "Cream Cheese", "1.99"],
+            ["A8", "cheese", "2.50"], ["A3", "cheddar", "3.35"]], deleted=["A1"])
+    assert search._index[0] is base
+
+    expected = ProductSearch(catalog.snapshot())
+    for query in ["cheese", "ch", "che", "ddar", "apple", "puffs"]:
+        assert search.search(query) == expected.search(query)
+    assert search.search("cheese") == ["A2", "A8", "A5", "A6", "A4"]
+    assert search.search("cheese", limit=1) == ["A2"]
+    assert len(search) == len(expected) == 6
+
+    search.compact()
+    assert search._index[0] is not base
+    assert search._index[1] is None
+    assert search.search("cheese") == ["A2", "A8", "A5", "A6", "A4"]
+    assert len(search) == 6
+
+    # More changes than compact_size build a new index in the
+    # background.
+    search.compact_size = 0
+    catalog.update(rows=[["A9", "swiss cheese", "4.10"]])
+    for _ in range(100):
+        if not search._compacting:
+            break
+        time.sleep(0.05)
+    assert search._index[1] is None
+    assert search.search("swiss") == ["A9"]
+
+
+# Call the main function that is part of pytest so that the
+# computer will execute the test functions in this file.
+pytest.main(["-v", "--tb=line", "-rN", __file__])
@@ -1,9 +1,17 @@
 # Copyright 2020, Brigham Young University-Idaho. All rights reserved.
 
-from receipt import read_dictionary
+from receipt import read_dictionary, read_orders, price_order, \
+    write_receipts, write_receipts_parallel, total_orders, \
+    check_request_file
+from catalog import ProductCatalog
+from tax_engine import compile_tax
+from datetime import datetime
+from io import StringIO
 from os import path
 from tempfile import mktemp
 from pytest import approx
+import csv
+import json
 import pytest
 
 
@@ -108,6 +116,258 @@ def check_product(products_dict, product_number, expected_value):
         f"expected {exp_price} but found {act_price}"
 
 
+def write_request_file(tmp_path, text):
+    """Write text into a request CSV file in tmp_path.
+    Parameters
+        tmp_path: a pathlib.Path for a temporary directory
+        text: the contents of the file
+    Return: the name of the file
+    """
+    filename = tmp_path / "orders.csv"
+    filename.write_text(text)
+    return str(filename)
+
+
+def test_read_orders(tmp_path):
+    """Verify that the read_orders function splits a request file
+    into orders.
+    Parameters: none
+    Return: nothing
+    """
+    # A file without an order id column is a single order.
+    filename = path.join(path.dirname(__file__), "request.csv")
+    orders = list(read_orders(filename))
+    assert orders == [(None, [["W112", 2], ["D083", 4], ["W231", 1],
+            ["C013", 2], ["D083", 3]])]
+
+    # Consecutive rows with the same order id belong to one order,
+    # and short rows are skipped.
+    filename = write_request_file(tmp_path,
+            "Order #,Product #,Quantity\n"
+            "1001,D150,1\n"
+            "1001,W112,2\n"
+            "\n"
+            "1002,H001,3\n")
+    orders = read_orders(filename, order_column_index=0,
+            product_column_index=1, quantity_column_index=2)
+    assert next(orders) == ("1001", [["D150", 1], ["W112", 2]])
+    assert next(orders) == ("1002", [["H001", 3]])
+    with pytest.raises(StopIteration):
+        next(orders)
+
+
+def test_check_request_file(tmp_path):
+    """Verify that check_request_file reports every bad line and that
+    read_orders can skip them.
+    Parameters: none
+    Return: nothing
+    """
+    filename = path.join(path.dirname(__file__), "products.csv")
+    products_dict = read_dictionary(filename, 0)
+
+    # request.csv has no problems.
+    filename = path.join(path.dirname(__file__), "request.csv")
+    assert check_request_file(filename, products_dict) == []
+
+    filename = write_request_file(tmp_path,
+            "Order #,Product #,Quantity\n"
+            "1,D150,1\n"
+            "1,XXXX,2\n"
+            "2,W112,two\n"
+            "2,C013,1\n"
+            "3,XXXX,1\n"
+            "3,YYYY,1\n")
+    expected = [[3, "unknown product ID 'XXXX'"],
+            [4, "invalid quantity 'two'"],
+            [6, "unknown product ID 'XXXX'"],
+            [7, "unknown product ID 'YYYY'"]]
+    assert check_request_file(filename, products_dict, 0, 1, 2) == expected
+
+    # The check works the same with a ProductCatalog.
+    catalog = ProductCatalog.from_rows(products_dict.values())
+    assert check_request_file(filename, catalog, 0, 1, 2) == expected
+
+    skip_lines = {line_number for line_number, _ in expected}
+    orders = list(read_orders(filename, 0, 1, 2, skip_lines=skip_lines))
+    assert orders == [("1", [["D150", 1]]), ("2", [["C013", 1]])]
+
+
+def test_price_order():
+    """Verify that the price_order function computes the totals.
+    Parameters: none
+    Return: nothing
+    """
+    filename = path.join(path.dirname(__file__), "products.csv")
+    products_dict = read_dictionary(filename, 0)
+
+    receipt = price_order([["W112", 2], ["D083", 4]], products_dict, 0.0)
+    assert receipt["order_id"] is None
+    assert receipt["items"] == [["wheat bread", 2, approx(2.55)],
+            ["1 cup yogurt", 4, approx(0.75)]]
+    assert receipt["total_items"] == 6
+    assert receipt["subtotal"] == approx(8.10)
+    assert receipt["sales_tax"] == approx(0.486)
+    assert receipt["total"] == approx(8.586)
+
+    receipt = price_order([["W112", 2]], products_dict, 0.10, "7")
+    assert receipt["order_id"] == "7"
+    assert receipt["subtotal"] == approx(4.59)
+
+    with pytest.raises(KeyError):
+        price_order([["XXXX", 1]], products_dict, 0.0)
+
+
+def test_total_orders():
+    """Verify that the total_orders function computes exactly the
+    same totals as the price_order function.
+    Parameters: none
+    Return: nothing
+    """
+    filename = path.join(path.dirname(__file__), "products.csv")
+    products_dict = read_dictionary(filename, 0)
+    product_numbers = list(products_dict)
+    orders = []
+    for order in range(40):
+        items = [[product_numbers[(order * 7 + line) % len(product_numbers)],
+                (order + line) % 9 + 1] for line in range(order % 6)]
+        orders.append((str(order), items))
+
+    for discount_rate in [0.0, 0.10]:
+        totals = list(total_orders(orders, products_dict, discount_rate))
+        assert len(totals) == len(orders)
+        for (order_id, items), total in zip(orders, totals):
+            receipt = price_order(items, products_dict, discount_rate,
+                    order_id)
+            del receipt["items"]
+            assert total == receipt
+
+    with pytest.raises(KeyError):
+        list(total_orders([("1", [["XXXX", 1]])], products_dict, 0.0))
+
+    # With a tax table, the first jurisdiction is the sales tax and
+    # every jurisdiction is computed in the same pass.
+    tax = compile_tax(products_dict, rate_rows=[
+        ["Utah", "grocery", "0.03"], ["Utah", "prepared food", "0.0725"],
+        ["Utah", "non-food", "0.0725"], ["Idaho", "grocery", "0.06"],
+        ["Idaho", "prepared food", "0.06"], ["Idaho", "non-food", "0.06"]])
+    for total, (order_id, items) in zip(total_orders(orders, products_dict, 0.10, tax), orders):
+        receipt = price_order(items, products_dict, 0.10, order_id, tax)
+        assert total["sales_tax"] == receipt["sales_tax"]
+        assert total["total"] == receipt["total"]
+        assert total["taxes"]["Utah"] == total["sales_tax"]
+        assert total["taxes"]["Idaho"] == approx(total["subtotal"] * 0.06)
+
+
+def test_write_receipts(tmp_path):
+    """Verify that the write_receipts function writes one receipt
+    for each order.
+    Parameters: none
+    Return: nothing
+    """
+    filename = path.join(path.dirname(__file__), "products.csv")
+    products_dict = read_dictionary(filename, 0)
+    filename = write_request_file(tmp_path,
+            "Order #,Product #,Quantity\n"
+            "A,D150,1\n"
+            "B,W112,2\n"
+            "B,C013,1\n")
+    orders = read_orders(filename, order_column_index=0,
+            product_column_index=1, quantity_column_index=2)
+
+    # June 3, 2024 was a Monday, so there is no discount.
+    date = datetime(2024, 6, 3, 9, 30)
+    out_file = StringIO()
+    count = write_receipts(orders, products_dict, out_file, date)
+    text = out_file.getvalue()
+
+    assert count == 2
+    assert text.count("Requested Items") == 2
+    assert "Order: A\n" in text
+    assert "wheat bread: 2 @ $2.55\n" in text
+    assert "Total: $6.31\n" in text
+    assert "Mon Jun 03 09:30:00 2024" in text
+
+
+def test_output_formats(tmp_path):
+    """Verify that write_receipts writes JSON Lines and CSV receipts.
+    Parameters: none
+    Return: nothing
+    """
+    filename = path.join(path.dirname(__file__), "products.csv")
+    products_dict = read_dictionary(filename, 0)
+    filename = write_request_file(tmp_path,
+            "Order #,Product #,Quantity\n"
+            "A,D150,1\n"
+            "B,W112,2\n"
+            "B,C013,1\n")
+    date = datetime(2024, 6, 3, 9, 30)
+
+    out_file = StringIO()
+    write_receipts(read_orders(filename, 0, 1, 2), products_dict,
+            out_file, date, output_format="json")
+    receipts = [json.loads(line) for line in out_file.getvalue().splitlines()]
+    assert len(receipts) == 2
+    assert receipts[1] == {"order_id": "B", "date": "2024-06-03T09:30:00",
+            "items": [{"name": "wheat bread", "quantity": 2, "price": 2.55},
+                {"name": "twix candy bar", "quantity": 1, "price": 0.85}],
+            "total_items": 3, "subtotal": 5.95, "sales_tax": 0.36,
+            "total": 6.31}
+
+    out_file = StringIO()
+    write_receipts(read_orders(filename, 0, 1, 2), products_dict,
+            out_file, date, output_format="csv")
+    rows = list(csv.reader(StringIO(out_file.getvalue())))
+    assert rows[0] == ["Order #", "Date", "Product", "Quantity", "Price",
+            "Subtotal", "Sales Tax", "Total"]
+    assert len(rows) == 6
+    assert rows[3] == ["B", "2024-06-03T09:30:00", "wheat bread", "2",
+            "2.55", "", "", ""]
+    assert rows[5] == ["B", "2024-06-03T09:30:00", "", "3", "",
+            "5.95", "0.36", "6.31"]
+
+
+def test_write_receipts_parallel(tmp_path):
+    """Verify that write_receipts_parallel writes exactly the same
+    receipts as write_receipts.
+    Parameters: none
+    Return: nothing
+    """
+    products_file = path.join(path.dirname(__file__), "products.csv")
+    products_dict = read_dictionary(products_file, 0)
+    lines = ["Order #,Product #,Quantity"]
+    product_numbers = list(products_dict)
+    for order in range(50):
+        for line in range(order % 4 + 1):
+            product_number = product_numbers[(order + line) % len(product_numbers)]
+            lines.append(f"{order},{product_number},{line + 1}")
+    filename = write_request_file(tmp_path, "\n".join(lines) + "\n")
+
+    # June 4, 2024 was a Tuesday, so the discount is applied.
+    date = datetime(2024, 6, 4, 17, 5)
+    for output_format in ["text", "csv"]:
+        serial_file = StringIO()
+        write_receipts(read_orders(filename, 0, 1, 2), products_dict,
+                serial_file, date, output_format=output_format)
+        parallel_file = StringIO()
+        count = write_receipts_parallel(read_orders(filename, 0, 1, 2),
+                products_file, parallel_file, date, workers=2,
+                shard_size=7, output_format=output_format)
+
+        assert count == 50
+        assert parallel_file.getvalue() == serial_file.getvalue()
+
+    # The tax table is sent to each worker once, not with each shard.
+    tax = compile_tax(products_dict, rate_rows=[["store", "grocery", "0.02"],
+            ["store", "prepared food", "0.08"], ["store", "non-food", "0.07"]])
+    serial_file = StringIO()
+    write_receipts(read_orders(filename, 0, 1, 2), products_dict,
+            serial_file, date, output_format="json", tax=tax)
+    parallel_file = StringIO()
+    write_receipts_parallel(read_orders(filename, 0, 1, 2), products_file,
+            parallel_file, date, workers=2, shard_size=7, output_format="json", tax=tax)
+    assert parallel_file.getvalue() == serial_file.getvalue()
+
+
 # Call the main function that is part of pytest so that the
 # computer will execute the test functions in this file.
 pytest.main(["-v", "--tb=line", "-rN", __file__])
@@ -0,0 +1,90 @@
+"""Verify that reactions.py balances chemical equations with the
+smallest whole number coefficients and reports the ones it can't.
+"""
+
+from reactions import ReactionBalancer, BalanceError, parse_reaction, \
+    reaction_matrix, null_space, format_reaction
+from chemistry import PERIODIC_TABLE
+from formula import parse_formula
+import pytest
+
+
+def test_parse_reaction():
+    """Verify that equations are split into their species.
+    Parameters: none
+    Return: nothing
+    """
+    assert parse_reaction("H2 + O2 -> H2O") == (["H2", "O2"], ["H2O"])
+    assert parse_reaction("2H2+O2=2 H2O") == (["H2", "O2"], ["H2O"])
+    assert parse_reaction("CH4 + 2 O2 => CO2 + 2 H2O") == (["CH4", "O2"], ["CO2", "H2O"])
+    with pytest.raises(BalanceError):
+        parse_reaction("H2 + O2")
+    with pytest.raises(BalanceError):
+        parse_reaction("H2 + -> H2")
+
+    compositions = [parse_formula(formula, PERIODIC_TABLE) for formula in ["H2", "O2", "H2O"]]
+    assert reaction_matrix(compositions) == (["H", "O"], [[2, 0, 2], [0, 2, 1]])
+    assert null_space([[2, 0, 2], [0, 2, 1]], 3) == [(2, 1, -2)]
+    assert null_space([[1, 1]], 2) == [(1, -1)]
+    assert null_space([[1, 0], [0, 1]], 2) == []
+
+
+def test_balance():
+    """Verify the coefficients of balanced equations and the errors of
+    equations that can't be balanced.
+    Parameters: none
+    Return: nothing
+    """
+    balancer = ReactionBalancer()
+    assert balancer.balance("H2 + O2 -> H2O") == [2, 1, 2]
+    assert balancer.balance("C3H8 + O2 -> CO2 + H2O") == [1, 5, 3, 4]
+    assert balancer.balance("KMnO4 + HCl = KCl + MnCl2 + H2O + Cl2") == [2, 16, 2, 2, 8, 5]
+    assert balancer.balance("Cu + HNO3 -> Cu(NO3)2 + NO + H2O") == [3, 8, 3, 2, 4]
+    assert balancer.balance("H2O + CO2 -> C6H12O6 + O2") == [6, 6, 1, 6]
+    equation = "C2H5OH + O2 -> CO2 + H2O"
+    assert format_reaction(equation, balancer.balance(equation)) == "C2H5OH + 3 O2 -> 2 CO2 + 3 H2O"
+
+    # The same species in another order and on the other side use the
+    # null space that is already in the cache.
+    misses = balancer.stats()["misses"]
+    assert balancer.balance("O2 + H2 -> H2O") == [1, 2, 2]
+    assert balancer.balance("H2O -> H2 + O2") == [2, 2, 1]
+    assert balancer.stats()["misses"] == misses
+
+    for equation, message in [("H2O -> H2O2", "inconsistent"),
+            ("H2 -> O2", "inconsistent"),
+            ("H2O + O2 -> H2", "inconsistent"),
+            ("H2 + O2 -> H2O + H2O2", "underdetermined"),
+            ("H2 + Xx -> H2", "unknown element")]:
+        with pytest.raises(BalanceError) as error:
+            balancer.balance(equation)
+        assert message in str(error.value)
+
+
+def test_balance_many():
+    """Verify a batch of thousands of equations.
+    Parameters: none
+    Return: nothing
+    """
+    balancer = ReactionBalancer(maxsize=10)
+    equations = []
+    for carbons in range(1, 2001):
+        equations.append(f"C{carbons}H{2 * carbons + 2} + O2 -> CO2 + H2O")
+        equations.append("H2O -> H2O2")
+    results, errors = balancer.balance_many(equations)
+    assert len(results) == len(equations)
+    assert sorted(errors) == list(range(1, len(equations), 2))
+    for carbons, coefficients in zip(range(1, 2001), results[::2]):
+        hydrogens = 2 * carbons + 2
+        alkane, oxygen, carbon_dioxide, water = coefficients
+        assert carbon_dioxide == alkane * carbons
+        assert 2 * water == alkane * hydrogens
+        assert 2 * oxygen == 2 * carbon_dioxide + water
+    stats = balancer.stats()
+    assert stats["size"] == 10
+    assert stats["hits"] == 1999
+
+
+# Call the main function that is part of pytest so that the
+# computer will execute the test functions in this file.
+pytest.main(["-v", "--tb=line", "-rN", __file__])
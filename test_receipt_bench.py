@@ -0,0 +1,76 @@
+"""Verify that the benchmark helpers in receipt_bench.py work correctly."""
+
+from receipt_bench import bench_lanes, write_catalog_file, write_request_file, \
+    run_suite, compare_results
+from receipt import read_dictionary, read_orders
+import pytest
+
+
+def test_generated_files(tmp_path):
+    """Verify that the generated catalog and request files can be
+    read by receipt.py.
+    Parameters: none
+    Return: nothing
+    """
+    catalog_file = str(tmp_path / "products.csv")
+    request_file = str(tmp_path / "request.csv")
+    write_catalog_file(catalog_file, 30)
+    write_request_file(request_file, 30, 45, lines_per_order=20)
+
+    products_dict = read_dictionary(catalog_file, 0)
+    assert len(products_dict) == 30
+    orders = list(read_orders(request_file, 0, 1, 2))
+    assert [len(items) for _, items in orders] == [20, 20, 5]
+    for _, items in orders:
+        for product_number, quantity in items:
+            assert product_number in products_dict
+            assert 1 <= quantity <= 5
+
+
+def test_run_suite(tmp_path):
+    """Verify that run_suite measures every benchmark.
+    Parameters: none
+    Return: nothing
+    """
+    results = run_suite(50, str(tmp_path), lookups=100)
+    assert "load_read_dictionary" in results
+    assert "write_receipts_stream" in results
+    for values in results.values():
+        assert values["seconds"] >= 0
+        assert values["peak_bytes"] >= 0
+
+
+def test_compare_results():
+    """Verify that compare_results reports only the benchmarks that
+    grew more than the tolerance.
+    Parameters: none
+    Return: nothing
+    """
+    baseline = {"1000": {"load": {"seconds": 1.0, "peak_bytes": 100},
+            "lookup": {"seconds": 2.0, "peak_bytes": None}}}
+    results = {"1000": {"load": {"seconds": 1.2, "peak_bytes": 200},
+            "lookup": {"seconds": 3.0, "peak_bytes": None},
+            "new": {"seconds": 9.0, "peak_bytes": 9}}}
+    regressions = compare_results(results, baseline, tolerance=0.25)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("load at size 1000: peak_bytes")
+    assert regressions[1].startswith("lookup at size 1000: seconds")
+    assert compare_results(results, baseline, tolerance=1.0) == []
+
+
+def test_bench_lanes():
+    """Verify that the checkout lane stress test runs the lanes and
+    the price writer.
+    Parameters: none
+    Return: nothing
+    """
+    result = bench_lanes(2, 200, seconds=0.2, product_count=100)
+    assert result["lanes"] == 2
+    assert result["lookups"] > 0
+    assert result["updates"] > 0
+    assert result["lookups_per_second"] > 0
+
+
+# Call the main function that is part of pytest so that the
+# computer will execute the test functions in this file.
+pytest.main(["-v", "--tb=line", "-rN", __file__])
@@ -0,0 +1,159 @@
+"""Verify that the receipt journal in receipt_journal.py works correctly."""
+
+from receipt_journal import ReceiptJournal, JournalError, INDEX_ENTRY
+from receipt import read_dictionary, price_order, format_receipt
+from datetime import datetime, timedelta
+from os import path
+import pytest
+
+
+PRODUCTS_FILE = path.join(path.dirname(__file__), "products.csv")
+
+
+def make_receipts(count):
+    """Price count small orders with a 10% discount.
+    Parameters
+        count: the number of receipts to make
+    Return: a list of (receipt, date) tuples, one day apart
+    """
+    products_dict = read_dictionary(PRODUCTS_FILE, 0)
+    product_numbers = list(products_dict)
+    first_date = datetime(2024, 6, 1, 8, 15, 30)
+    receipts = []
+    for index in range(count):
+        items = [[product_numbers[(index + line) % len(product_numbers)],
+                line + 1] for line in range(index % 3 + 1)]
+        receipt = price_order(items, products_dict, 0.10, str(index))
+        receipts.append((receipt, first_date + timedelta(days=index)))
+    return receipts
+
+
+def test_append_and_reprint(tmp_path):
+    """Verify that a journal reprints each receipt exactly as it was
+    printed, also after the journal is opened again.
+    Parameters: none
+    Return: nothing
+    """
+    filename = str(tmp_path / "receipts.journal")
+    receipts = make_receipts(10)
+    with ReceiptJournal(filename) as journal:
+        for number, (receipt, date) in enumerate(receipts, start=1):
+            assert journal.append(receipt, date) == number
+
+    with ReceiptJournal(filename) as journal:
+        assert len(journal) == 10
+        for number, (receipt, date) in enumerate(receipts, start=1):
+            assert journal.reprint(number) == format_receipt(receipt, date)
+            record = journal.get(number)
+            assert record["receipt_id"] == number
+            assert record["order_id"] == receipt["order_id"]
+        with pytest.raises(KeyError):
+            journal.get(11)
+        with pytest.raises(KeyError):
+            journal.get(0)
+
+        # Ids keep counting after the journal is opened again.
+        receipt, date = make_receipts(11)[10]
+        assert journal.append(receipt, date) == 11
+
+
+def test_date_range(tmp_path):
+    """Verify that between returns the receipts of a date range and
+    that receipts must be appended in time order.
+    Parameters: none
+    Return: nothing
+    """
+    filename = str(tmp_path / "receipts.journal")
+    with ReceiptJournal(filename) as journal:
+        for receipt, date in make_receipts(30):
+            journal.append(receipt, date)
+
+        records = list(journal.between(datetime(2024, 6, 5),
+                datetime(2024, 6, 10)))
+        assert [record["receipt_id"] for record in records] == [5, 6, 7, 8, 9]
+        assert list(journal.between(datetime(2023, 1, 1),
+                datetime(2024, 6, 1))) == []
+        assert len(list(journal.between(datetime(2024, 1, 1),
+                datetime(2025, 1, 1)))) == 30
+
+        receipt, _ = make_receipts(1)[0]
+        with pytest.raises(JournalError):
+            journal.append(receipt, datetime(2024, 6, 2))
+
+
+def test_recovery(tmp_path):
+    """Verify that a journal removes a half written receipt when it
+    is opened.
+    Parameters: none
+    Return: nothing
+    """
+    filename = str(tmp_path / "receipts.journal")
+    receipts = make_receipts(4)
+    with ReceiptJournal(filename) as journal:
+        for receipt, date in receipts[:3]:
+            journal.append(receipt, date)
+
+    # Pretend the program stopped in the middle of appending.
+    with open(filename, "ab") as data_file:
+        data_file.write(b"\x50\x00\x00\x00partial")
+    with open(filename + ".idx", "ab") as index_file:
+        index_file.write(b"\x01\x02\x03")
+
+    with ReceiptJournal(filename) as journal:
+        assert len(journal) == 3
+        receipt, date = receipts[3]
+        assert journal.append(receipt, date) == 4
+        assert journal.reprint(4) == format_receipt(receipt, date)
+        assert journal.reprint(3) == format_receipt(*receipts[2])
+
+    # Pretend the index entries of the last two receipts reached the
+    # disk, but their records didn't: one record is cut inside its
+    # header and the one after it is missing.
+    with ReceiptJournal(filename) as journal:
+        journal.append(*receipts[3])
+        _, position = journal._entry(5)
+    with open(filename, "r+b") as data_file:
+        data_file.truncate(position + 3)
+    with open(filename + ".idx", "ab") as index_file:
+        index_file.write(INDEX_ENTRY.pack(0, position + 1000))
+
+    with ReceiptJournal(filename) as journal:
+        assert len(journal) == 4
+        assert journal.reprint(4) == format_receipt(*receipts[3])
+        assert journal.append(*receipts[3]) == 5
+        assert journal.reprint(5) == format_receipt(*receipts[3])
+
+
+def test_read_only(tmp_path):
+    """Verify that a journal opened read only leaves out a receipt
+    that is still being appended, without removing it.
+    Parameters: none
+    Return: nothing
+    """
+    filename = str(tmp_path / "receipts.journal")
+    with pytest.raises(FileNotFoundError):
+        ReceiptJournal(filename, read_only=True)
+
+    receipts = make_receipts(3)
+    with ReceiptJournal(filename) as journal:
+        for receipt, date in receipts[:2]:
+            journal.append(receipt, date)
+
+    # Pretend a writer is in the middle of appending.
+    with open(filename, "ab") as data_file:
+        data_file.write(b"\x50\x00\x00\x00partial")
+    with open(filename + ".idx", "ab") as index_file:
+        index_file.write(b"\x01\x02\x03")
+    sizes = (path.getsize(filename), path.getsize(filename + ".idx"))
+
+    with ReceiptJournal(filename, read_only=True) as journal:
+        assert len(journal) == 2
+        assert journal.reprint(2) == format_receipt(*receipts[1])
+        with pytest.raises(JournalError):
+            journal.append(*receipts[2])
+    assert (path.getsize(filename), path.getsize(filename + ".idx")) == sizes
+
+
+# Call the main function that is part of pytest so that the
+# computer will execute the test functions in this file.
+pytest.main(["-v", "--tb=line", "-rN", __file__])
@@ -0,0 +1,145 @@
+"""Verify that the receipt pricing service in receipt_server.py works correctly."""
+
+from receipt_server import price_request, start_server, run_load, percentile
+from receipt import read_dictionary
+from os import path
+from pytest import approx
+import asyncio
+import json
+import pytest
+
+
+PRODUCTS_FILE = path.join(path.dirname(__file__), "products.csv")
+
+
+def test_price_request():
+    """Verify that price_request prices a request and reports errors.
+    Parameters: none
+    Return: nothing
+    """
+    products_dict = read_dictionary(PRODUCTS_FILE, 0)
+
+    # June 3, 2024 was a Monday, so there is no discount.
+    response = json.loads(price_request(
+            '{"id": 3, "date": "2024-06-03T09:30:00",'
+            ' "items": [["W112", 2], ["C013", 1]]}', products_dict))
+    assert response["id"] == 3
+    assert response["total_items"] == 3
+    assert response["subtotal"] == approx(5.95)
+    assert response["total"] == approx(6.31)
+    assert response["items"][0] == {"name": "wheat bread",
+            "quantity": 2, "price": 2.55}
+
+    response = json.loads(price_request(
+            '{"id": 4, "items": [["XXXX", 1]]}', products_dict))
+    assert response == {"id": 4, "error": "unknown product ID 'XXXX'"}
+
+    for line in ['not json', '[1, 2]', '{"id": 5}',
+            '{"id": 5, "items": [["W112"]]}', '{"id": 5, "items": [["D150", 1e999]]}',
+            "[" * 100000 + "]" * 100000]:
+        response = json.loads(price_request(line, products_dict))
+        assert "error" in response
+
+
+def test_percentile():
+    """Verify that percentile uses the nearest rank method.
+    Parameters: none
+    Return: nothing
+    """
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+    assert percentile([7], 99) == 7
+    assert percentile([], 50) == 0.0
+
+
+def test_server_pipelining():
+    """Verify that the server answers pipelined requests in order
+    and that the load generator measures them.
+    Parameters: none
+    Return: nothing
+    """
+    products_dict = read_dictionary(PRODUCTS_FILE, 0)
+
+    async def exercise():
+        server = await start_server(products_dict, port=0, max_in_flight=4)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            for request_id in range(20):
+                request = {"id": request_id, "items": [["D150", request_id + 1]]}
+                writer.write((json.dumps(request) + "\n").encode())
+            writer.write(b'{"id": 20, "items": [["XXXX", 1]]}\n')
+            await writer.drain()
+            responses = [json.loads(await reader.readline())
+                    for _ in range(21)]
+            writer.close()
+            await writer.wait_closed()
+
+            result = await run_load(list(products_dict), 200, port=port,
+                    connections=3, pipeline_depth=8)
+        return responses, result
+
+    responses, result = asyncio.run(exercise())
+    assert [response["id"] for response in responses] == list(range(21))
+    assert [response["total_items"] for response in responses[:20]] \
+            == list(range(1, 21))
+    assert "error" in responses[20]
+    assert result["requests"] == 200
+    assert result["errors"] == 0
+    assert 0 < result["p50"] <= result["p99"]
+
+
+def test_server_limits():
+    """Verify that a request line over the limit gets an error response
+    without closing the connection, and that the server stops reading
+    from a client that doesn't read its responses.
+    Parameters: none
+    Return: nothing
+    """
+    products_dict = read_dictionary(PRODUCTS_FILE, 0)
+    request = (json.dumps({"id": 1, "items": [["D150", 1]] * 50}) + "\n").encode()
+
+    async def exercise():
+        server = await start_server(products_dict, port=0, max_in_flight=4,
+                max_request_bytes=1000)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b'{"id": 1, "items": [' + b'["D150", 1], ' * 500 + b'["D150", 1]]}\n')
+            writer.write(b'{"id": 2, "items": [["D150", 1]]}\n')
+            # A quantity too big for an int doesn't stop the
+            # responses after it.
+            for _ in range(6):
+                writer.write(b'{"id": 3, "items": [["D150", 1e999]]}\n')
+            writer.write(b'{"id": 4, "items": [["D150", 2]]}\n')
+            await writer.drain()
+            responses = [json.loads(await reader.readline()) for _ in range(9)]
+
+            # Send far more than the socket buffers hold without reading.
+            async def send():
+                for _ in range(20000):
+                    writer.write(request)
+                    await writer.drain()
+            sender = asyncio.create_task(send())
+            await asyncio.sleep(1)
+            blocked = not sender.done()
+            sender.cancel()
+            writer.transport.abort()
+        return responses, blocked
+
+    responses, blocked = asyncio.run(exercise())
+    assert responses[0]["id"] is None
+    assert "longer than 1000 bytes" in responses[0]["error"]
+    assert responses[1]["id"] == 2
+    assert responses[1]["total_items"] == 1
+    assert all(response["id"] == 3 and "error" in response for response in responses[2:8])
+    assert responses[8]["id"] == 4
+    assert responses[8]["total_items"] == 2
+    assert blocked
+
+
+# Call the main function that is part of pytest so that the
+# computer will execute the test functions in this file.
+pytest.main(["-v", "--tb=line", "-rN", __file__])
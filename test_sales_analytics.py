@@ -0,0 +1,128 @@
+"""Verify that the sales reports in sales_analytics.py add up the
+sales of each day and week correctly.
+"""
+
+from sales_analytics import SpaceSaving, SalesAnalytics, read_sales, rollups, week_start
+from receipt import read_dictionary, price_order, receipt_record, get_discount_rate
+from datetime import date, datetime
+from os import path
+from pytest import approx
+import random
+import pytest
+
+
+PRODUCTS_FILE = path.join(path.dirname(__file__), "products.csv")
+
+
+def test_space_saving():
+    """Verify that SpaceSaving counts exactly while it has a counter
+    for every key, and that later counts stay within their error.
+    Parameters: none
+    Return: nothing
+    """
+    counter = SpaceSaving(3)
+    for key in "abacab":
+        counter.add(key)
+    assert counter.top(3) == [["a", 3, 0], ["b", 2, 0], ["c", 1, 0]]
+
+    rand = random.Random(4)
+    counter = SpaceSaving(20)
+    true_counts = {}
+    for _ in range(5000):
+        # A few frequent keys and many rare ones.
+        key = rand.choice("ABCD") if rand.random() < 0.5 else rand.randrange(1000)
+        counter.add(key)
+        true_counts[key] = true_counts.get(key, 0) + 1
+    assert len(counter) == 20
+    assert counter.total == 5000
+    top = counter.top(4)
+    assert sorted(key for key, _, _ in top) == ["A", "B", "C", "D"]
+    for key, count, error in top:
+        assert count - error <= true_counts[key] <= count
+
+    with pytest.raises(ValueError):
+        SpaceSaving(0)
+
+
+def test_daily_and_weekly_rollups(tmp_path):
+    """Verify the rollups of a sales file that spans two weeks and
+    has orders on a discount day.
+    Parameters: none
+    Return: nothing
+    """
+    filename = tmp_path / "sales.csv"
+    filename.write_text("Date,Order #,Product #,Quantity\n"
+            "2024-06-03T09:00,1,D150,2\n"
+            "2024-06-03T09:00,1,W112,1\n"
+            "2024-06-04T10:00,2,D150,1\n"
+            "2024-06-04T11:00,3,C013,4\n"
+            "2024-06-10T10:00,4,D150,1\n")
+    products_dict = read_dictionary(PRODUCTS_FILE, 0)
+    analytics = SalesAnalytics(products_dict)
+    periods = list(rollups(analytics, sales=read_sales(str(filename))))
+
+    assert [(period["period"], period["start"]) for period in periods] == [
+        ("day", date(2024, 6, 3)), ("day", date(2024, 6, 4)),
+        ("week", date(2024, 6, 3)), ("day", date(2024, 6, 10)),
+        ("week", date(2024, 6, 10))]
+
+    monday, tuesday, week = periods[0], periods[1], periods[2]
+    assert monday["orders"] == 1
+    assert monday["units"] == 3
+    assert monday["revenue"] == approx(2 * 2.85 + 2.55)
+    assert monday["discount"] == 0
+    assert monday["sales_tax"] == approx(monday["revenue"] * 0.06)
+
+    # Tuesday is a discount day.
+    assert tuesday["revenue"] == approx((2.85 + 4 * 0.85) * 0.9)
+    assert tuesday["discount"] == approx((2.85 + 4 * 0.85) * 0.1)
+    assert tuesday["discounted_units"] == 5
+    assert tuesday["products"]["C013"] == [4, approx(4 * 0.85 * 0.9)]
+
+    assert week["orders"] == 3
+    assert week["units"] == 8
+    assert week["revenue"] == approx(monday["revenue"] + tuesday["revenue"])
+    assert week["products"]["D150"] == [3, approx(2 * 2.85 + 2.85 * 0.9)]
+
+    top = analytics.top_units.top(2)
+    assert top == [["C013", 4, 0], ["D150", 4, 0]] or top == [["D150", 4, 0], ["C013", 4, 0]]
+
+    with pytest.raises(ValueError):
+        analytics.add_order(datetime(2024, 6, 11), [["D150", 1]])
+        analytics.add_order(datetime(2024, 6, 10), [["D150", 1]])
+
+    assert week_start(datetime(2024, 6, 9, 23, 59)) == date(2024, 6, 3)
+
+
+def test_receipt_records():
+    """Verify that priced receipt records add up the same as the
+    orders they were priced from.
+    Parameters: none
+    Return: nothing
+    """
+    products_dict = read_dictionary(PRODUCTS_FILE, 0)
+    orders = [(datetime(2024, 6, 4, 9, 0), [["D150", 1], ["P019", 3]]),
+            (datetime(2024, 6, 5, 9, 0), [["W112", 2]])]
+
+    from_orders = SalesAnalytics(products_dict)
+    order_periods = list(rollups(from_orders, sales=[(day, None, items) for day, items in orders]))
+
+    records = [receipt_record(price_order(items, products_dict, get_discount_rate(day)), day)
+            for day, items in orders]
+    from_records = SalesAnalytics(products_dict)
+    record_periods = list(rollups(from_records, receipts=records))
+
+    # Records hold unit prices rounded to cents, so sums may differ
+    # by a few cents.
+    assert len(order_periods) == len(record_periods) == 3
+    for expected, actual in zip(order_periods, record_periods):
+        assert actual["units"] == expected["units"]
+        assert actual["revenue"] == approx(expected["revenue"], abs=0.05)
+        assert actual["discount"] == approx(expected["discount"], abs=0.05)
+        assert actual["sales_tax"] == approx(expected["sales_tax"], abs=0.05)
+        assert actual["products"].keys() == expected["products"].keys()
+
+
+# Call the main function that is part of pytest so that the
+# computer will execute the test functions in this file.
+pytest.main(["-v", "--tb=line", "-rN", __file__])
@@ -0,0 +1,100 @@
+"""Verify that the sales tax engine in tax_engine.py assigns tax
+categories and computes taxes correctly.
+"""
+
+from tax_engine import TaxError, assign_categories, compile_tax, load_tax_table
+from receipt import read_dictionary, price_order, sales_tax_rate
+from os import path
+from pytest import approx
+import pytest
+
+
+PRODUCTS_FILE = path.join(path.dirname(__file__), "products.csv")
+
+RATE_ROWS = [
+    ["Utah", "grocery", "0.03"],
+    ["Utah", "prepared food", "0.0725"],
+    ["Utah", "non-food", "0.0725"],
+    ["Oregon", "grocery", "0"],
+    ["Oregon", "prepared food", "0"],
+    ["Oregon", "non-food", "0"],
+]
+
+
+def test_assign_categories():
+    """Verify that product numbers win over prefixes, longer prefixes
+    win over shorter ones, and other products get the default.
+    Parameters: none
+    Return: nothing
+    """
+    categories, category_of = assign_categories(["D150", "D215", "DX01", "Z001"], [
+        ["grocery", "D*"],
+        ["prepared food", "DX*"],
+        ["non-food", "D215"],
+    ])
+    assert categories == ["grocery", "prepared food", "non-food"]
+    names = {number: categories[index] for number, index in category_of.items()}
+    assert names == {"D150": "grocery", "D215": "non-food",
+            "DX01": "prepared food", "Z001": "non-food"}
+
+    with pytest.raises(TaxError):
+        assign_categories(["D150"], [["", "D*"]])
+
+
+def test_order_taxes():
+    """Verify the taxes of one order in several jurisdictions.
+    Parameters: none
+    Return: nothing
+    """
+    products_dict = read_dictionary(PRODUCTS_FILE, 0)
+    table = compile_tax(products_dict, rate_rows=RATE_ROWS)
+    assert table.jurisdictions == ["Utah", "Oregon"]
+    assert table.category("D150") == "grocery"
+    assert table.category("H001") == "non-food"
+
+    # Milk is a grocery and toilet tissue is not.
+    taxes = table.order_taxes(["D150", "H001", "D150"], [2.85, 6.45, 5.70])
+    assert taxes == [approx(8.55 * 0.03 + 6.45 * 0.0725), 0.0]
+
+    utah = table.select("Utah")
+    assert utah.jurisdictions == ["Utah"]
+    assert utah.sales_tax(["W112"], [2.55]) == approx(2.55 * 0.03)
+    with pytest.raises(KeyError):
+        table.select("Ohio")
+
+    # The default table taxes everything at the rate in receipt.py.
+    items = [["D150", 1], ["H001", 2], ["C013", 3]]
+    receipt = price_order(items, products_dict, 0.0, tax=compile_tax(products_dict))
+    assert receipt["sales_tax"] == approx(receipt["subtotal"] * sales_tax_rate)
+
+
+def test_invalid_rates(tmp_path):
+    """Verify that invalid rate files raise TaxError.
+    Parameters: none
+    Return: nothing
+    """
+    with pytest.raises(TaxError):
+        compile_tax(["D150"], rate_rows=[["Utah", "grocery", "0.03"]])
+    with pytest.raises(TaxError):
+        compile_tax(["D150"], rate_rows=[["Utah", "candy", "0.03"]])
+    with pytest.raises(TaxError):
+        compile_tax(["D150"], rate_rows=[["Utah", "grocery", "3%"]])
+    with pytest.raises(TaxError):
+        compile_tax(["D150"], rate_rows=[])
+
+    filename = tmp_path / "rates.csv"
+    filename.write_text("Jurisdiction,Category,Rate\n" +
+            "".join(",".join(row) + "\n" for row in RATE_ROWS))
+    table = load_tax_table(["D150"], str(filename), jurisdiction="Oregon")
+    assert table.jurisdictions == ["Oregon"]
+    with pytest.raises(TaxError):
+        load_tax_table(["D150"], str(filename), jurisdiction="Ohio")
+
+    filename.write_text("Jurisdiction,Category,Rate\nUtah,grocery\n")
+    with pytest.raises(TaxError):
+        load_tax_table(["D150"], str(filename))
+
+
+# Call the main function that is part of pytest so that the
+# computer will execute the test functions in this file.
+pytest.main(["-v", "--tb=line", "-rN", __file__])